@@ -1,8 +1,6 @@
-import os
 from sys import argv
 from controller import Controller
 from viewCLI import ViewCLI
-from configparser import ConfigParser
 
 
 # # Writing to a config file
@@ -31,5 +29,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
-os.system("pause")
@@ -1,11 +1,34 @@
 from abc import ABC, abstractmethod
 import re
+import sys
 import os.path
+from functools import lru_cache
+from patternRegistry import PatternRegistry
+
+
+CAPITALIZE_CACHE_SIZE = 8192  # most distinct titles remembered by Cinema._capitalize
+
+PatternRegistry.register("resolution", r"(?P<resolution>(480p|720p|1080p))")
+PatternRegistry.register("encoding", r"([xhH][ .]?)?(?P<encoding>26[45])")
+
+# Building blocks of the canonical patterns, which match the names this project renames files to (see
+# getCanonicalPattern): words of title characters separated by single spaces, and the tags built by _getTags. Each word
+# is followed by a negative lookahead so that a failed match doesn't retry every shorter prefix of the word. Titles are
+# captured with their trailing space, as the subclass patterns capture them. A tag follows a single space, which may
+# already have been captured at the end of a show's episode title
+CANONICAL_WORD = r"[!0-9a-zA-Z.',_\-]+(?![!0-9a-zA-Z.',_\-])"
+CANONICAL_WORDS = rf"{CANONICAL_WORD}(?: {CANONICAL_WORD})*?"
+CANONICAL_TAGS = (r"(?:(?:(?<= )|(?<! ) )\[(?P<resolution>480p|720p|1080p)])?"
+                  r"(?:(?:(?<= )|(?<! ) )\[x(?P<encoding>26[45])])?")
 
 
 class Cinema(ABC):
     """ Abstract Cinema class to be superseded by concrete objects. """
 
+    __slots__ = ("_oldDir", "_newDir", "_oldDirPath", "_newDirPath", "_oldAbsPath", "_oldFileName", "_newFileName",
+                 "_fileExt", "_backupName", "_needsIntegration", "_title", "_resolution", "_encoding", "_newAbsPath",
+                 "_sortKey", "_digest")
+
     # Required attributes
     _oldDir: str  # c:\directory\[directory]\file.ext
     _newDir: str
@@ -16,23 +39,56 @@ class Cinema(ABC):
     _newFileName: str
     _fileExt: str  # .ext
     _backupName: str  # newParentDirectory.file.ext
-    _isMovie: bool = False
+    _ARTICLES = frozenset(["a", "an", "the"])
+    _COORD_CONJUNCTIONS = frozenset(["for", "and", "but", "yet", "or", "nor", "if", "vs"])
+    _PREPOSITIONS = frozenset(["as", "at", "by", "of", "to", "on", "off", "with", "without", "in", "per", "via"])
+    _LOWERCASE_WORDS = _ARTICLES | _COORD_CONJUNCTIONS | _PREPOSITIONS
+
+    _isMovie: bool = False  # class constants, overridden by concrete classes
     _isShow: bool = False
-    _needsIntegration: bool = True
+    _capitalizedFields: tuple[str, ...] = ("title",)  # fields that are capitalized when the new file name is built
+    _sortOrder: int  # position of the concrete class' objects in sorted results
+    _needsIntegration: bool
 
     _title: str
     _resolution: str or None  # 1080p
     _encoding: str or None  # 265
     # _error: str or None = None
+    _newAbsPath: str or None  # memoized by getNewAbsPath until the new file name changes
+    _sortKey: tuple or None  # (sort order, title, season, episode, date, old absolute path)
+    _digest: str or None  # "sha256:<hex digest>" of the file, taken when it was copied into a library with verification
 
     def __init__(self, filePath: str):
+        # Directory strings and extensions are shared by many objects, so a single interned copy is kept
         self._oldAbsPath = filePath
-        self._oldDirPath = os.path.dirname(filePath)
-        self._oldDir = os.path.split(self._oldDirPath)[1]
+        self._oldDirPath = sys.intern(os.path.dirname(filePath))
+        self._oldDir = sys.intern(os.path.split(self._oldDirPath)[1])
 
         tmp = os.path.splitext(os.path.basename(filePath))
         self._oldFileName = tmp[0]
-        self._fileExt = tmp[1]
+        self._fileExt = sys.intern(tmp[1])
+
+        self._needsIntegration = True
+        self._newAbsPath = None
+        self._sortKey = None
+        self._digest = None
+
+    def __setstate__(self, state: dict or tuple) -> None:
+        """ Restore a pickled object. Backups made before Cinema objects used __slots__ hold a plain attribute dict. """
+
+        self._needsIntegration = True
+        self._newAbsPath = None
+        self._sortKey = None
+        self._digest = None
+
+        if isinstance(state, tuple):  # (instance dict, slot dict)
+            state = {**(state[0] or {}), **(state[1] or {})}
+
+        for name, value in state.items():
+            try:
+                setattr(self, name, value)
+            except AttributeError:  # attributes that are no longer kept per object
+                pass
 
     ##########
     # CHECKS #
@@ -46,6 +102,13 @@ class Cinema(ABC):
     
     def hasCorrectDirName(self) -> bool:
         return self._oldDir == self._newDir
+
+    def hasCanonicalFileName(self) -> bool:
+        """ Whether the old file name is in the format this project renames files to, as recognized by the class'
+        canonical pattern. """
+
+        pattern = self.getCanonicalPattern()
+        return pattern is not None and pattern.fullmatch(self._oldFileName) is not None
     
     def needsIntegration(self) -> bool:
         return self._needsIntegration
@@ -67,6 +130,11 @@ class Cinema(ABC):
     def updateFileName(self, passed: str) -> None:
         """ Changes the new file name, but also changes the backup name. """
 
+    def _invalidateDerivedPaths(self) -> None:
+        """ Clear memoized paths that are derived from the new file name. Must be called whenever it changes. """
+
+        self._newAbsPath = None
+
     def updateFileNameSimple(self, passed: str) -> None:
         self.updateFileName(f"{passed}{self._getTags()}")
 
@@ -76,6 +144,9 @@ class Cinema(ABC):
     def setNewDirPath(self, passed: str) -> None:
         self._newDirPath = passed
 
+    def setDigest(self, passed: str or None) -> None:
+        self._digest = passed
+
     def setIntegrationFalse(self) -> None:
         self._needsIntegration = False
 
@@ -85,21 +156,15 @@ class Cinema(ABC):
         # self._title = passed[:-1]  # remove the trailing space that is always attached to the title group
         self._title = self._capitalize(passed)
 
-    def _setResolution(self, match: re.Match or None) -> None:
+    def _setResolution(self, passed: str or None) -> None:
         """ Set the resolution of the Cinema object (e.g., 1080p). """
 
-        if match is None:
-            self._resolution = None
-        else:
-            self._resolution = match.group("resolution")
+        self._resolution = passed
 
-    def _setEncoding(self, match: re.Match or None) -> None:
+    def _setEncoding(self, passed: str or None) -> None:
         """ Set the encoding of the Cinema object (e.g., H.265). """
 
-        if match is None:
-            self._encoding = None
-        else:
-            self._encoding = match.group("encoding")
+        self._encoding = passed
 
     ###########
     # GETTERS #
@@ -121,11 +186,26 @@ class Cinema(ABC):
     def getNewDirPath(self) -> str:
         return self._newDirPath
 
+    def getDigest(self) -> str or None:
+        return self._digest
+
     def getOldAbsPath(self) -> str:  # [c:\\folder\\name.ext]
         return self._oldAbsPath
 
     def getNewAbsPath(self) -> str:
-        return f"{self._oldDirPath}\\{self._newFileName}{self._fileExt}"
+        if self._newAbsPath is None:
+            self._newAbsPath = f"{self._oldDirPath}\\{self._newFileName}{self._fileExt}"
+
+        return self._newAbsPath
+
+    def getSortKey(self) -> tuple[int, str, int, int, int, str]:
+        """ Key that orders shows before movies before unknown files, then by title, season, episode, and date, with the
+        old absolute path breaking ties. It is built once from the parsed fields rather than from the path string. """
+
+        if self._sortKey is None:  # objects restored from backups made before sort keys existed
+            self._sortKey = self._buildSortKey()
+
+        return self._sortKey
 
     def getOldFileName(self) -> str:
         return self._oldFileName
@@ -167,58 +247,56 @@ class Cinema(ABC):
     def getResolutionPattern() -> re.Pattern:
         """ Returns the Pattern object relating to resolution. """
 
-        return re.compile(r"(?P<resolution>(480p|720p|1080p))")
+        return PatternRegistry.get("resolution")
 
     @staticmethod
     def getEncodingPattern() -> re.Pattern:
         """ Returns the Pattern object relating to encoding. """
 
-        return re.compile(r"([xhH][ .]?)?(?P<encoding>26[45])")
+        return PatternRegistry.get("encoding")
 
     @staticmethod
     @abstractmethod
     def getPattern() -> re.Pattern:
-        """ Returns a Pattern object to be used in identifying concrete subclass objects. """
+        """ Returns a Pattern object to be used in identifying concrete subclass objects. Concrete classes register the
+        pattern's source in the PatternRegistry under their class name, which is how classifiers find it. """
+
+    @staticmethod
+    @abstractmethod
+    def getCanonicalPattern() -> re.Pattern or None:
+        """ Returns a Pattern object that fully matches only the new file names built by the concrete class, capturing
+        the same fields as getPattern. Concrete classes register its source in the PatternRegistry under
+        "<class name>.canonical". """
 
     #########
     # OTHER #
     #########
 
     @abstractmethod
-    def _buildAttributes(self, specificMatch: re.Match) -> None:
-        """ Fill out a concrete class' attributes using a Match object specific to that class. """
+    def _buildAttributes(self, fields: dict[str, str or None]) -> None:
+        """ Fill out a concrete class' attributes using the fields extracted by the class' pattern. """
 
     @abstractmethod
     def _buildNewFileName(self) -> None:
         """ Build a new file name based on the filled attributes. """
 
+    @abstractmethod
+    def _buildSortKey(self) -> tuple[int, str, int, int, int, str]:
+        """ Build the key returned by getSortKey from the filled attributes. """
+
     @staticmethod
+    @lru_cache(maxsize=CAPITALIZE_CACHE_SIZE)
     def _capitalize(title: str) -> str:
-
-        def uppercaseFirstAndLastWordsInTitle() -> None:
-            if numberOfWords > 0:
-                titleWordList[0] = titleWordList[0][:1].upper() + titleWordList[0][1:]
-                titleWordList[-1] = titleWordList[-1][:1].upper() + titleWordList[-1][1:]
-
-        def lowercaseOrUppercaseRelevantWordsInTitle() -> None:
-            i = 1  # skip the first word in the title
-            if numberOfWords > 2:
-                for _ in range(numberOfWords - 2):  # skip the last word in the title
-                    if titleWordList[i].lower() in lowercaseList:
-                        titleWordList[i] = titleWordList[i].lower()
-                    else:
-                        titleWordList[i] = titleWordList[i][:1].upper() + titleWordList[i][1:]
-                    i += 1
-
-        articles = ["a", "an", "the"]
-        coordConjunctions = ["for", "and", "but", "yet", "or", "nor", "if", "vs"]
-        prepositions = ["as", "at", "by", "of", "to", "on", "off", "with", "without", "in", "per", "via"]
-        lowercaseList = articles + coordConjunctions + prepositions
+        """ Capitalize a title, keeping articles, coordinating conjunctions, and prepositions lowercase unless they are the
+        first or last word. Results are memoized, since the same titles recur across many files. """
 
         titleWordList = title.split()
-        numberOfWords = len(titleWordList)
+        lastIndex = len(titleWordList) - 1
 
-        uppercaseFirstAndLastWordsInTitle()
-        lowercaseOrUppercaseRelevantWordsInTitle()
+        for i, word in enumerate(titleWordList):
+            if 0 < i < lastIndex and word.lower() in Cinema._LOWERCASE_WORDS:
+                titleWordList[i] = word.lower()
+            else:
+                titleWordList[i] = word[:1].upper() + word[1:]
 
         return " ".join(titleWordList)
@@ -0,0 +1,10 @@
+from typing import NamedTuple
+
+
+class CinemaRecord(NamedTuple):
+    """ Lightweight, picklable result of classifying a single file, used in place of full Cinema objects when results
+    are passed between processes. """
+
+    path: str
+    className: str or None  # None if the file was not recognized
+    fields: dict[str, str or None] or None
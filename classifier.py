@@ -0,0 +1,133 @@
+from abc import ABC, abstractmethod
+from cinema import Cinema
+from patternRegistry import PatternRegistry
+import re
+
+
+# Cleaning patterns, compiled by the registry the first time a file name is cleaned
+CLEANING_PATTERN_NAMES = ["cleaning.spacing", "cleaning.doubleSpaces", "cleaning.missingSpaces", "cleaning.beginningTags"]
+PatternRegistry.register("cleaning.spacing", r"((?<![A-Z])\.|\.(?=[A-Z][a-z])|\.(?=[0-9])|_)")
+PatternRegistry.register("cleaning.doubleSpaces", r" {2,}")
+PatternRegistry.register("cleaning.missingSpaces", r"((\w)([([])|([])])(\w))")
+PatternRegistry.register("cleaning.beginningTags", r"^\[.+?] ?")
+
+
+class ClassPatternsEmpty(Exception):
+    """ If the concrete subclass patterns cannot be created, this error is raised. """
+    pass
+
+
+class Classifier(ABC):
+    """ Identifies which concrete Cinema subclass a file name belongs to, and extracts the fields needed to build it.
+    Names already in the format this project renames files to are recognized directly by every Classifier, and the
+    rest are cleaned the same way by every Classifier before they are classified. Patterns are taken from the
+    PatternRegistry on first use, so building a Classifier compiles nothing. """
+
+    __spacingPattern: re.Pattern or None = None
+    __doubleSpacesPattern: re.Pattern
+    __missingSpacesPattern: re.Pattern
+    __beginningTagsPattern: re.Pattern
+    __canonicalList: list[tuple[type, re.Pattern]] or None = None  # [(class, canonical pattern), ...]
+    __tagPatternList: list[tuple[str, str, re.Pattern]]  # [(field, text in every match, pattern), ...]
+    __BRACKETS = frozenset("()[]")
+
+    def classify(self, fileName: str) -> tuple[type, dict[str, str or None]] or None:
+        """ Return the matching Cinema subclass and its fields (title, date, season, episode, episodeTitle,
+        resolution, encoding), or None if the file name (without extension) is not recognized. """
+
+        return self.classifyCanonical(fileName) or self.classifyCleanFileName(self.getCleanFileName(fileName))
+
+    def classifyCanonical(self, fileName: str) -> tuple[type, dict[str, str or None]] or None:
+        """ Classify a file name that is already in the format built by a Cinema subclass, with a single anchored
+        match per subclass and no cleaning. A name is only accepted if building the subclass from its fields would give
+        the same name back, that is, if its titles are already capitalized, and if the general classification would
+        find the same fields in it: its resolution and encoding are only in its tags, not in its titles or date (such as
+        "Show 1x02 1080p" or "Title H.264 (2012)"). Returns None for every other name. """
+
+        if " " not in fileName:  # every canonical name has one, and most release names have none
+            return None
+
+        if self.__canonicalList is None:
+            self.__getCanonicalPatterns()
+
+        for cls, pattern in self.__canonicalList:
+            match = pattern.fullmatch(fileName)
+
+            if match is not None:
+                fields = match.groupdict()
+
+                for field in cls._capitalizedFields:
+                    if fields[field] and Cinema._capitalize(fields[field]) != fields[field].rstrip(" "):
+                        return None
+
+                for field, marker, tagPattern in self.__tagPatternList:  # none is found before the tag, if any
+                    end = match.start(field) if match.start(field) != -1 else len(fileName)
+                    if fileName.find(marker, 0, end) != -1 and tagPattern.search(fileName, 0, end) is not None:
+                        return None
+
+                return cls, fields
+
+        return None
+
+    @abstractmethod
+    def classifyCleanFileName(self, cleanFileName: str) -> tuple[type, dict[str, str or None]] or None:
+        """ Classify a file name that has already been cleaned by getCleanFileName. """
+
+    def getCleanFileName(self, fileName: str) -> str:
+        """ Process the original file name and return a cleaned string for continued processing. """
+
+        if self.__spacingPattern is None:
+            self.__getCleaningPatterns()
+
+        # Each pass is skipped when its pattern cannot match, which is cheaper than letting the regex scan the name
+
+        # replace . and _ with space
+        # .'s that aren't preceded by a capital letter (F.B.I.)
+        cleanFileName = fileName
+        if "." in cleanFileName or "_" in cleanFileName:
+            cleanFileName = self.__spacingPattern.sub(" ", cleanFileName)
+
+        # remove any double spaces (or more)
+        if "  " in cleanFileName:
+            cleanFileName = self.__doubleSpacesPattern.sub(" ", cleanFileName)
+
+        # add spaces that should be there
+        if not self.__BRACKETS.isdisjoint(cleanFileName):
+            cleanFileName = self.__missingSpacesPattern.sub(r"\2 \3", cleanFileName)
+
+        # remove tags at beginning of file name
+        if cleanFileName.startswith("["):
+            cleanFileName = self.__beginningTagsPattern.sub("", cleanFileName)
+
+        return cleanFileName
+
+    @abstractmethod
+    def getVersion(self) -> str:
+        """ Return a hash that changes whenever the patterns used for classification change. """
+
+    @staticmethod
+    def _getCleaningSources() -> list[str]:
+        """ Return the sources of the patterns used in cleaning, for inclusion in a concrete class' version hash. """
+
+        return [PatternRegistry.getSource(name) for name in CLEANING_PATTERN_NAMES]
+
+    @staticmethod
+    def _getCanonicalSources() -> list[str]:
+        """ Return the sources of the canonical patterns, for inclusion in a concrete class' version hash. """
+
+        return [source for cls in Cinema.__subclasses__()
+                if (source := PatternRegistry.getSource(f"{cls.__name__}.canonical"))]
+
+    def __getCleaningPatterns(self) -> None:
+        """ Get the patterns used to clean file names before classification from the registry. """
+
+        (self.__spacingPattern, self.__doubleSpacesPattern, self.__missingSpacesPattern,
+         self.__beginningTagsPattern) = [PatternRegistry.get(name) for name in CLEANING_PATTERN_NAMES]
+
+    def __getCanonicalPatterns(self) -> None:
+        """ Get the canonical pattern of each Cinema subclass that has one, in subclass order. """
+
+        self.__canonicalList = [(cls, pattern) for cls in Cinema.__subclasses__()
+                                if (pattern := cls.getCanonicalPattern()) is not None]
+        self.__tagPatternList = [("resolution", "0p", Cinema.getResolutionPattern()),
+                                 ("encoding", "26", Cinema.getEncodingPattern())]
@@ -0,0 +1,91 @@
+import re
+from cinema import Cinema
+from classifier import Classifier, ClassPatternsEmpty
+from patternRegistry import PatternRegistry
+
+
+PatternRegistry.register("groupName", r"\(\?P<(\w+)>")  # named group openings, (?P<name>
+
+
+class ClassifierRegex(Classifier):
+    """ Concrete Classifier that combines every Cinema subclass pattern into a single master pattern, so that the type,
+    title, date, season, episode, and episode title of a file name are all found in one scan. The master pattern is
+    built from the subclass sources in the PatternRegistry and compiled by it the first time a name is classified. """
+
+    MASTER_PATTERN_NAME = "ClassifierRegex.master"
+
+    __masterSource: str
+    __masterPattern: re.Pattern or None = None  # compiled on first use
+    __resolutionPattern: re.Pattern
+    __encodingPattern: re.Pattern
+    __classDict: dict[str, type]  # {alternative group name: class, ...}
+    __fieldDict: dict[str, list[tuple[str, str]]]  # {alternative group name: [(field, master group name), ...], ...}
+
+    def __init__(self):
+        super().__init__()
+        self.__buildMasterSource()
+
+    def classifyCleanFileName(self, cleanFileName: str) -> tuple[type, dict[str, str or None]] or None:
+        if self.__masterPattern is None:
+            self.__getPatterns()
+
+        match = self.__masterPattern.match(cleanFileName)
+
+        if match is None:
+            return None
+
+        alternative = match.lastgroup  # the alternative's enclosing group is always the last one closed
+        fields = {field: match.group(group) for field, group in self.__fieldDict[alternative]}
+
+        resolutionMatch = self.__resolutionPattern.search(cleanFileName)
+        encodingMatch = self.__encodingPattern.search(cleanFileName)
+        fields["resolution"] = resolutionMatch.group("resolution") if resolutionMatch else None
+        fields["encoding"] = encodingMatch.group("encoding") if encodingMatch else None
+
+        return self.__classDict[alternative], fields
+
+    def getVersion(self) -> str:
+        import hashlib  # only needed when the parse cache is enabled
+
+        sources = [self.__masterSource, PatternRegistry.getSource("resolution"),
+                   PatternRegistry.getSource("encoding")] + self._getCleaningSources() + self._getCanonicalSources()
+
+        return hashlib.sha1("\n".join(sources).encode()).hexdigest()
+
+    def __getPatterns(self) -> None:
+        """ Get the compiled patterns from the registry. The master source is registered here rather than when it is
+        built, so that copies of this Classifier sent to worker processes register it in their own registry. """
+
+        PatternRegistry.register(self.MASTER_PATTERN_NAME, self.__masterSource)
+        self.__masterPattern = PatternRegistry.get(self.MASTER_PATTERN_NAME)
+        self.__resolutionPattern = Cinema.getResolutionPattern()
+        self.__encodingPattern = Cinema.getEncodingPattern()
+
+    def __buildMasterSource(self) -> None:
+        """ Build the master pattern's source from the Cinema subclasses' registered sources. Each subclass pattern
+        becomes a named alternative (tried in subclass order, as before), with its groups prefixed by the class name to
+        keep them unique. Resolution and encoding are left to their own searches, which are cheaper than capturing them
+        with lookaheads. """
+
+        groupNamePattern = PatternRegistry.get("groupName")
+        alternatives = []
+        classDict = {}
+        fieldDict = {}
+
+        for cls in Cinema.__subclasses__():
+            name = cls.__name__
+            source = PatternRegistry.getSource(name)
+            if not source:  # account for Unknown class, which has no pattern
+                continue
+
+            fieldDict[name] = [(field, f"{name}_{field}") for field in groupNamePattern.findall(source)]
+            source = groupNamePattern.sub(rf"(?P<{name}_\1>", source)
+            alternatives.append(f"(?P<{name}>{source})")
+            classDict[name] = cls
+
+        if len(alternatives) == 0:
+            raise ClassPatternsEmpty
+
+        self.__masterSource = f"^(?:{'|'.join(alternatives)})"
+        self.__classDict = classDict
+        self.__fieldDict = fieldDict
@@ -0,0 +1,243 @@
+import re
+from itertools import accumulate
+from cinema import Cinema
+from classifier import Classifier
+from patternRegistry import PatternRegistry
+from show import Show
+from movie import Movie
+
+
+PatternRegistry.register("token.title", r"[!0-9a-zA-Z.',_\-]+")  # whole token may be part of a title or episode title
+PatternRegistry.register("token.word", r"\w+")  # whole token may be part of a "- subtitle -" section
+PatternRegistry.register("token.marker", r"(?:[sS]eason|[sS])? ?(?P<season>\d{1,2})(?:x|[eE]pisode|[eE]) ?"
+                                         r"(?P<episode>\d{1,2})(?= |$)")  # S01E02, 1x02, Season 1x02, ...
+PatternRegistry.register("token.quality", r"\[?\d{3,4}p")  # token ends an episode title: 1080p, [720p]
+PatternRegistry.register("token.date", r"[([]?(?P<date>\d{4})[]) ]")  # 2012, (2012), [2012]
+TOKEN_PATTERN_NAMES = ["token.title", "token.word", "token.marker", "token.quality", "token.date"]
+
+
+class ClassifierToken(Classifier):
+    """ Concrete Classifier that recognizes Show and Movie names from a token stream instead of the subclass patterns.
+
+    The cleaned name is split into space-separated tokens once, and every token is tested once with small anchored
+    patterns that cannot backtrack past a few characters. The Show and Movie structures (title, optional "- subtitle -"
+    section, then an episode marker or a date) are then found with lookups into those per-token tables, so the time
+    spent on a name grows linearly with its length. The results follow the subclass patterns: the shortest title that
+    allows a match is used, and the sections after it are tried in the same order. """
+
+    __titlePattern: re.Pattern or None = None  # patterns are taken from the registry on first use
+    __wordPattern: re.Pattern
+    __markerPattern: re.Pattern
+    __qualityPattern: re.Pattern
+    __datePattern: re.Pattern
+
+    __MARKER_STARTS = frozenset("sS0123456789")
+    __DATE_STARTS = frozenset("([0123456789")
+
+    __resolutionPattern: re.Pattern
+    __encodingPattern: re.Pattern
+
+    def classifyCleanFileName(self, cleanFileName: str) -> tuple[type, dict[str, str or None]] or None:
+        if self.__titlePattern is None:
+            self.__getPatterns()
+
+        tokens = _TokenStream(cleanFileName, self.__titlePattern, self.__wordPattern, self.__qualityPattern)
+
+        classified = self.__classifyShow(tokens) or self.__classifyMovie(tokens)
+
+        if classified is None:
+            return None
+
+        cls, fields = classified
+        resolutionMatch = self.__resolutionPattern.search(cleanFileName)
+        encodingMatch = self.__encodingPattern.search(cleanFileName)
+        fields["resolution"] = resolutionMatch.group("resolution") if resolutionMatch else None
+        fields["encoding"] = encodingMatch.group("encoding") if encodingMatch else None
+
+        return cls, fields
+
+    def getVersion(self) -> str:
+        import hashlib  # only needed when the parse cache is enabled
+
+        sources = ([PatternRegistry.getSource(name) for name in TOKEN_PATTERN_NAMES + ["resolution", "encoding"]]
+                   + self._getCleaningSources() + self._getCanonicalSources())
+
+        return hashlib.sha1("\n".join(["token"] + sources).encode()).hexdigest()
+
+    def __getPatterns(self) -> None:
+        (self.__titlePattern, self.__wordPattern, self.__markerPattern, self.__qualityPattern,
+         self.__datePattern) = [PatternRegistry.get(name) for name in TOKEN_PATTERN_NAMES]
+        self.__resolutionPattern = Cinema.getResolutionPattern()
+        self.__encodingPattern = Cinema.getEncodingPattern()
+
+    def __classifyShow(self, tokens: "_TokenStream") -> tuple[type, dict] or None:
+        """ Title, optional subtitle section, episode marker, then an optional episode title. """
+
+        episodeList = [self.__getEpisode(tokens, i) if token[:1] in self.__MARKER_STARTS else None
+                       for i, token in enumerate(tokens.tokens)]
+        found = tokens.findTitleEnd(episodeList, dashInTitle=False)
+
+        if found is None:
+            return None
+
+        titleEnd, ending = found
+        return Show, {"title": tokens.text[:tokens.start[titleEnd]], **episodeList[ending]}
+
+    def __classifyMovie(self, tokens: "_TokenStream") -> tuple[type, dict] or None:
+        """ Title, optional subtitle section, then a date. """
+
+        dateList = [self.__getDate(tokens, i) if token[:1] in self.__DATE_STARTS else None
+                    for i, token in enumerate(tokens.tokens)]
+        found = tokens.findTitleEnd(dateList, dashInTitle=True)
+
+        if found is None:
+            return None
+
+        titleEnd, ending = found
+        return Movie, {"title": tokens.text[:tokens.start[titleEnd]], **dateList[ending]}
+
+    def __getDate(self, tokens: "_TokenStream", i: int) -> dict or None:
+        """ The date fields if a date starts at token i. """
+
+        match = self.__datePattern.match(tokens.text, tokens.start[i])
+        return {"date": match.group("date")} if match else None
+
+    def __getEpisode(self, tokens: "_TokenStream", i: int) -> dict or None:
+        """ The season, episode, and episode title fields if an episode marker starting at token i is followed by a
+        valid ending: a quality tag, " - " and an episode title, an episode title, or the end of the name. """
+
+        match = self.__markerPattern.match(tokens.text, tokens.start[i])
+        if match is None:
+            return None
+
+        after = i + match.group().count(" ") + 1  # first token after the marker
+        fields = {"season": match.group("season"), "episode": match.group("episode")}
+
+        if after == tokens.count or tokens.isQuality[after]:  # end of the name, or a quality tag with anything after it
+            episodeTitle = ""
+        else:
+            episodeTitle = None
+
+            if tokens.tokens[after] == "-" and after + 1 < tokens.count:
+                episodeTitle = tokens.getEpisodeTitle(after + 1)
+
+            if episodeTitle is None:
+                episodeTitle = tokens.getEpisodeTitle(after)
+
+            if episodeTitle is None:
+                return None
+
+        fields["episodeTitle"] = episodeTitle
+        return fields
+
+
+class _TokenStream:
+    """ A cleaned name split into tokens, with the per-token tables that ClassifierToken's lookups are made against. """
+
+    def __init__(self, text: str, titlePattern: re.Pattern, wordPattern: re.Pattern, qualityPattern: re.Pattern):
+        self.text = text
+        self.tokens = text.split(" ")
+        self.count = len(self.tokens)
+
+        self.start = list(accumulate((len(token) + 1 for token in self.tokens), initial=0))  # offset of each token
+        self.start[-1] = len(text)  # plus the end of the name
+
+        self.isTitle = [titlePattern.fullmatch(token) is not None for token in self.tokens]
+        self.isWord = [wordPattern.fullmatch(token) is not None for token in self.tokens]
+        self.isQuality = [qualityPattern.match(token) is not None for token in self.tokens]
+
+        # Tokens that end an episode title. A trailing empty token only exists when the name ends in a space, and is
+        # treated as the end of the name
+        self.endsTitle = [quality or token.startswith("[") or token == ""
+                          for token, quality in zip(self.tokens, self.isQuality)]
+
+        # Index of the first token at or after each token that can't continue an episode title
+        self.titleStop = [self.count] * (self.count + 1)
+        for i in range(self.count - 1, -1, -1):
+            self.titleStop[i] = i if (self.endsTitle[i] or not self.isTitle[i]) else self.titleStop[i + 1]
+
+        # Index of the first token at or after each token that isn't a word
+        self.wordStop = [self.count] * (self.count + 1)
+        for i in range(self.count - 1, -1, -1):
+            self.wordStop[i] = self.wordStop[i + 1] if self.isWord[i] else i
+
+    def getEpisodeTitle(self, i: int) -> str or None:
+        """ The episode title that starts at token i, or None if the tokens from i don't form one. Titles have at least
+        one word, run up to a quality tag, a bracketed tag, or the end of the name, and keep their trailing space. """
+
+        if self.tokens[i] == "" and i == self.count - 1:
+            return ""
+
+        if not self.isTitle[i]:
+            return None
+
+        stop = self.titleStop[i + 1]
+        if stop < self.count and not self.endsTitle[stop]:
+            return None
+
+        return self.text[self.start[i]:self.start[stop]]
+
+    def findTitleEnd(self, endingList: list, dashInTitle: bool) -> tuple[int, int] or None:
+        """ Find the title followed by a valid ending the same way the subclass patterns do, where endingList holds the
+        fields of the ending that starts at each token (or None). Returns (first token after the title, token the
+        ending starts at), or None.
+
+        Titles are made of title tokens and are as short as possible. With dashInTitle, each title word may also take
+        a following "-" token, which is tried before leaving it out (Movie's "(- )?"). Between the title and the ending,
+        a "- subtitle -", "- subtitle", or "-" section is allowed, tried in that order, with the longest subtitle first.
+        The search order of the patterns is kept by filling a table from the last token to the first: found[i] holds
+        the first result the patterns would find once a title word has ended before token i. """
+
+        # Index of the last token at or before each token that starts a valid ending
+        lastEnding = []
+        last = -1
+        for i in range(self.count):
+            if endingList[i] is not None:
+                last = i
+            lastEnding.append(last)
+
+        found = [None] * (self.count + 1)
+
+        for i in range(self.count - 1, 0, -1):
+            found[i] = self.__findEnding(i, endingList, lastEnding)
+
+            if found[i] is None and self.isTitle[i] and i + 1 < self.count:  # another title word
+                if dashInTitle and i + 2 < self.count and self.tokens[i + 1] == "-":
+                    found[i] = found[i + 2]
+
+                if found[i] is None:
+                    found[i] = found[i + 1]
+
+        if self.count < 2 or not self.isTitle[0]:  # at least one title word, followed by a space
+            return None
+
+        if dashInTitle and self.count > 2 and self.tokens[1] == "-" and found[2] is not None:
+            return found[2]
+
+        return found[1]
+
+    def __findEnding(self, i: int, endingList: list, lastEnding: list[int]) -> tuple[int, int] or None:
+        """ The first valid ending, with an optional subtitle section before it, for a title ending before token i. """
+
+        if self.tokens[i] == "-" and i + 1 < self.count:
+            subtitleStop = self.wordStop[i + 1]
+
+            if subtitleStop > i + 1:  # at least one subtitle word
+                # "- subtitle - "
+                if (subtitleStop + 1 < self.count and self.tokens[subtitleStop] == "-"
+                        and endingList[subtitleStop + 1] is not None):
+                    return i, subtitleStop + 1
+
+                # "- subtitle ", longest subtitle first
+                last = lastEnding[min(subtitleStop, self.count - 1)]
+                if last >= i + 2:
+                    return i, last
+
+            # "- "
+            if endingList[i + 1] is not None:
+                return i, i + 1
+
+        if endingList[i] is not None:
+            return i, i
+
+        return None
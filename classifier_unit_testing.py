@@ -0,0 +1,79 @@
+import unittest
+
+from show import Show
+from movie import Movie
+from classifierRegex import ClassifierRegex
+from parserBenchmark import generateCorpus
+
+CORPUS_SIZE = 100000
+CORPUS_SEED = 0
+
+
+class CanonicalClassificationTestCase(unittest.TestCase):
+    """ Release names of the seeded benchmark corpus, and the names they are renamed to, are classified exactly as the
+    general classification (cleaning and the subclass patterns) classifies them when the canonical fast path accepts
+    them. The fast path only reads differently the canonical names the general heuristics misread, such as
+    "Blade Runner 2049 (2017)", or can't read, such as "Rick and Morty 1x02 [x264]". """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.classifier = ClassifierRegex()
+        cls.corpus = generateCorpus(CORPUS_SIZE, CORPUS_SEED)
+
+    def classifyGeneral(self, fileName: str) -> tuple[type, dict] or None:
+        return self.classifier.classifyCleanFileName(self.classifier.getCleanFileName(fileName))
+
+    def assertAgrees(self, nameList: list[str]) -> int:
+        """ Assert that every name the fast path accepts is classified the same way by the general classification.
+        Returns the number of names the fast path accepted. """
+
+        numAccepted = 0
+
+        for name in nameList:
+            classified = self.classifier.classifyCanonical(name)
+
+            if classified is not None:
+                numAccepted += 1
+                self.assertEqual(self.classifyGeneral(name), classified, name)
+
+        return numAccepted
+
+    def testReleaseNamesUnchanged(self):
+        self.assertGreater(self.assertAgrees(self.corpus), 0)
+
+    def testRenamedNamesUseFastPath(self):
+        """ The names release names are renamed to are recognized by the fast path, which reads them as the general
+        classification does. """
+
+        renamedList = [cls("name.mkv", fields).getNewFileName()
+                       for cls, fields in filter(None, map(self.classifier.classify, self.corpus))]
+
+        self.assertGreater(self.assertAgrees(renamedList), 0.99 * len(renamedList))
+
+    def testTagsInTitlesRejected(self):
+        """ Resolutions and encodings outside the tags are left to the general classification, which reads them as
+        tags, so that the file is renamed with them as tags. """
+
+        for name in ["History Below Shingeki 20x10 1080p", "Explosion Adventures 20x19 480p H264", "Rick 1x02 2160p",
+                     "Rick 1x02 H.264", "Rick 1x02 Room264", "Rick 1x02 Foo 1080p Bar [720p]", "Room 264 (1998)",
+                     "Rick (2645)"]:
+            with self.subTest(name=name):
+                self.assertIsNone(self.classifier.classifyCanonical(name))
+
+        cls, fields = self.classifier.classify("History Below Shingeki 20x10 1080p")
+        self.assertEqual("1080p", fields["resolution"])
+        self.assertEqual("History Below Shingeki 20x10 [1080p]", cls("name.mkv", fields).getNewFileName())
+
+    def testCanonicalNames(self):
+        for name, cls in [("Rick and Morty 1x02", Show), ("Rick and Morty 1x02 Lawnmower Dog", Show),
+                          ("Rick and Morty 1x02 Lawnmower Dog [720p] [x265]", Show), ("Rick and Morty 1x02 [x264]", Show),
+                          ("American History X (1998)", Movie), ("American History X (1998) [1080p] [x264]", Movie)]:
+            with self.subTest(name=name):
+                classified = self.classifier.classifyCanonical(name)
+                self.assertIsNotNone(classified)
+                self.assertIs(cls, classified[0])
+                self.assertEqual(name, cls("name.mkv", classified[1]).getNewFileName())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,17 @@
+from typing import Callable, Iterator, TYPE_CHECKING
 from cinema import Cinema
+from parseStats import ParseStats
 from view import View
-from parser import Parser
-from fileHandler import FileHandler
-from databasePickle import DatabasePickle
 from inputValidator import InputValidator
 
+if TYPE_CHECKING:  # imported when first used, so runs that don't need them don't pay for them
+    from parser import Parser
+    from fileHandler import FileHandler
+    from databaseJournal import DatabaseJournal
+    from integrationExecutor import IntegrationResult
+    from pipeline import Pipeline
+    from renamePlanner import RenamePlanner
+
 
 # todo make into package(s)
 
@@ -12,9 +19,9 @@ from inputValidator import InputValidator
 class Controller:
     """ The controller in the MVC architecture. """
 
-    __parser = Parser()
-    __database = DatabasePickle()
-    __handler = FileHandler(__database)
+    __parser: "Parser" or None = None  # built on first use, see __getParser
+    __database: "DatabaseJournal" or None = None  # built on first use, see __getDatabase
+    __handler: "FileHandler" or None = None
     __validator = InputValidator()
 
     def __init__(self, model: list, view: View):
@@ -28,58 +35,184 @@ class Controller:
     # PARSER #
     ##########
 
-    def parseCinemaPaths(self, model: list[str] or str) -> None:
-        self.__parser.parseCinemaPaths(model)
+    @classmethod
+    def __getParser(cls) -> "Parser":
+        """ Return the Parser shared by all Controllers, building it the first time it is needed rather than when this
+        module is imported. Restoring backups never imports the parser. """
+
+        if cls.__parser is None:
+            from parser import Parser
+            cls.__parser = Parser()
+
+        return cls.__parser
+
+    def setScanOptions(self, maxDepth: int or None, excludeList: list[str], useCache: bool) -> None:
+        """ Set the directory search depth limit (None for no limit), the file/directory name patterns to skip, and
+        whether classification results of unchanged files are reused from the parse cache. """
+
+        parser = self.__getParser()
+        parser.setMaxDepth(maxDepth)
+        parser.setExcludeList(excludeList)
+        parser.setCacheEnabled(useCache)
+
+    def setMediaFilter(self, extensionList: list[str] or None, checkMagic: bool) -> None:
+        """ Set the media extensions (None for the defaults) that files need to be classified, and whether their first
+        bytes are checked against their container's signature. """
+
+        self.__getParser().setMediaFilter(extensionList, checkMagic)
+
+    def setProfiling(self, passed: bool) -> None:
+        self.__getParser().setProfiling(passed)
+
+    def getParseStats(self) -> ParseStats or None:
+        """ Per-stage counters and timings of the last parse, or None if profiling is disabled. """
+
+        return self.__getParser().getStats()
+
+    def setClassificationEngine(self, engine: str) -> None:  # throws ValueError for an unknown engine
+        self.__getParser().setEngine(engine)
+
+    def parseCinemaPaths(self, model: list[str] or str, workers: int = 1) -> None:
+        """ Parse the passed paths, classifying files with a pool of worker processes if more than one is given. """
+
+        self.__getParser().parseCinemaPaths(model, workers)
+
+    def parseManifest(self, manifestPathList: list[str] or str, workers: int = 1) -> None:
+        """ Parse the files listed in manifest files, without accessing the listed files. """
+
+        self.__getParser().parseManifest(manifestPathList, workers)
+
+    def iterCategorizedCinemaPaths(self, model: list[str] or str, workers: int = 1) -> Iterator[tuple[str, Cinema]]:
+        """ Stream (category, Cinema object) pairs while parsing. Categories are Parser.UNKNOWN, Parser.CANONICAL,
+        Parser.ALREADY_CORRECT, and Parser.PROCESSED. """
+
+        return self.__getParser().iterCategorizedCinemaPaths(model, workers)
 
     def getProcessedCinemaList(self) -> list[Cinema]:
-        return self.__parser.getProcessedCinemaList()
+        return self.__getParser().getProcessedCinemaList()
 
     def getUnknownCinemaList(self) -> list[Cinema]:
-        return self.__parser.getUnknownCinemaList()
+        return self.__getParser().getUnknownCinemaList()
+
+    def getCanonicalCinemaList(self) -> list[Cinema]:
+        return self.__getParser().getCanonicalCinemaList()
 
     def getAlreadyCorrectCinemaList(self) -> list[Cinema]:
-        return self.__parser.getAlreadyCorrectCinemaList()
+        return self.__getParser().getAlreadyCorrectCinemaList()
+
+    def getNumRejectedFiles(self) -> int:
+        return self.__getParser().getNumRejected()
 
     # def getErrorCinemaList(self) -> list[Cinema]:
-    #     return self.__parser.getErrorCinemaList()
+    #     return self.__getParser().getErrorCinemaList()
 
     ###########
     # HANDLER #
     ###########
 
+    @classmethod
+    def __getDatabase(cls) -> "DatabaseJournal":
+        """ Return the database shared by all Controllers, building it (which creates the backups directory, and
+        recovers interrupted journals) the first time a file is backed up, renamed, or restored, rather than when this
+        module is imported. """
+
+        if cls.__database is None:
+            from databaseJournal import DatabaseJournal
+            cls.__database = DatabaseJournal()
+
+        return cls.__database
+
+    @classmethod
+    def __getHandler(cls) -> "FileHandler":
+        if cls.__handler is None:
+            from fileHandler import FileHandler
+            cls.__handler = FileHandler(cls.__getDatabase())
+
+        return cls.__handler
+
     def getBackupsDir(self) -> str:
-        return self.__database.getBackupsAbsPath()
+        return self.__getDatabase().getBackupsAbsPath()
+
+    def getRecoveredBackups(self) -> list[tuple[str, Cinema]]:
+        """ The records of interrupted runs that were completed (DatabaseJournal.COMMIT) or rolled back
+        (DatabaseJournal.DELETE) when the database was built. """
+
+        return self.__getDatabase().getRecovered()
 
     def backup(self, obj: Cinema) -> None:  # throws ValueError if name is unchanged
         """ Create database record of Cinema object. """
 
-        self.__handler.backup(obj)
+        self.__getHandler().backup(obj)
 
     def backupOverwrite(self, obj: Cinema) -> None:
-        self.__handler.backupOverwrite(obj)
+        self.__getHandler().backupOverwrite(obj)
 
     def backupAppend(self, obj: Cinema) -> None:
-        self.__handler.backupAppend(obj)
+        self.__getHandler().backupAppend(obj)
 
     def deleteBackup(self, obj: Cinema) -> None:
-        self.__handler.deleteBackup(obj)
+        self.__getHandler().deleteBackup(obj)
 
     def rename(self, obj: Cinema) -> None:
         """ Rename the Cinema object's file. """
         
-        self.__handler.rename(obj)
+        self.__getHandler().rename(obj)
     
-    def integrateIntoLibrary(self, obj: Cinema, library: str, copyFlag: bool, overwriteFlag: bool) -> None:
+    def setCopyOptions(self, hardlinkFlag: bool, verifyFlag: bool = False) -> None:
+        """ Set whether files copied into a library may be hardlinked to their source on the same device, and whether
+        copies are verified, keeping the digest of each copied file in its backup record. """
+
+        self.__getHandler().setCopyOptions(hardlinkFlag, verifyFlag)
+
+    def integrateIntoLibrary(self, obj: Cinema, library: str, copyFlag: bool, overwriteFlag: bool) -> str or None:
         """ The object file is integrated into the provided library directory. The copy flag indicates if the file is meant to be copied from the original directory into the new one, or moved.
             The overwrite flag indicates if the file is to be overwritten when a conflict exists, or skipped. """
 
-        self.__handler.integrateIntoLibrary(obj, library, copyFlag, overwriteFlag)
+        return self.__getHandler().integrateIntoLibrary(obj, library, copyFlag, overwriteFlag)
+
+    def integrateManyIntoLibrary(self, taskList: list[tuple[Cinema, str]], copyFlag: bool, overwriteFlag: bool,
+                                 workers: int = 1, transferWorkers: int = 1) -> Iterator["IntegrationResult"]:
+        """ Integrate (Cinema object, library directory) pairs like integrateIntoLibrary, on a pool of threads if more
+        than one worker is given. Renames and moves within a device are done before copies and moves between devices,
+        which run with at most the transfer workers at once per pair of devices. A result with the object, its error
+        (None on success), and how its file got into the library is yielded as each one finishes, in no particular
+        order. """
+
+        from integrationExecutor import IntegrationExecutor
+
+        return IntegrationExecutor(self.__getHandler(), workers, transferWorkers).run(taskList, copyFlag, overwriteFlag)
+
+    def newPipeline(self, isInLibrary: Callable[[Cinema], bool], moviesDir: str or None, showsDir: str or None, copyFlag: bool,
+                    overwriteFlag: bool, workers: int = 4, transferWorkers: int = 2) -> "Pipeline":
+        """ Return a Pipeline that scans, backs up, and renames or integrates files through this controller as
+        connected stages. isInLibrary tells whether an object's file is already in its library. """
+
+        from pipeline import Pipeline
+
+        return Pipeline(self, isInLibrary, moviesDir, showsDir, copyFlag, overwriteFlag, workers, transferWorkers)
+
+    def newRenamePlanner(self, moviesDir: str or None, showsDir: str or None, copyFlag: bool,
+                         overwriteFlag: bool) -> "RenamePlanner":
+        """ Return a RenamePlanner that checks a batch for conflicts against the indexes of the libraries before any of
+        it is backed up or renamed. """
+
+        from renamePlanner import RenamePlanner
+
+        return RenamePlanner(self.__getHandler().getLibraryIndex, moviesDir, showsDir, copyFlag, overwriteFlag)
 
     def readObjFromBackup(self, path: str) -> Cinema:
-        return self.__handler.readObjFromBackup(path)
+        return self.__getHandler().readObjFromBackup(path)
+
+    def readObjsFromBackup(self, path: str) -> list[Cinema]:
+        return self.__getHandler().readObjsFromBackup(path)
+
+    def verifyDigest(self, obj: Cinema) -> bool or None:
+        """ Whether the object's library file matches the digest taken when it was copied, or None if none was. """
+
+        return self.__getHandler().verifyDigest(obj)
 
     def restoreBackupObj(self, obj: str) -> None:
-        self.__handler.restoreBackupObj(obj)
+        self.__getHandler().restoreBackupObj(obj)
 
     #############
     # VALIDATOR #
@@ -100,8 +233,20 @@ class Controller:
     def hasValidatedBackupArgs(self) -> bool:
         return self.__validator.hasBackup()
 
+    def hasValidatedManifestArgs(self) -> bool:
+        return self.__validator.hasManifest()
+
+    def hasProfileFlag(self) -> bool:
+        return self.__validator.hasProfileFlag()
+
+    def hasPipelineFlag(self) -> bool:
+        return self.__validator.hasPipelineFlag()
+
     def getCinemaArgs(self) -> list[str]:
         return self.__validator.getCinemaArgs()
 
     def getBackupArgs(self) -> list[str]:
         return self.__validator.getBackupArgs()
+
+    def getManifestArgs(self) -> list[str]:
+        return self.__validator.getManifestArgs()
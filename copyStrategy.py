@@ -0,0 +1,460 @@
+import os
+import sys
+import errno
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from typing import NamedTuple
+
+
+# Errors of a strategy's clone, link, or copy call that mean it can't be used between two filesystems
+UNSUPPORTED_ERRNOS = frozenset(code for code in (errno.EXDEV, errno.EOPNOTSUPP, getattr(errno, "ENOTSUP", None),
+                                                 errno.ENOSYS, errno.EINVAL, errno.EPERM, errno.ENOTTY, errno.EMLINK)
+                               if code is not None)
+
+
+class StrategyUnsupported(OSError):
+    """ Raised by a CopyStrategy when it can't be used between the source's and destination's filesystems. Anything
+    it copied up to its last checkpoint is kept for the next strategy to resume from. """
+    pass
+
+
+class CopyResult(NamedTuple):
+    """ How a file was copied, and the digest of its data if the copy was verified. """
+
+    strategy: str
+    digest: str or None  # "<algorithm>:<hex digest>"
+
+
+class CopyVerificationError(OSError):
+    """ Raised when the digest of a copied file doesn't match the digest of the data that was copied into it. The
+    copy is discarded, so copying again starts over. """
+    pass
+
+
+class FileHasher:
+    """ Hashes file data through a buffer that is allocated once per thread and reused for every file, so verifying
+    copies doesn't allocate a new buffer per read. BufferedCopy reads through the same buffer, so data it copies is
+    hashed in the same pass, without being read again. """
+
+    ALGORITHM = "sha256"
+    BUFFER_SIZE = 8 * 1024 * 1024
+
+    __local = threading.local()
+
+    @classmethod
+    def new(cls):
+        import hashlib
+
+        return hashlib.new(cls.ALGORITHM)
+
+    @classmethod
+    def getBuffer(cls) -> memoryview:
+        buffer = getattr(cls.__local, "buffer", None)
+
+        if buffer is None:
+            buffer = cls.__local.buffer = memoryview(bytearray(cls.BUFFER_SIZE))
+
+        return buffer
+
+    @classmethod
+    def update(cls, digest, inp, size: int or None = None) -> int:
+        """ Hash up to size bytes (or the rest of the file) from the current position of a binary file into a digest,
+        and return the number of bytes hashed. """
+
+        buffer = cls.getBuffer()
+        hashed = 0
+
+        while size is None or hashed < size:
+            count = inp.readinto(buffer if size is None else buffer[:min(len(buffer), size - hashed)])
+
+            if not count:
+                break
+
+            digest.update(buffer[:count])
+            hashed += count
+
+        return hashed
+
+    @classmethod
+    def hashFile(cls, path: str) -> str:
+        """ Return the "<algorithm>:<hex digest>" of a file's data. """
+
+        digest = cls.new()
+
+        with open(path, "rb", buffering=0) as inp:
+            cls.update(digest, inp)
+
+        return cls.format(digest)
+
+    @classmethod
+    def format(cls, digest) -> str:
+        return f"{cls.ALGORITHM}:{digest.hexdigest()}"
+
+
+class CopyCheckpoint:
+    """ Progress of a copy into a temporary file, kept in a small file beside it, so that an interrupted copy can be
+    resumed instead of started over. A checkpoint is only saved after the bytes before it have been flushed to disk,
+    and is only resumed from if the source is unchanged and the last bytes before it match the source's. """
+
+    SUFFIX = ".checkpoint"
+    VERIFY_SIZE = 1024 * 1024  # bytes before the checkpoint compared with the source when resuming
+
+    __src: str
+    __temp: str
+    __path: str
+    __srcSize: int
+    __srcMtimeNs: int
+
+    def __init__(self, src: str, temp: str):
+        srcStat = os.stat(src)
+        self.__src = src
+        self.__temp = temp
+        self.__path = f"{temp}{self.SUFFIX}"
+        self.__srcSize = srcStat.st_size
+        self.__srcMtimeNs = srcStat.st_mtime_ns
+
+    def getSrcSize(self) -> int:
+        return self.__srcSize
+
+    def getResumeOffset(self) -> int:
+        """ Return the offset the copy can resume from, or 0 if there's no checkpoint that can be trusted. """
+
+        import json
+
+        try:
+            with open(self.__path) as inp:
+                checkpointDict = json.load(inp)
+
+            offset = checkpointDict["offset"]
+
+            if (checkpointDict["size"] != self.__srcSize or checkpointDict["mtimeNs"] != self.__srcMtimeNs
+                    or not 0 < offset <= self.__srcSize or os.path.getsize(self.__temp) < offset):
+                return 0
+
+            start = max(0, offset - self.VERIFY_SIZE)
+
+            with open(self.__src, "rb") as srcInp, open(self.__temp, "rb") as tempInp:
+                srcInp.seek(start)
+                tempInp.seek(start)
+                if srcInp.read(offset - start) != tempInp.read(offset - start):
+                    return 0
+
+            return offset
+        except (OSError, ValueError, KeyError, TypeError):  # missing, unreadable, or from another version
+            return 0
+
+    def save(self, offset: int) -> None:
+        """ Record that the bytes of the temporary file before the offset are copied and on disk. The record is
+        replaced atomically, so an interruption leaves either the previous checkpoint or this one. """
+
+        import json
+
+        partial = f"{self.__path}.tmp"
+
+        with open(partial, "w") as outp:
+            json.dump({"size": self.__srcSize, "mtimeNs": self.__srcMtimeNs, "offset": offset}, outp)
+
+        os.replace(partial, self.__path)
+
+    def remove(self) -> None:
+        try:
+            os.remove(self.__path)
+        except FileNotFoundError:
+            pass
+
+
+class CopyStrategy(ABC):
+    """ One way of copying a file into a library. Strategies write into a temporary file that CopyEngine renames into
+    place once it is complete. They raise StrategyUnsupported when they can't be used between two filesystems, and any
+    other error when the copy itself failed. """
+
+    NAME: str
+    SAME_DEVICE_ONLY: bool = False  # strategies that can never work across devices aren't tried across them
+    STREAMS_DATA: bool = False  # strategies whose data passes through this process, and can be hashed as it does
+
+    @staticmethod
+    @abstractmethod
+    def isAvailable() -> bool:
+        """ Whether the strategy can be used at all on this platform. """
+
+    @abstractmethod
+    def copy(self, src: str, temp: str, checkpoint: CopyCheckpoint, digest=None) -> None:
+        """ Copy the source file into the temporary file, which may hold the start of an interrupted copy. Strategies
+        that stream the data hash all of the source's data into the digest, if one is given. """
+
+    @staticmethod
+    def _unsupportedOr(e: OSError) -> OSError:
+        """ Turn an error of the call a strategy depends on into StrategyUnsupported if its errno means the call isn't
+        supported between the two filesystems, and return any other error as it is. """
+
+        if e.errno in UNSUPPORTED_ERRNOS:
+            return StrategyUnsupported(e.errno, e.strerror, e.filename)
+
+        return e
+
+
+class ReflinkCopy(CopyStrategy):
+    """ Clone the source's data blocks into the destination with the FICLONE ioctl (Btrfs, XFS, bcachefs, ...). The
+    copy is instant and shares its blocks with the source until either one is written to. """
+
+    NAME = "reflink"
+    FICLONE = 0x40049409
+
+    @staticmethod
+    def isAvailable() -> bool:
+        return sys.platform.startswith("linux")
+
+    def copy(self, src: str, temp: str, checkpoint: CopyCheckpoint, digest=None) -> None:
+        import fcntl
+
+        # Not truncated when opened, so an interrupted copy in the file is kept if cloning isn't supported
+        with open(src, "rb") as inp, open(os.open(temp, os.O_WRONLY | os.O_CREAT, 0o666), "wb") as outp:
+            try:
+                fcntl.ioctl(outp.fileno(), self.FICLONE, inp.fileno())
+            except OSError as e:
+                raise self._unsupportedOr(e)
+
+            outp.truncate(checkpoint.getSrcSize())
+
+
+class HardlinkCopy(CopyStrategy):
+    """ Link the destination to the source's inode. Instant and uses no space, but the library file and the source are
+    then the same file, so it's only used when enabled with "[integration] hardlink". """
+
+    NAME = "hardlink"
+    SAME_DEVICE_ONLY = True
+
+    @staticmethod
+    def isAvailable() -> bool:
+        return hasattr(os, "link")
+
+    def copy(self, src: str, temp: str, checkpoint: CopyCheckpoint, digest=None) -> None:
+        link = f"{temp}.link"  # os.link won't replace an existing file, so the link is made beside it and moved over it
+
+        if os.path.lexists(link):  # left by an interrupted run
+            os.remove(link)
+
+        try:
+            os.link(src, link)
+        except OSError as e:
+            raise self._unsupportedOr(e)
+
+        try:
+            os.replace(link, temp)
+        except OSError:
+            os.remove(link)
+            raise
+
+
+class ChunkedCopy(CopyStrategy):
+    """ A strategy that copies the file a chunk at a time, saving a checkpoint after each chunk, and that resumes from
+    the last checkpoint left by any ChunkedCopy. """
+
+    CHECKPOINT_SIZE = 256 * 1024 * 1024
+
+    def copy(self, src: str, temp: str, checkpoint: CopyCheckpoint, digest=None) -> None:
+        srcSize = checkpoint.getSrcSize()
+        offset = checkpoint.getResumeOffset()
+
+        with open(src, "rb") as inp, open(temp, "r+b" if offset else "wb") as outp:
+            outp.truncate(offset)  # drops anything written after the checkpoint
+
+            if digest is not None and offset:  # the digest can't be checkpointed, so the copied start is hashed again
+                inp.seek(0)
+                FileHasher.update(digest, inp, offset)
+
+            while offset < srcSize:
+                size = self._copyChunk(inp, outp, offset, min(self.CHECKPOINT_SIZE, srcSize - offset), digest)
+
+                if size == 0:  # the source was truncated while it was being copied
+                    raise OSError(errno.EIO, f"Source ended at {offset} of {srcSize} bytes", src)
+
+                offset += size
+
+                if offset < srcSize:
+                    outp.flush()
+                    os.fsync(outp.fileno())
+                    checkpoint.save(offset)
+
+    @abstractmethod
+    def _copyChunk(self, inp, outp, offset: int, size: int, digest=None) -> int:
+        """ Copy up to size bytes from the offset of the source file to the same offset of the temporary file, and
+        return the number of bytes copied. """
+
+
+class CopyFileRangeCopy(ChunkedCopy):
+    """ Copy in the kernel with os.copy_file_range, in large chunks, without the data passing through this process.
+    Filesystems that support it may also clone or copy server-side (NFS, SMB). """
+
+    NAME = "copy_file_range"
+
+    @staticmethod
+    def isAvailable() -> bool:
+        return hasattr(os, "copy_file_range")
+
+    def _copyChunk(self, inp, outp, offset: int, size: int, digest=None) -> int:
+        copied = 0
+
+        while copied < size:
+            try:
+                count = os.copy_file_range(inp.fileno(), outp.fileno(), size - copied, offset + copied,
+                                           offset + copied)
+            except OSError as e:
+                raise self._unsupportedOr(e)
+
+            if count == 0:
+                break
+            copied += count
+
+        return copied
+
+
+class BufferedCopy(ChunkedCopy):
+    """ Read and write the file through FileHasher's reusable buffer. Works everywhere, so it ends every chain. Each
+    read is hashed from the buffer before it is written, if a digest is given. """
+
+    NAME = "buffered"
+    STREAMS_DATA = True
+
+    @staticmethod
+    def isAvailable() -> bool:
+        return True
+
+    def _copyChunk(self, inp, outp, offset: int, size: int, digest=None) -> int:
+        inp.seek(offset)
+        outp.seek(offset)
+        buffer = FileHasher.getBuffer()
+        copied = 0
+
+        while copied < size:
+            count = inp.readinto(buffer[:min(len(buffer), size - copied)])
+
+            if not count:
+                break
+
+            if digest is not None:
+                digest.update(buffer[:count])
+
+            outp.write(buffer[:count])
+            copied += count
+
+        return copied
+
+
+class CopyEngine:
+    """ Copies files into libraries with the first strategy of a chain that works between the source's and
+    destination's devices: reflink, then hardlink (if enabled), then copy_file_range, then a buffered copy. Which
+    strategies don't work is learned per (source device, destination device) pair the first time each is tried, so
+    later copies between the same devices go straight to one that does. It can be shared by threads.
+
+    Files are copied into a temporary file beside the destination, and renamed over it only once they are complete, so
+    the destination never holds part of a file. A copy that is interrupted leaves its temporary file and a checkpoint,
+    and copying the same source to the same destination again resumes from the checkpoint.
+
+    Copies can be verified. A buffered copy hashes the data as it streams through, so the source is never read twice,
+    and the temporary file is hashed and compared with it before being renamed into place. Reflinks and hardlinks share
+    the source's blocks, so only the temporary file is hashed, for the digest. copy_file_range isn't used when
+    verifying, as its data never passes through this process, and it would have to be read back from both files. """
+
+    PART_SUFFIX = ".crpart"
+
+    __strategyList: list[CopyStrategy]
+    __unsupportedDict: dict[tuple[int, int], set[str]]  # {(source device, destination device): {strategy name, ...}}
+    __verifyFlag: bool
+    __lock: threading.Lock
+
+    def __init__(self, hardlinkFlag: bool = False, verifyFlag: bool = False):
+        strategyTypes = [ReflinkCopy, HardlinkCopy, CopyFileRangeCopy, BufferedCopy]
+
+        if not hardlinkFlag:
+            strategyTypes.remove(HardlinkCopy)
+
+        if verifyFlag:
+            strategyTypes.remove(CopyFileRangeCopy)
+
+        self.__strategyList = [strategyType() for strategyType in strategyTypes if strategyType.isAvailable()]
+        self.__unsupportedDict = {}
+        self.__verifyFlag = verifyFlag
+        self.__lock = threading.Lock()
+
+    def getStrategyNames(self) -> list[str]:
+        return [strategy.NAME for strategy in self.__strategyList]
+
+    def getSupportedStrategyNames(self, srcDev: int, dstDev: int) -> list[str]:
+        """ The strategies that will be tried between two devices, in order, leaving out those already found to fail
+        between them. """
+
+        with self.__lock:
+            unsupported = self.__unsupportedDict.get((srcDev, dstDev), set())
+            return [strategy.NAME for strategy in self.__strategyList if strategy.NAME not in unsupported
+                    and not (strategy.SAME_DEVICE_ONLY and srcDev != dstDev)]
+
+    def isVerifying(self) -> bool:
+        return self.__verifyFlag
+
+    def copy(self, src: str, dst: str) -> CopyResult:
+        """ Copy the source file to the destination path, replacing any file there, and return the name of the
+        strategy that copied it, with the digest of the file if copies are verified. The destination's directory has
+        to exist. Raises shutil.SameFileError if both paths are the same path, as shutil.copy does, and
+        CopyVerificationError if the copy doesn't match the data read from the source. """
+
+        temp = f"{dst}{self.PART_SUFFIX}"
+
+        if os.path.exists(dst) and os.path.samefile(src, dst):
+            if os.path.normcase(os.path.abspath(src)) == os.path.normcase(os.path.abspath(dst)):
+                raise shutil.SameFileError(f"{src!r} and {dst!r} are the same file")
+
+        # Hardlinks of the source, from earlier integrations. Copying into them would write into the source
+        for path in (dst, temp):
+            if os.path.exists(path) and os.path.samefile(src, path):
+                os.remove(path)
+
+        checkpoint = CopyCheckpoint(src, temp)
+        srcDev = os.stat(src).st_dev
+        dstDev = os.stat(os.path.dirname(dst) or ".").st_dev
+        lastError = None
+
+        for strategy in self.__strategyList:
+            if strategy.SAME_DEVICE_ONLY and srcDev != dstDev:
+                continue
+
+            with self.__lock:
+                if strategy.NAME in self.__unsupportedDict.get((srcDev, dstDev), ()):
+                    continue
+
+            digest = FileHasher.new() if self.__verifyFlag and strategy.STREAMS_DATA else None
+
+            try:
+                strategy.copy(src, temp, checkpoint, digest)
+            except StrategyUnsupported as e:
+                lastError = e
+                with self.__lock:
+                    self.__unsupportedDict.setdefault((srcDev, dstDev), set()).add(strategy.NAME)
+                continue
+
+            if not isinstance(strategy, HardlinkCopy):  # a link already is the source, permissions and all
+                self.__finish(src, temp)
+
+            fileDigest = FileHasher.hashFile(temp) if self.__verifyFlag else None
+
+            if digest is not None and fileDigest != FileHasher.format(digest):
+                checkpoint.remove()
+                os.remove(temp)
+                raise CopyVerificationError(errno.EIO, "COPY VERIFICATION FAILED", dst)
+
+            os.replace(temp, dst)
+            checkpoint.remove()
+            return CopyResult(strategy.NAME, fileDigest)
+
+        raise lastError or OSError(errno.ENOTSUP, f"No copy strategy available for {src}")
+
+    @staticmethod
+    def __finish(src: str, temp: str) -> None:
+        """ Give the temporary file the source's permission bits, as shutil.copy does, and flush it to disk, so that
+        the file renamed into place is complete even after a crash. """
+
+        shutil.copymode(src, temp)
+
+        with open(temp, "rb+") as outp:
+            os.fsync(outp.fileno())
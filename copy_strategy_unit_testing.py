@@ -0,0 +1,191 @@
+import os
+import errno
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from copyStrategy import ChunkedCopy, CopyCheckpoint, CopyEngine, CopyFileRangeCopy, ReflinkCopy
+
+CHUNK_SIZE = 1024 * 1024  # checkpoint interval used by the tests, instead of ChunkedCopy's 256 MiB
+FILE_SIZE = 5 * CHUNK_SIZE + 12345
+
+
+class Interrupted(OSError):
+    """ Raised in place of a crash in the middle of a copy. """
+    pass
+
+
+class ResumableCopyTestCase(unittest.TestCase):
+    """ Copies are interrupted right after a checkpoint is saved, as a crash would leave them, and then copied again. """
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp()
+        self.src = os.path.join(self.testDir, "source.mkv")
+        self.dst = os.path.join(self.testDir, "destination.mkv")
+        self.temp = f"{self.dst}{CopyEngine.PART_SUFFIX}"
+        self.checkpointPath = f"{self.temp}{CopyCheckpoint.SUFFIX}"
+
+        with open(self.src, "wb") as outp:
+            outp.write(os.urandom(FILE_SIZE))
+
+        patcher = mock.patch.object(ChunkedCopy, "CHECKPOINT_SIZE", CHUNK_SIZE)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.testDir)
+
+    def newEngine(self, copyFileRange: bool = False) -> CopyEngine:
+        """ An engine that copies with copy_file_range (if asked for and available) and the buffered copy. Reflinks are
+        left out, as they copy in a single call that can't be interrupted. """
+
+        with mock.patch.object(ReflinkCopy, "isAvailable", return_value=False), \
+                mock.patch.object(CopyFileRangeCopy, "isAvailable",
+                                  return_value=copyFileRange and hasattr(os, "copy_file_range")):
+            return CopyEngine()
+
+    def interruptAfter(self, numCheckpoints: int):
+        """ Patch checkpoints so the copy stops right after the given number of them are saved. """
+
+        save = CopyCheckpoint.save
+        saved = []
+
+        def saveThenStop(checkpoint: CopyCheckpoint, offset: int) -> None:
+            save(checkpoint, offset)
+            saved.append(offset)
+
+            if len(saved) == numCheckpoints:
+                raise Interrupted(errno.EINTR, "Interrupted")
+
+        return mock.patch.object(CopyCheckpoint, "save", saveThenStop)
+
+    def interruptedCopy(self, numCheckpoints: int = 2) -> None:
+        with self.interruptAfter(numCheckpoints):
+            self.assertRaises(Interrupted, self.newEngine().copy, self.src, self.dst)
+
+        self.assertTrue(os.path.exists(self.temp))
+        self.assertTrue(os.path.exists(self.checkpointPath))
+        self.assertFalse(os.path.exists(self.dst))
+
+    def copyRecordingOffsets(self, engine: CopyEngine) -> tuple[str, list[int]]:
+        """ Copy again, returning the strategy that finished the copy and the offset each strategy resumed from. """
+
+        offsetList = []
+        getResumeOffset = CopyCheckpoint.getResumeOffset
+
+        def recordOffset(checkpoint: CopyCheckpoint) -> int:
+            offsetList.append(getResumeOffset(checkpoint))
+            return offsetList[-1]
+
+        with mock.patch.object(CopyCheckpoint, "getResumeOffset", recordOffset):
+            strategy = engine.copy(self.src, self.dst).strategy
+
+        return strategy, offsetList
+
+    def resumedOffset(self, engine: CopyEngine) -> int:
+        return self.copyRecordingOffsets(engine)[1][0]
+
+    def assertCopied(self):
+        with open(self.src, "rb") as srcInp, open(self.dst, "rb") as dstInp:
+            self.assertEqual(srcInp.read(), dstInp.read())
+
+        self.assertFalse(os.path.exists(self.temp))
+        self.assertFalse(os.path.exists(self.checkpointPath))
+
+    def testCopyWithoutInterruption(self):
+        self.assertEqual("buffered", self.newEngine().copy(self.src, self.dst).strategy)
+        self.assertCopied()
+
+    def testResumeFromCheckpoint(self):
+        self.interruptedCopy(2)
+        self.assertEqual(2 * CHUNK_SIZE, self.resumedOffset(self.newEngine()))
+        self.assertCopied()
+
+    def testResumeDropsBytesAfterCheckpoint(self):
+        self.interruptedCopy(2)
+
+        with open(self.temp, "ab") as outp:  # written after the checkpoint before the crash, past the source's end
+            outp.write(b"\0" * FILE_SIZE)
+
+        self.assertEqual(2 * CHUNK_SIZE, self.resumedOffset(self.newEngine()))
+        self.assertCopied()
+
+    def testStaleCheckpointAfterSourceSizeChange(self):
+        self.interruptedCopy(2)
+
+        with open(self.src, "ab") as outp:
+            outp.write(os.urandom(1000))
+
+        self.assertEqual(0, self.resumedOffset(self.newEngine()))
+        self.assertCopied()
+
+    def testStaleCheckpointAfterSourceMtimeChange(self):
+        self.interruptedCopy(2)
+        srcStat = os.stat(self.src)
+        os.utime(self.src, ns=(srcStat.st_atime_ns, srcStat.st_mtime_ns + 10 ** 9))
+
+        self.assertEqual(0, self.resumedOffset(self.newEngine()))
+        self.assertCopied()
+
+    def testStaleCheckpointAfterCopiedBytesChange(self):
+        self.interruptedCopy(2)
+
+        with open(self.temp, "r+b") as outp:  # the bytes before the checkpoint no longer match the source
+            outp.seek(2 * CHUNK_SIZE - 10)
+            outp.write(b"corrupted!")
+
+        self.assertEqual(0, self.resumedOffset(self.newEngine()))
+        self.assertCopied()
+
+    def testCorruptCheckpointRestarts(self):
+        self.interruptedCopy(2)
+
+        with open(self.checkpointPath, "w") as outp:
+            outp.write("{not json")
+
+        self.assertEqual(0, self.resumedOffset(self.newEngine()))
+        self.assertCopied()
+
+    def testRepeatedInterruptions(self):
+        self.interruptedCopy(1)
+
+        with self.interruptAfter(2):
+            self.assertRaises(Interrupted, self.newEngine().copy, self.src, self.dst)
+
+        self.assertEqual(3 * CHUNK_SIZE, self.resumedOffset(self.newEngine()))
+        self.assertCopied()
+
+    @unittest.skipUnless(hasattr(os, "copy_file_range"), "copy_file_range isn't available")
+    def testFallbackFromCopyFileRangeMidFile(self):
+        """ copy_file_range stops being supported after two chunks, and the buffered copy picks up from its last
+        checkpoint. """
+
+        copyFileRange = os.copy_file_range
+        calls = []
+
+        def unsupportedAfterTwoChunks(*args) -> int:
+            calls.append(args)
+
+            if len(calls) > 2:
+                raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+            return copyFileRange(*args)
+
+        engine = self.newEngine(copyFileRange=True)
+        self.assertEqual(["copy_file_range", "buffered"], engine.getStrategyNames())
+
+        with mock.patch("os.copy_file_range", unsupportedAfterTwoChunks):
+            strategy, offsetList = self.copyRecordingOffsets(engine)
+
+        self.assertEqual("buffered", strategy)
+        self.assertEqual([0, 2 * CHUNK_SIZE], offsetList)
+        self.assertCopied()
+
+        # copy_file_range is no longer tried between the two devices
+        dev = os.stat(self.testDir).st_dev
+        self.assertEqual(["buffered"], engine.getSupportedStrategyNames(dev, dev))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -23,6 +23,18 @@ class Database(ABC):
     def read(self, record: str) -> Cinema:
         """ Read a record from the database. """
 
+    @abstractmethod
+    def readAll(self, path: str) -> list[Cinema]:
+        """ Read every record of a backup. """
+
+    @abstractmethod
+    def addLibrary(self, path: str):
+        """ Note a library that records' files may be integrated into. """
+
+    @abstractmethod
+    def commit(self):
+        """ Make the records written so far durable, before the files they back up are renamed. """
+
     @abstractmethod
     def delete(self, record: Cinema):
         """ Delete a record from the database. """
@@ -0,0 +1,479 @@
+import os
+import time
+import zlib
+import atexit
+import pickle
+import struct
+import threading
+from database import Database
+from cinema import Cinema
+
+
+class DatabaseJournal(Database):
+    """ Concrete Cinema database implementation that appends the records of a run to a single journal file, instead of
+    writing a file per record. Records are buffered and written to the journal together, and are only flushed to disk
+    (fsync) when commit is called before files are renamed, so a whole batch of backups costs one write and one fsync.
+
+    Every record written before its file is renamed is an intent, and the record written after it (with its new
+    directory path set) completes it. A journal ends with a commit entry when its run closes normally. Journals left
+    without one are recovered when the next DatabaseJournal is built: the files of incomplete intents are looked up at
+    their new names, in their old directory and in the libraries the run used, and the intent is completed if the file
+    is found there, or rolled back (its record deleted) if the file is still at its old path.
+
+    A run holds an exclusive lock on its journal until it closes, and the journal's name holds the run's pid. Journals
+    that are locked, or whose run's process is still alive, belong to a run in progress and are never recovered.
+
+    Journals are also backups: restoring one restores every completed record in it that hasn't been restored yet.
+    Single-record pickle backups from older versions are still read. """
+
+    PICKLE_PROTOCOL = 4
+    __filePath = os.path.dirname(os.path.abspath(__file__))
+    BACKUP_PATH = f"{__filePath}\\Cinema Renamer Backups"
+    EXT = ".crj"
+
+    # Entries: (RECORD, backup name, pickled Cinema), (DELETE, backup name), (LIBRARY, path), (COMMIT,)
+    RECORD = "record"
+    DELETE = "delete"
+    LIBRARY = "library"
+    COMMIT = "commit"
+
+    __HEADER = struct.Struct("<II")  # (length, crc32) of each pickled entry
+    __LOCK_OFFSET = 0x7FFFFFFE  # byte locked on Windows, past any entry, so the lock doesn't block reading or appending
+
+    __journalPath: str or None  # the run's journal, created with the first entry
+    __journalLock: int or None  # descriptor holding the lock on the run's journal
+    __pendingList: list[bytes]  # framed entries not yet written
+    __needsSync: bool  # whether a pending entry has to be on disk before files are touched
+    __liveDict: dict[str, bytes]  # {backup name: pickled record, ...} of this run's records
+    __libraryList: list[str]
+    __sourceDict: dict[str, str]  # {backup name: journal or pickle backup path, ...} of records read from backups
+    __recoveredList: list[tuple[str, Cinema]]  # [(COMMIT or DELETE, record), ...] resolved by recovery
+    __lock: threading.RLock
+    __closed: bool
+
+
+
+    def __init__(self):
+        if not os.path.exists(self.BACKUP_PATH):
+            os.mkdir(self.BACKUP_PATH)
+
+        self.__journalPath = None
+        self.__journalLock = None
+        self.__pendingList = []
+        self.__needsSync = False
+        self.__liveDict = {}
+        self.__libraryList = []
+        self.__sourceDict = {}
+        self.__lock = threading.RLock()
+        self.__closed = False
+        self.__recoveredList = self.__recover()
+
+        atexit.register(self.close)
+
+
+
+    def getBackupsAbsPath(self) -> str:
+        return os.path.join(os.getcwd(), self.BACKUP_PATH)
+
+
+
+    def getRecovered(self) -> list[tuple[str, Cinema]]:
+        """ Return the (COMMIT or DELETE, record) pairs of the incomplete intents that were completed or rolled back
+        when this database was built. """
+
+        return self.__recoveredList
+
+
+
+    def create(self, record: Cinema) -> None:
+        """ Create new record. Raises FileExistsError if the run already has a record with the backup name. """
+
+        with self.__lock:
+            if record.getBackupName() in self.__liveDict:
+                raise FileExistsError(f"BACKUP EXISTS: {record.getBackupName()}")
+
+            self.update(record)
+
+
+
+    def update(self, record: Cinema) -> None:
+        """ Overwrite an existing record. """
+
+        data = pickle.dumps(record, self.PICKLE_PROTOCOL)  # taken now, as the object keeps changing
+
+        with self.__lock:
+            self.__liveDict[record.getBackupName()] = data
+            self.__append((self.RECORD, record.getBackupName(), data), not self.__isDone(record))
+
+
+
+    def createAppend(self, record: Cinema) -> None:
+        with self.__lock:
+            backupName = record.getBackupName()
+            append = ""
+            i = 1
+
+            while f"{backupName}{append}" in self.__liveDict:  # folder.file.ext(1)
+                append = f"({i})"
+                i += 1
+
+            # If the record was appended, update the obj's attribute
+            if append != "":
+                record.setBackupName(backupName + append)
+
+            self.create(record)
+
+
+
+    def addLibrary(self, path: str) -> None:
+        """ Record a library that files may be integrated into, so that recovery can find them there. """
+
+        with self.__lock:
+            if path not in self.__libraryList:
+                self.__libraryList.append(path)
+                self.__append((self.LIBRARY, path), True)
+
+
+
+    def commit(self) -> None:
+        """ Write the pending entries, and flush them to disk if any has to be there before files are touched. All
+        the entries of a batch are flushed together by the first commit after them. """
+
+        with self.__lock:
+            if self.__needsSync:
+                self.__write(True)
+
+
+
+    def read(self, path: str) -> Cinema:
+        """ Read the only record of a backup. Raises ValueError if the file isn't a backup, or holds more than one. """
+
+        recordList = self.readAll(path)
+
+        if len(recordList) != 1:
+            raise ValueError()
+
+        return recordList[0]
+
+
+
+    def readAll(self, path: str) -> list[Cinema]:
+        """ Read the completed records of a journal that haven't been restored, or the record of an older pickle
+        backup. Raises ValueError if the file isn't a backup. """
+
+        if os.path.splitext(path)[1] != self.EXT:
+            try:
+                with open(path, "rb") as inp:  # read bytes
+                    record = pickle.load(inp)
+            except (pickle.UnpicklingError, EOFError):
+                raise ValueError()
+
+            with self.__lock:
+                self.__sourceDict[record.getBackupName()] = path
+
+            return [record]
+
+        with open(path, "rb") as inp:
+            data = inp.read()
+
+        entryList, _ = self.__parse(data)
+
+        if not entryList and data:
+            raise ValueError()
+
+        recordList = []
+
+        for record in self.__replay(entryList)[0].values():
+            if self.__isDone(record):
+                recordList.append(record)
+                with self.__lock:
+                    self.__sourceDict[record.getBackupName()] = path
+
+        return recordList
+
+
+
+    def delete(self, record: Cinema) -> None:  # throws FileNotFoundError
+        """ Delete a record, from the backup it was read from if it was restored, or from this run's journal. Older
+        pickle backups are deleted, as DatabasePickle deletes them. """
+
+        backupName = record.getBackupName()
+
+        with self.__lock:
+            sourcePath = self.__sourceDict.pop(backupName, None)
+
+            if sourcePath is not None and os.path.splitext(sourcePath)[1] != self.EXT:
+                os.remove(sourcePath)
+                return
+
+            if sourcePath is not None:
+                # Committed again, so that recovery doesn't take the restored journal for an interrupted one
+                self.__appendTo(sourcePath, [self.__frame((self.DELETE, backupName)), self.__frame((self.COMMIT,))])
+                return
+
+            if backupName not in self.__liveDict:
+                raise FileNotFoundError(f"NO BACKUP: {backupName}")
+
+            del self.__liveDict[backupName]
+            self.__append((self.DELETE, backupName), False)
+
+
+
+    def close(self) -> None:
+        """ Write the pending entries and mark the run's journal complete. Called when the process exits. """
+
+        with self.__lock:
+            if self.__closed:
+                return
+
+            self.__closed = True
+
+            if self.__journalPath is not None or self.__pendingList:
+                self.__pendingList.append(self.__frame((self.COMMIT,)))
+                self.__write(True)
+
+            if self.__journalLock is not None:
+                self.__unlockFile(self.__journalLock)
+                self.__journalLock = None
+
+
+
+    ############
+    # RECOVERY #
+    ############
+
+    def __recover(self) -> list[tuple[str, Cinema]]:
+        """ Complete or roll back the incomplete intents of every journal without a commit entry, and commit it.
+        Journals of runs still in progress are left alone. """
+
+        recoveredList = []
+
+        for name in sorted(os.listdir(self.BACKUP_PATH)):
+            path = f"{self.BACKUP_PATH}\\{name}"
+            if os.path.splitext(name)[1] != self.EXT or not os.path.isfile(path) or self.__isRunAlive(name):
+                continue
+
+            lock = self.__lockFile(path, False)
+            if lock is None:  # locked by its run
+                continue
+
+            try:
+                recoveredList.extend(self.__recoverJournal(path))
+            finally:
+                self.__unlockFile(lock)
+
+        return recoveredList
+
+    def __recoverJournal(self, path: str) -> list[tuple[str, Cinema]]:
+        """ Complete or roll back the incomplete intents of a journal, if it has no commit entry, and commit it. Called
+        with the journal locked. """
+
+        recoveredList = []
+
+        with open(path, "rb") as inp:
+            data = inp.read()
+
+        entryList, validLength = self.__parse(data)
+
+        if entryList and entryList[-1][0] == self.COMMIT:
+            return recoveredList
+
+        recordDict, libraryList = self.__replay(entryList)
+        frameList = []
+
+        for backupName, record in recordDict.items():
+            if self.__isDone(record):
+                continue
+
+            newDirPath = self.__findNewDirPath(record, libraryList)
+
+            if newDirPath is not None:  # the rename happened, but its completion wasn't written
+                record.setNewDirPath(newDirPath)
+                frameList.append(self.__frame((self.RECORD, backupName,
+                                               pickle.dumps(record, self.PICKLE_PROTOCOL))))
+                recoveredList.append((self.COMMIT, record))
+            elif os.path.exists(record.getOldAbsPath()):  # the rename never happened
+                frameList.append(self.__frame((self.DELETE, backupName)))
+                recoveredList.append((self.DELETE, record))
+
+        frameList.append(self.__frame((self.COMMIT,)))
+
+        with open(path, "r+b") as outp:
+            outp.truncate(validLength)  # drops an entry torn by the interruption
+
+        self.__appendTo(path, frameList)
+
+        return recoveredList
+
+    @staticmethod
+    def __findNewDirPath(record: Cinema, libraryList: list[str]) -> str or None:
+        """ The directory the record's file is in under its new name: its old directory, or its new directory in
+        one of the libraries. None if it's in neither. """
+
+        newFileName = f"{record.getNewFileName()}{record.getFileExt()}"
+
+        for dirPath in [record.getOldDirPath()] + [f"{library}\\{record.getNewDir()}" for library in libraryList]:
+            if os.path.exists(f"{dirPath}\\{newFileName}"):
+                return dirPath
+
+        return None
+
+    #########
+    # OTHER #
+    #########
+
+    def __append(self, entry: tuple, needsSync: bool) -> None:
+        """ Buffer an entry. Called with the lock held. """
+
+        self.__pendingList.append(self.__frame(entry))
+        self.__needsSync = self.__needsSync or needsSync
+
+    def __write(self, sync: bool) -> None:
+        """ Write the pending entries to the run's journal, creating it first if needed. Called with the lock held. """
+
+        if self.__journalPath is None:
+            self.__journalPath = (f"{self.BACKUP_PATH}\\journal {time.strftime('%Y-%m-%d %H-%M-%S')} "
+                                  f"{os.getpid()}{self.EXT}")
+            self.__journalLock = self.__lockFile(self.__journalPath, True)  # created by taking the lock
+
+        self.__appendTo(self.__journalPath, self.__pendingList, sync)
+        self.__pendingList = []
+        self.__needsSync = False
+
+    @staticmethod
+    def __appendTo(path: str, frameList: list[bytes], sync: bool = True) -> None:
+        with open(path, "ab") as outp:
+            outp.write(b"".join(frameList))
+
+            if sync:
+                outp.flush()
+                os.fsync(outp.fileno())
+
+    @classmethod
+    def __lockFile(cls, path: str, wait: bool) -> int or None:
+        """ Open a journal, creating it if needed, and take its exclusive lock. Return the descriptor holding the lock,
+        or None if another run holds it and not waiting for it. The lock is released when the process ends. """
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o666)
+
+        try:
+            if os.name == "nt":
+                import msvcrt
+                os.lseek(fd, cls.__LOCK_OFFSET, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_LOCK if wait else msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(fd, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+
+            if wait:
+                raise
+            return None
+
+        return fd
+
+    @classmethod
+    def __unlockFile(cls, fd: int) -> None:
+        try:
+            if os.name == "nt":
+                import msvcrt
+                os.lseek(fd, cls.__LOCK_OFFSET, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)  # releases the flock
+
+    @classmethod
+    def __isRunAlive(cls, name: str) -> bool:
+        """ Whether the process of the run that wrote a journal, by the pid in its name, is still alive. Covers the
+        moment between a journal's creation and its run taking the lock. A pid reused by another process only delays
+        the recovery of its journal. """
+
+        pid = os.path.splitext(name)[0].rsplit(" ", 1)[-1]
+
+        if not pid.isdigit():
+            return False
+
+        pid = int(pid)
+
+        if pid == os.getpid():
+            return True
+
+        if os.name == "nt":  # os.kill would terminate the process
+            import ctypes
+
+            kernel32 = ctypes.windll.kernel32
+            handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+
+            if not handle:
+                return False
+
+            try:
+                exitCode = ctypes.c_ulong()
+                return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(exitCode))) and exitCode.value == 259
+            finally:  # 259 is STILL_ACTIVE
+                kernel32.CloseHandle(handle)
+
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:  # alive, but another user's
+            return True
+
+        return True
+
+    @classmethod
+    def __frame(cls, entry: tuple) -> bytes:
+        data = pickle.dumps(entry, cls.PICKLE_PROTOCOL)
+        return cls.__HEADER.pack(len(data), zlib.crc32(data)) + data
+
+    @classmethod
+    def __parse(cls, data: bytes) -> tuple[list[tuple], int]:
+        """ Return the entries of a journal, and the length of the journal up to the last entry that is whole. """
+
+        entryList = []
+        offset = 0
+
+        while offset + cls.__HEADER.size <= len(data):
+            length, crc = cls.__HEADER.unpack_from(data, offset)
+            start = offset + cls.__HEADER.size
+            frame = data[start:start + length]
+
+            if len(frame) != length or zlib.crc32(frame) != crc:
+                break
+
+            try:
+                entryList.append(pickle.loads(frame))
+            except Exception:
+                break
+
+            offset = start + length
+
+        return entryList, offset
+
+    @classmethod
+    def __replay(cls, entryList: list[tuple]) -> tuple[dict[str, Cinema], list[str]]:
+        """ Return the live records of a journal's entries, by backup name, and its libraries. """
+
+        recordDict = {}
+        libraryList = []
+
+        for entry in entryList:
+            if entry[0] == cls.RECORD:
+                recordDict[entry[1]] = entry[2]
+            elif entry[0] == cls.DELETE:
+                recordDict.pop(entry[1], None)
+            elif entry[0] == cls.LIBRARY:
+                libraryList.append(entry[1])
+
+        return {name: pickle.loads(data) for name, data in recordDict.items()}, libraryList
+
+    @staticmethod
+    def __isDone(record: Cinema) -> bool:
+        """ Whether a record was written after its file was renamed, which is when its new directory path is set. """
+
+        try:
+            return record.getNewDirPath() is not None
+        except AttributeError:
+            return False
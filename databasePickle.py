@@ -70,6 +70,23 @@ class DatabasePickle(Database):
 
 
 
+    def readAll(self, path: str) -> list[Cinema]:
+        return [self.read(path)]
+
+
+
+    def addLibrary(self, path: str) -> None:
+        pass
+
+
+
+    def commit(self) -> None:
+        """ Every record is written to its own file as soon as it is made, so there's nothing to commit. """
+
+        pass
+
+
+
     def delete(self, record: Cinema) -> None:  # throws FileNotFoundError
         """ Delete backup file from Cinema object. """
 
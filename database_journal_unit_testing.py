@@ -0,0 +1,335 @@
+import os
+import sys
+import pickle
+import shutil
+import struct
+import copyreg
+import tempfile
+import subprocess
+import unittest
+from unittest import mock
+
+from cinema import Cinema
+from movie import Movie
+from databaseJournal import DatabaseJournal
+from fileHandler import FileHandler
+
+
+def newMovie(dirPath: str, fileName: str = "American.History.X.1998.1080p.BluRay.x264", date: str = "1998") -> Movie:
+    """ A movie whose file exists under its old name. """
+
+    path = f"{dirPath}\\{fileName}.mkv"
+
+    with open(path, "wb") as outp:
+        outp.write(fileName.encode())
+
+    return Movie(path, {"title": "american history x", "date": date, "resolution": "1080p", "encoding": "264"})
+
+
+# Run in another process: backs up a movie in a journal, commits it, and waits to be told to exit or be killed
+RUN_SCRIPT = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from databaseJournal import DatabaseJournal
+from database_journal_unit_testing import newMovie
+DatabaseJournal.BACKUP_PATH = sys.argv[2]
+database = DatabaseJournal()
+database.create(newMovie(sys.argv[3]))
+database.commit()
+print("ready", flush=True)
+sys.stdin.readline()
+"""
+
+
+def getDeadPid() -> int:
+    """ The pid of a process that has exited. """
+
+    process = subprocess.Popen([sys.executable, "-c", ""])
+    process.wait()
+    return process.pid
+
+
+def getFrameEndList(data: bytes) -> list[int]:
+    """ The offset each whole entry of a journal ends at, following the (length, crc32) header of each one. """
+
+    header = struct.Struct("<II")
+    endList = []
+    offset = 0
+
+    while offset < len(data):
+        offset += header.size + header.unpack_from(data, offset)[0]
+        endList.append(offset)
+
+    return endList
+
+
+def readEntryList(path: str) -> list[tuple]:
+    with open(path, "rb") as inp:
+        data = inp.read()
+
+    entryList = []
+    offset = 0
+
+    for end in getFrameEndList(data):
+        entryList.append(pickle.loads(data[offset + 8:end]))
+        offset = end
+
+    return entryList
+
+
+class BaselinePickler(pickle.Pickler):
+    """ Pickles Cinema objects the way DatabasePickle did before Cinema objects had __slots__, with a plain attribute
+    dict as their state. """
+
+    def reducer_override(self, obj):
+        if isinstance(obj, Cinema):
+            state = {}
+            for cls in type(obj).__mro__:
+                for name in getattr(cls, "__slots__", ()):
+                    if hasattr(obj, name):
+                        state[name] = getattr(obj, name)
+
+            return copyreg.__newobj__, (type(obj),), state
+
+        return NotImplemented
+
+
+class DatabaseJournalTestCase(unittest.TestCase):
+    """ Journals are written to a temporary backups directory. """
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp()
+        self.backupDir = f"{self.testDir}\\backups"
+        self.cinemaDir = f"{self.testDir}\\cinema"
+        os.mkdir(self.cinemaDir)
+
+        patcher = mock.patch.object(DatabaseJournal, "BACKUP_PATH", self.backupDir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.databaseList = []
+
+    def tearDown(self):
+        for database in self.databaseList:
+            database.close()
+
+        shutil.rmtree(self.testDir)
+
+    def newDatabase(self) -> DatabaseJournal:
+        database = DatabaseJournal()
+        self.databaseList.append(database)
+        return database
+
+    def getJournalPathList(self) -> list[str]:
+        return sorted(f"{self.backupDir}\\{name}" for name in os.listdir(self.backupDir)
+                      if name.endswith(DatabaseJournal.EXT))
+
+    def startRun(self) -> subprocess.Popen:
+        """ Start a run in another process, and wait until its journal holds a committed intent. """
+
+        run = subprocess.Popen([sys.executable, "-c", RUN_SCRIPT, os.path.dirname(os.path.abspath(__file__)),
+                                self.backupDir, self.cinemaDir], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               text=True)
+        self.addCleanup(run.stdout.close)
+        self.addCleanup(run.stdin.close)
+        self.addCleanup(run.wait)
+        self.addCleanup(run.kill)
+        self.assertEqual("ready", run.stdout.readline().strip())
+        return run
+
+
+class LegacyPickleRestoreTestCase(DatabaseJournalTestCase):
+
+    def testRestoreBaselinePickle(self):
+        """ A file renamed by a version that wrote a pickle per record is restored from the pickle, which is then
+        deleted. """
+
+        movie = newMovie(self.cinemaDir)
+        oldAbsPath = movie.getOldAbsPath()
+        os.mkdir(self.backupDir)
+        os.replace(oldAbsPath, movie.getNewAbsPath())
+        movie.setNewDirPath(movie.getOldDirPath())
+        backupPath = f"{self.backupDir}\\{movie.getBackupName()}.pkl"
+
+        with open(backupPath, "wb") as outp:
+            BaselinePickler(outp, DatabaseJournal.PICKLE_PROTOCOL).dump(movie)
+
+        handler = FileHandler(self.newDatabase())
+        recordList = handler.readObjsFromBackup(backupPath)
+        self.assertEqual(1, len(recordList))
+        self.assertIsNone(recordList[0].getDigest())
+
+        handler.restoreBackupObj(recordList[0])
+
+        self.assertTrue(os.path.exists(oldAbsPath))
+        self.assertFalse(os.path.exists(movie.getNewAbsPath()))
+        self.assertFalse(os.path.exists(backupPath))
+
+    def testDeleteUnreadRecordRaises(self):
+        movie = newMovie(self.cinemaDir)
+        self.assertRaises(FileNotFoundError, self.newDatabase().delete, movie)
+
+
+class JournalRecoveryTestCase(DatabaseJournalTestCase):
+    """ A run is interrupted with four movies backed up: the first renamed and completed, the second renamed without
+    its completion written, and the last two never renamed. Its journal is cut at and between each entry, as a crash
+    would leave it, and given the pid of a process that has exited. """
+
+    def setUp(self):
+        super().setUp()
+
+        self.movieList = [newMovie(self.cinemaDir, f"American.History.X.{date}.1080p.BluRay.x264", str(date))
+                          for date in range(1998, 2002)]
+        first, second, third, fourth = self.movieList
+
+        database = DatabaseJournal()
+
+        for movie in (first, second, third):
+            database.create(movie)
+        database.commit()
+
+        self.rename(first)
+        database.update(first)  # written with the next commit
+        database.create(fourth)
+        database.commit()
+        self.rename(second)
+
+        self.writtenPath, = self.getJournalPathList()
+
+        with open(self.writtenPath, "rb") as inp:
+            self.data = inp.read()
+
+        database.close()
+        os.remove(self.writtenPath)
+
+        self.journalPath = f"{self.backupDir}\\journal 2000-01-01 00-00-00 {getDeadPid()}{DatabaseJournal.EXT}"
+        self.frameEndList = getFrameEndList(self.data)
+
+    @staticmethod
+    def rename(movie: Movie) -> None:
+        os.replace(movie.getOldAbsPath(), movie.getNewAbsPath())
+        movie.setNewDirPath(movie.getOldDirPath())
+
+    def getExpected(self, numEntries: int) -> list[tuple[str, str]]:
+        """ The (COMMIT or DELETE, backup name) pairs recovered from a journal cut after its first entries. """
+
+        first, second, third, fourth = [movie.getBackupName() for movie in self.movieList]
+        return [[],
+                [(DatabaseJournal.COMMIT, first)],
+                [(DatabaseJournal.COMMIT, first), (DatabaseJournal.COMMIT, second)],
+                [(DatabaseJournal.COMMIT, first), (DatabaseJournal.COMMIT, second), (DatabaseJournal.DELETE, third)],
+                [(DatabaseJournal.COMMIT, second), (DatabaseJournal.DELETE, third)],
+                [(DatabaseJournal.COMMIT, second), (DatabaseJournal.DELETE, third), (DatabaseJournal.DELETE, fourth)]
+                ][numEntries]
+
+    def recover(self, data: bytes) -> list[tuple[str, str]]:
+        with open(self.journalPath, "wb") as outp:
+            outp.write(data)
+
+        return [(kind, record.getBackupName()) for kind, record in self.newDatabase().getRecovered()]
+
+    def assertRecovered(self, numEntries: int, data: bytes) -> None:
+        self.assertEqual(self.getExpected(numEntries), self.recover(data))
+
+        entryList = readEntryList(self.journalPath)
+        self.assertEqual((DatabaseJournal.COMMIT,), entryList[-1])
+        self.assertEqual(numEntries + 1 + len(self.getExpected(numEntries)), len(entryList))  # torn entry dropped
+        self.assertEqual([], self.newDatabase().getRecovered())
+
+    def testJournalEntries(self):
+        self.assertEqual(5, len(self.frameEndList))
+        self.assertEqual(len(self.data), self.frameEndList[-1])
+
+    def testRecoverAtEachEntry(self):
+        for numEntries, end in enumerate([0] + self.frameEndList):
+            with self.subTest(numEntries=numEntries):
+                self.assertRecovered(numEntries, self.data[:end])
+
+    def testRecoverTornEntry(self):
+        for numEntries, (start, end) in enumerate(zip([0] + self.frameEndList, self.frameEndList)):
+            for cut in (start + 4, start + 8, (start + end) // 2, end - 1):
+                with self.subTest(numEntries=numEntries, cut=cut):
+                    self.assertRecovered(numEntries, self.data[:cut])
+
+    def testRecoverCorruptLastEntry(self):
+        """ An entry whose bytes don't match its checksum, as when its blocks weren't all written, is torn. """
+
+        for numEntries, (start, end) in enumerate(zip([0] + self.frameEndList, self.frameEndList)):
+            with self.subTest(numEntries=numEntries):
+                data = bytearray(self.data[:end])
+                data[-1] ^= 0xFF
+                self.assertRecovered(numEntries, bytes(data))
+
+    def testRecoveryLeavesFiles(self):
+        self.recover(self.data)
+
+        for movie, renamed in zip(self.movieList, (True, True, False, False)):
+            self.assertEqual(renamed, os.path.exists(movie.getNewAbsPath()))
+            self.assertEqual(not renamed, os.path.exists(movie.getOldAbsPath()))
+
+    def testRestoreRecoveredJournal(self):
+        """ The records completed by recovery can be restored, and deleting them commits the journal again. """
+
+        self.recover(self.data)
+        first, second = self.movieList[:2]
+
+        database = self.newDatabase()
+        self.assertEqual([first.getBackupName(), second.getBackupName()],
+                         [record.getBackupName() for record in database.readAll(self.journalPath)])
+
+        handler = FileHandler(database)
+        record, = [record for record in handler.readObjsFromBackup(self.journalPath)
+                   if record.getBackupName() == second.getBackupName()]
+        handler.restoreBackupObj(record)
+
+        self.assertTrue(os.path.exists(second.getOldAbsPath()))
+        self.assertEqual([(DatabaseJournal.DELETE, second.getBackupName()), (DatabaseJournal.COMMIT,)],
+                         readEntryList(self.journalPath)[-2:])
+        self.assertEqual([first.getBackupName()],
+                         [record.getBackupName() for record in database.readAll(self.journalPath)])
+        self.assertEqual([], self.newDatabase().getRecovered())
+
+
+class LiveJournalTestCase(DatabaseJournalTestCase):
+    """ The journal of a run in progress in another process is never taken for an interrupted one. """
+
+    def assertNotRecovered(self, journalPath: str) -> None:
+        with open(journalPath, "rb") as inp:
+            data = inp.read()
+
+        self.assertEqual([], self.newDatabase().getRecovered())
+
+        with open(journalPath, "rb") as inp:
+            self.assertEqual(data, inp.read())
+
+    def testLiveRunIsNotRecovered(self):
+        self.startRun()
+        journalPath, = self.getJournalPathList()
+        self.assertNotRecovered(journalPath)
+
+    def testLockedJournalIsNotRecovered(self):
+        self.startRun()
+        journalPath, = self.getJournalPathList()
+
+        with mock.patch.object(DatabaseJournal, "_DatabaseJournal__isRunAlive", return_value=False):
+            self.assertNotRecovered(journalPath)
+
+    def testKilledRunIsRecovered(self):
+        run = self.startRun()
+        run.kill()
+        run.wait()
+
+        recoveredList = self.newDatabase().getRecovered()
+
+        self.assertEqual(1, len(recoveredList))
+        self.assertEqual(DatabaseJournal.DELETE, recoveredList[0][0])  # the file was never renamed
+
+    def testClosedRunIsNotRecovered(self):
+        run = self.startRun()
+        run.communicate("exit\n")
+
+        self.assertEqual([], self.newDatabase().getRecovered())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,16 +1,46 @@
 import os
+import errno
+import threading
 from cinema import Cinema
 from database import Database
-import shutil
+from libraryIndex import LibraryIndex
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from copyStrategy import CopyEngine
 
 
 class FileHandler:
     """ Interacts with files and an attached database. """
 
+    SOURCE_KEPT = "source kept"  # appended to the method of a move between devices whose source couldn't be deleted
+
     __database: Database
+    __libraryIndexDict: dict[str, LibraryIndex]  # {library directory: index, ...}, built on first use
+    __lock: threading.Lock  # guards the indexes and the copy engine, as integrations may run on several threads
+    __copyEngine: "CopyEngine" or None  # built the first time a file is copied into a library
+    __hardlinkFlag: bool
+    __verifyFlag: bool
 
     def __init__(self, database: Database):
         self.__database = database
+        self.__libraryIndexDict = {}
+        self.__lock = threading.Lock()
+        self.__copyEngine = None
+        self.__hardlinkFlag = False
+        self.__verifyFlag = False
+
+
+
+    def setCopyOptions(self, hardlinkFlag: bool, verifyFlag: bool = False) -> None:
+        """ Set whether files copied into a library may be hardlinked to their source when both are on the same
+        device, and whether copies are verified against a digest of their data, which is kept in their records. """
+
+        with self.__lock:
+            if hardlinkFlag != self.__hardlinkFlag or verifyFlag != self.__verifyFlag:
+                self.__hardlinkFlag = hardlinkFlag
+                self.__verifyFlag = verifyFlag
+                self.__copyEngine = None
 
 
 
@@ -35,16 +65,21 @@ class FileHandler:
 
 
     
-    def integrateIntoLibrary(self, obj: Cinema, library: str, copyFlag: bool, overwriteFlag: bool) -> None:
+    def integrateIntoLibrary(self, obj: Cinema, library: str, copyFlag: bool, overwriteFlag: bool) -> str or None:
         """ Integrate the passed Cinema object into the passed library. Use the copy flag to determine copying or moving a file into the library, and the
-            overwrite flag to determine overwriting or skipping an existing file. """
+            overwrite flag to determine overwriting or skipping an existing file. Existence checks are made against the library's index rather than
+            the filesystem. Moves within a device are made with os.replace. Moves between devices are copied with the CopyEngine, and the
+            source is only deleted once the copy's size is verified and its record is updated. Returns the name of the CopyEngine strategy
+            that copied the file, "move" if it was moved within its device, "move (<strategy>)" if it was moved between devices (with
+            ", source kept" appended if the source couldn't be deleted afterwards), or None if it was only renamed. Copies that are verified store the digest of the file in the object's record. """
 
         def renameFileInLibraryDir() -> None:   
             os.replace(f"{libPathWithNewDir}\\{oldFile}{ext}", newAbsPathInLibrary)
+            index.addFile(newDir, newFileWithExt)
 
         def renameInLibraryDir() -> None:
-            if not obj.hasCorrectFileName:  # In case just the directory needs renaming, skip file renaming
-                if os.path.exists(newAbsPathInLibrary):  # File conflict exists
+            if not obj.hasCorrectFileName():  # In case just the directory needs renaming, skip file renaming
+                if index.hasFile(newDir, newFileWithExt):  # File conflict exists
                     if overwriteFlag:
                         renameFileInLibraryDir()
                     else:
@@ -52,76 +87,112 @@ class FileHandler:
                 else:
                     renameFileInLibraryDir()
 
+        def copyOrMoveIntoLibrary() -> str:
+            nonlocal movedAcrossDevices
+
+            if copyFlag:
+                result = self.__getCopyEngine().copy(oldAbsPath, newAbsPathInLibrary)
+                method = result.strategy
+                obj.setDigest(result.digest)
+            elif os.stat(oldAbsPath).st_dev == os.stat(libPathWithNewDir).st_dev:
+                os.replace(oldAbsPath, newAbsPathInLibrary)
+                method = "move"
+            else:
+                result = self.__getCopyEngine().copy(oldAbsPath, newAbsPathInLibrary)
+                method = f"move ({result.strategy})"
+                obj.setDigest(result.digest)
+
+                if os.path.getsize(newAbsPathInLibrary) != os.path.getsize(oldAbsPath):
+                    raise OSError(errno.EIO, "COPY INCOMPLETE, SOURCE KEPT", newAbsPathInLibrary)
+                movedAcrossDevices = True
+            index.addFile(newDir, newFileWithExt)
+            return method
+
+        index = self.getLibraryIndex(library)
+        self.__database.commit()  # the backups of a batch, and the library, are on disk before any file is touched
         oldFile = obj.getOldFileName()
-        newFile = obj.getNewFileName()
+        oldDir = obj.getOldDir()
+        newDir = obj.getNewDir()
         ext = obj.getFileExt()
-        libPathWithOldDir = f"{library}\\{obj.getOldDir()}"
-        libPathWithNewDir = f"{library}\\{obj.getNewDir()}"
+        newFileWithExt = f"{obj.getNewFileName()}{ext}"
+        libPathWithOldDir = index.getDirPath(oldDir)
+        libPathWithNewDir = index.getDirPath(newDir)
         oldAbsPath = obj.getOldAbsPath()
-        newAbsPathInLibrary = f"{library}\\{obj.getNewDir()}\\{newFile}{ext}"
-        oldDirExistsInLibrary = os.path.exists(libPathWithOldDir)
-        newDirExistsInLibrary = os.path.exists(libPathWithNewDir)
-
-        # Case insensitive windows doesn't work well sometimes
-        sameDirNamesDiffCase = obj.getOldDir() != obj.getNewDir()
+        newAbsPathInLibrary = f"{libPathWithNewDir}\\{newFileWithExt}"
+        oldDirExistsInLibrary = index.hasDir(oldDir)
+        newDirExistsInLibrary = index.hasDir(newDir)
+        method = None
+        movedAcrossDevices = False
 
         # Regardless of the copy flag, files will only be moved if they are NOT already in the library structure
         # os.mkdir(path) (can throw a FileExistsError, or a FileNotFoundError if a file in the parent directory in the path does not exist)
         # os.replace(src, dst) will work with directories, but they have to be empty. also works cross-platform, whereas os.rename does not
 
         if oldDirExistsInLibrary:  # If the object is already in the library, but the directory is misnamed
-            if not newDirExistsInLibrary:
+            # Both names exist when they only differ in case on a case-insensitive filesystem, and then they're one directory to rename
+            if not newDirExistsInLibrary or (oldDir != newDir and index.isSameDir(oldDir, newDir)):
                 os.replace(libPathWithOldDir, libPathWithNewDir)  # Rename directory
+                index.renameDir(oldDir, newDir)
                 renameInLibraryDir()
-            else:  # Old and new directory names exist at the same time, UNLESS Windows can't detect a difference due to case insensitivity
-                if sameDirNamesDiffCase:
-                    os.replace(libPathWithOldDir, libPathWithNewDir)  # Rename directory
-                    renameInLibraryDir()
-                else:
-                    raise FileExistsError("OLD AND NEW DIRECTORIES BOTH EXIST")
+            else:
+                raise FileExistsError("OLD AND NEW DIRECTORIES BOTH EXIST")
 
             obj.setNewDirPath(libPathWithNewDir)
             self.backupOverwrite(obj)
 
         elif newDirExistsInLibrary:
             if not obj.hasCorrectFileName():
-                if os.path.exists(newAbsPathInLibrary):  # File conflict exists
+                if index.hasFile(newDir, newFileWithExt):  # File conflict exists
                     if overwriteFlag:
                         renameFileInLibraryDir()
                     else:
                         raise FileExistsError("OVERWRITE NECESSARY")
                 else:
-                    if copyFlag:
-                        shutil.copy(oldAbsPath, newAbsPathInLibrary)
-                    else:
-                        shutil.move(oldAbsPath, newAbsPathInLibrary)
+                    method = copyOrMoveIntoLibrary()
 
             obj.setNewDirPath(libPathWithNewDir)
             self.backupOverwrite(obj)
 
-        else:  # The object is not in the library and the directory doesn't exist
+        else:  # The object is not in the library and the directory doesn't exist, so there can't be a file conflict
             os.mkdir(libPathWithNewDir)
-
-            if copyFlag:
-                if os.path.exists(newAbsPathInLibrary):
-                    if overwriteFlag:
-                        os.replace(oldAbsPath, newAbsPathInLibrary)
-                    else:
-                        raise FileExistsError("OVERWRITE NECESSARY")
-                else:
-                    shutil.copy(oldAbsPath, newAbsPathInLibrary)
-            else:
-                if os.path.exists(newAbsPathInLibrary):
-                    if overwriteFlag:
-                        shutil.move(oldAbsPath, newAbsPathInLibrary)  # Will only overwrite if its on the same filesystem
-                    else:
-                        raise FileExistsError("OVERWRITE NECESSARY")
-                else:
-                    shutil.move(oldAbsPath, newAbsPathInLibrary)
+            index.addDir(newDir)
+            method = copyOrMoveIntoLibrary()
 
             obj.setNewDirPath(libPathWithNewDir)
             self.backupOverwrite(obj)
 
+        if movedAcrossDevices:  # Deferred until the record points at the library copy, so a crash never loses both files
+            try:
+                os.remove(oldAbsPath)
+            except OSError:  # The library copy and its record are complete, so the source is left behind and reported
+                method = f"{method}, {self.SOURCE_KEPT}"
+
+        return method
+
+
+
+    def getLibraryIndex(self, library: str) -> LibraryIndex:
+        """ Return the index of a library, building it the first time a file is integrated into the library. """
+
+        with self.__lock:
+            index = self.__libraryIndexDict.get(library)
+
+            if index is None:
+                index = LibraryIndex(library)
+                self.__libraryIndexDict[library] = index
+                self.__database.addLibrary(library)
+
+            return index
+
+
+
+    def __getCopyEngine(self) -> "CopyEngine":
+        with self.__lock:
+            if self.__copyEngine is None:
+                from copyStrategy import CopyEngine
+                self.__copyEngine = CopyEngine(self.__hardlinkFlag, self.__verifyFlag)
+
+            return self.__copyEngine
 
 
 
@@ -134,6 +205,7 @@ class FileHandler:
         """ The Cinema object's file is not being integrated into a library and just needs renaming in the OS. """
 
         cinema.setNewDirPath(cinema.getOldDir())
+        self.__database.commit()  # the backups of a batch are on disk before any file is touched
         os.replace(cinema.getOldAbsPath(), cinema.getNewAbsPath())  # what exceptions does this possibly throw? FileNotFoundError?
         self.backupOverwrite(cinema)
 
@@ -146,6 +218,33 @@ class FileHandler:
 
 
 
+    def readObjsFromBackup(self, path: str) -> list[Cinema]:  # throws ValueError, FileNotFoundError
+        """ Attempt to retrieve every backed up Cinema object of the provided path, which may be a journal. """
+
+        return self.__database.readAll(path)
+
+
+
+    def verifyDigest(self, cinema: Cinema) -> bool or None:
+        """ Whether the Cinema object's file still matches the digest taken when it was copied into its library, or
+        None if no digest was taken. Only the library file is read. """
+
+        digest = cinema.getDigest()
+
+        if digest is None:
+            return None
+
+        from copyStrategy import FileHasher
+
+        algorithm = digest.split(":", 1)[0]
+        if algorithm != FileHasher.ALGORITHM:  # taken by a version that hashed differently
+            return None
+
+        libraryPath = f"{cinema.getNewDirPath()}\\{cinema.getNewFileName()}{cinema.getFileExt()}"
+        return FileHasher.hashFile(libraryPath) == digest
+
+
+
     def restoreBackupObj(self, cinema: Cinema) -> None:
         """ Restore a Cinema object's file name. """
 
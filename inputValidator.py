@@ -3,11 +3,21 @@ import os
 
 class InputValidator:
     """ Performs simple input validation on passed arguments. Must be an absolute path and exist.
-    Valid files with extension '.pkl', valid files/directories, and all invalid inputs are stored in separate lists. """
+    Valid backups (files with extension '.pkl', or '.crj' for journals), valid files/directories, manifests, and all
+    invalid inputs are stored in separate lists. A manifest is passed as "--manifest <listing file>", and only the
+    listing file itself needs to exist. The "--profile" and "--pipeline" switches are recorded rather than validated. """
+
+    MANIFEST_FLAG = "--manifest"
+    PROFILE_FLAG = "--profile"
+    PIPELINE_FLAG = "--pipeline"
+    BACKUP_EXTENSIONS = (".pkl", ".crj")
 
     __errorsDict: dict[str, list[str]]
     __cinemaArgs: list[str] = []
     __backupArgs: list[str] = []
+    __manifestArgs: list[str] = []
+    __profileFlag: bool = False
+    __pipelineFlag: bool = False
     # __copyFlag: bool = True
     # __overwriteFlag: bool = True
 
@@ -17,6 +27,15 @@ class InputValidator:
     def hasBackup(self) -> bool:
         return len(self.__backupArgs) > 0
 
+    def hasManifest(self) -> bool:
+        return len(self.__manifestArgs) > 0
+
+    def hasProfileFlag(self) -> bool:
+        return self.__profileFlag
+
+    def hasPipelineFlag(self) -> bool:
+        return self.__pipelineFlag
+
     def doValidation(self, model: list[str]) -> None:
         """ Validate input by checking the paths to ensure they are both absolute and exist. """
 
@@ -25,14 +44,30 @@ class InputValidator:
 
         backupList = []
         cinemaList = []
+        manifestList = []
         pathsNotAbsolute = []
         pathsNotExist = []
-
-        for path in model:
-            if os.path.isabs(path):
+        manifestsMissingPath = []
+
+        args = iter(model)
+        for path in args:
+            if path == self.PROFILE_FLAG:
+                self.__profileFlag = True
+            elif path == self.PIPELINE_FLAG:
+                self.__pipelineFlag = True
+            elif path == self.MANIFEST_FLAG:
+                manifestPath = next(args, None)
+
+                if manifestPath is None:
+                    manifestsMissingPath.append(path)
+                elif os.path.isfile(manifestPath):
+                    manifestList.append(manifestPath)
+                else:
+                    pathsNotExist.append(manifestPath)
+            elif os.path.isabs(path):
                 if os.path.exists(path):  # valid inputs
                     if os.path.isfile(path):
-                        if os.path.splitext(path)[1] == ".pkl":
+                        if os.path.splitext(path)[1] in self.BACKUP_EXTENSIONS:
                             backupList.append(path)
                         else:
                             cinemaList.append(path)
@@ -43,7 +78,7 @@ class InputValidator:
             else:
                 pathsNotAbsolute.append(path)
 
-        if len(cinemaList) == 0 and len(backupList) == 0:
+        if len(cinemaList) == 0 and len(backupList) == 0 and len(manifestList) == 0:
             raise ValueError("No passed arguments were valid!")
 
         if len(cinemaList) > 0:
@@ -52,6 +87,9 @@ class InputValidator:
         if len(backupList) > 0:
             self.__backupArgs = backupList
 
+        if len(manifestList) > 0:
+            self.__manifestArgs = manifestList
+
         errorsDict: dict[str, list[str]] = {}
 
         if len(pathsNotAbsolute) > 0:
@@ -60,6 +98,9 @@ class InputValidator:
         if len(pathsNotExist) > 0:
             errorsDict["Does Not Exist"] = pathsNotExist
 
+        if len(manifestsMissingPath) > 0:
+            errorsDict["Missing Manifest Path"] = manifestsMissingPath
+
         self.__errorsDict = errorsDict
 
     def getNumErrors(self) -> int:
@@ -77,3 +118,8 @@ class InputValidator:
         """ Return the processed backup paths list. """
 
         return self.__backupArgs
+
+    def getManifestArgs(self) -> list[str]:
+        """ Return the processed manifest paths list. """
+
+        return self.__manifestArgs
@@ -0,0 +1,144 @@
+import queue
+import threading
+from typing import Iterator, NamedTuple
+from concurrent.futures import ThreadPoolExecutor
+from cinema import Cinema
+from fileHandler import FileHandler
+from movePlanner import MovePlanner
+
+
+class IntegrationResult(NamedTuple):
+    """ Outcome of integrating a single Cinema object into a library. """
+
+    obj: Cinema
+    error: Exception or None  # None if the integration succeeded
+    method: str or None = None  # copy strategy that copied the file, "move", or None, see FileHandler.integrateIntoLibrary
+
+
+class IntegrationExecutor:
+    """ Integrates Cinema objects into libraries on a pool of threads, so that copying or moving one large file doesn't
+    hold up the files behind it. Copies spend their time in system calls that release the GIL, so threads are enough to
+    keep several transfers going at once.
+
+    Objects are grouped by destination directory. The first integration of each group runs on its own, since it is the
+    one that may create or rename the directory, and the rest of the group then run concurrently, except that
+    integrations with the same destination file run in submission order. Groups are independent of each other. """
+
+    DEFAULT_WORKERS = 4
+    DEFAULT_TRANSFER_WORKERS = 2
+
+    __handler: FileHandler
+    __workers: int
+    __transferWorkers: int
+
+    def __init__(self, handler: FileHandler, workers: int = DEFAULT_WORKERS,
+                 transferWorkers: int = DEFAULT_TRANSFER_WORKERS):
+        self.__handler = handler
+        self.__workers = max(1, workers)
+        self.__transferWorkers = max(1, transferWorkers)
+
+    def run(self, taskList: list[tuple[Cinema, str]], copyFlag: bool,
+            overwriteFlag: bool) -> Iterator[IntegrationResult]:
+        """ Integrate (Cinema object, library directory) pairs with FileHandler.integrateIntoLibrary, yielding a result
+        for each as soon as it finishes. Errors are caught and returned with their object rather than raised.
+
+        The pairs are planned with a MovePlanner first. Those that only rename or move within a device are integrated
+        before any file data is transferred, so they aren't held up by slow copies. Transfers then run with at most the
+        transfer workers at once for each (source device, library device) pair. With a single worker, everything is
+        integrated in that order in the calling thread. """
+
+        plan = MovePlanner(copyFlag).plan(taskList)
+        transferList = [task for pairList in plan.transferDict.values() for task in pairList]
+
+        if self.__workers == 1:
+            for obj, library in plan.localList + transferList:
+                yield self.__integrate(obj, library, copyFlag, overwriteFlag)
+            return
+
+        yield from self.__runGrouped(plan.localList, copyFlag, overwriteFlag, self.__workers, {})
+
+        # {id(obj): semaphore of its device pair, ...}
+        limitDict = {}
+        for pairList in plan.transferDict.values():
+            semaphore = threading.Semaphore(self.__transferWorkers)
+            limitDict.update((id(obj), semaphore) for obj, _ in pairList)
+
+        yield from self.__runGrouped(transferList, copyFlag, overwriteFlag,
+                                     self.__transferWorkers * len(plan.transferDict), limitDict)
+
+    def __runGrouped(self, taskList: list[tuple[Cinema, str]], copyFlag: bool, overwriteFlag: bool, workers: int,
+                     limitDict: dict[int, threading.Semaphore]) -> Iterator[IntegrationResult]:
+        """ Integrate tasks on a pool of threads, grouped by destination directory as described above. Tasks with a
+        semaphore in the limit dict hold it while they are integrated. """
+
+        if not taskList:
+            return
+
+        if len(taskList) == 1:
+            yield self.__integrate(*taskList[0], copyFlag, overwriteFlag)
+            return
+
+        resultQueue: queue.SimpleQueue[IntegrationResult] = queue.SimpleQueue()
+
+        def integrate(obj: Cinema, library: str) -> IntegrationResult:
+            semaphore = limitDict.get(id(obj))
+
+            if semaphore is None:
+                return self.__integrate(obj, library, copyFlag, overwriteFlag)
+
+            with semaphore:
+                return self.__integrate(obj, library, copyFlag, overwriteFlag)
+
+        with ThreadPoolExecutor(workers, thread_name_prefix="integration") as pool:
+
+            def runChain(chain: list[tuple[Cinema, str]]) -> None:
+                for task in chain:
+                    resultQueue.put(integrate(*task))
+
+            def runGroup(group: list[tuple[Cinema, str]]) -> None:
+                first, rest = group[0], group[1:]
+                result = integrate(*first)
+
+                # Submitted before the first result is reported, so that the pool is still open
+                for chain in self.__groupBy(rest, self.__getFileKey).values():
+                    pool.submit(runChain, chain)
+
+                resultQueue.put(result)
+
+            for group in self.__groupBy(taskList, self.__getDirKey).values():
+                pool.submit(runGroup, group)
+
+            for _ in range(len(taskList)):
+                yield resultQueue.get()
+
+    def __integrate(self, obj: Cinema, library: str, copyFlag: bool, overwriteFlag: bool) -> IntegrationResult:
+        try:
+            method = self.__handler.integrateIntoLibrary(obj, library, copyFlag, overwriteFlag)
+        except Exception as e:
+            return IntegrationResult(obj, e)
+
+        return IntegrationResult(obj, None, method)
+
+    @staticmethod
+    def __groupBy(taskList: list[tuple[Cinema, str]], key) -> dict[object, list[tuple[Cinema, str]]]:
+        """ Group tasks by a key, keeping their order within each group. """
+
+        groupDict: dict[object, list[tuple[Cinema, str]]] = {}
+
+        for task in taskList:
+            groupDict.setdefault(key(task), []).append(task)
+
+        return groupDict
+
+    @staticmethod
+    def __getDirKey(task: tuple[Cinema, str]) -> tuple[str, str]:
+        """ The destination directory of a task. Names are casefolded, so that directories that are the same on a
+        case-insensitive filesystem are never worked on at the same time. """
+
+        obj, library = task
+        return library.casefold(), obj.getNewDir().casefold()
+
+    @staticmethod
+    def __getFileKey(task: tuple[Cinema, str]) -> str:
+        obj, _ = task
+        return f"{obj.getNewFileName()}{obj.getFileExt()}".casefold()
@@ -0,0 +1,151 @@
+import os
+import threading
+
+
+class LibraryIndex:
+    """ In-memory index of the directories in a library and of the files in them, so that integrating many files into
+    a library doesn't stat the same paths over and over. The library root is listed with a single scandir when the
+    index is built, and each directory's files with a single scandir the first time one of them is looked up. The
+    index is updated as directories and files are created, renamed, or replaced through it, and is only as current as
+    the last time it was built for changes made by anything else. It can be shared by threads.
+
+    Lookups follow the case sensitivity of the library's filesystem, which is detected when the index is built. On a
+    case-insensitive filesystem (Windows), "the office" and "The Office" are the same directory. """
+
+    __root: str
+    __caseInsensitive: bool
+    __dirDict: dict[str, str]  # {lookup key: directory name as stored, ...}
+    __fileDict: dict[str, dict[str, str]]  # {directory lookup key: {file lookup key: file name, ...}, ...}, lazily
+    __lock: threading.RLock
+
+    def __init__(self, root: str):
+        self.__root = root
+        self.__lock = threading.RLock()
+        self.refresh()
+
+    def refresh(self) -> None:
+        """ Rebuild the index from the filesystem. """
+
+        with self.__lock:
+            self.__caseInsensitive = self.__detectCaseInsensitive(self.__root)
+            self.__dirDict = {}
+            self.__fileDict = {}
+
+            with os.scandir(self.__root) as dirContents:
+                for entry in dirContents:
+                    if entry.is_dir():
+                        self.__dirDict[self.__key(entry.name)] = entry.name
+
+    ##########
+    # CHECKS #
+    ##########
+
+    def isCaseInsensitive(self) -> bool:
+        return self.__caseInsensitive
+
+    def hasDir(self, name: str) -> bool:
+        """ Whether a directory with the name exists in the library, as os.path.exists would report it. """
+
+        return self.__key(name) in self.__dirDict
+
+    def hasFile(self, dirName: str, fileName: str) -> bool:
+        """ Whether a file with the name exists in a directory of the library, as os.path.exists would report it. """
+
+        with self.__lock:
+            return self.__key(fileName) in self.__getFiles(dirName)
+
+    def isSameDir(self, name: str, otherName: str) -> bool:
+        """ Whether two directory names refer to the same directory, which they do on a case-insensitive filesystem
+        when they only differ in case. """
+
+        return self.__key(name) == self.__key(otherName)
+
+    def normalize(self, name: str) -> str:
+        """ The name a directory or file is looked up by, equal for names that refer to the same entry. """
+
+        return self.__key(name)
+
+    ###########
+    # GETTERS #
+    ###########
+
+    def getRoot(self) -> str:
+        return self.__root
+
+    def getDirPath(self, name: str) -> str:
+        return f"{self.__root}\\{name}"
+
+    ###########
+    # UPDATES #
+    ###########
+
+    def addDir(self, name: str) -> None:
+        """ Record a directory created in the library. It starts empty. """
+
+        with self.__lock:
+            self.__dirDict[self.__key(name)] = name
+            self.__fileDict[self.__key(name)] = {}
+
+    def renameDir(self, oldName: str, newName: str) -> None:
+        """ Record a directory renamed in the library, keeping its files. """
+
+        with self.__lock:
+            files = self.__fileDict.pop(self.__key(oldName), None)
+            self.__dirDict.pop(self.__key(oldName), None)
+            self.__dirDict[self.__key(newName)] = newName
+
+            if files is not None:
+                self.__fileDict[self.__key(newName)] = files
+
+    def addFile(self, dirName: str, fileName: str) -> None:
+        """ Record a file created in, or moved or copied into, a directory of the library. """
+
+        with self.__lock:
+            self.__getFiles(dirName)[self.__key(fileName)] = fileName
+
+    #########
+    # OTHER #
+    #########
+
+    def __getFiles(self, dirName: str) -> dict[str, str]:
+        """ Return the files of a directory, listing the directory the first time it is asked for. Directories that
+        don't exist have no files. Called with the lock held. """
+
+        dirKey = self.__key(dirName)
+        files = self.__fileDict.get(dirKey)
+
+        if files is None:
+            files = {}
+            storedName = self.__dirDict.get(dirKey)
+
+            if storedName is not None:
+                try:
+                    with os.scandir(self.getDirPath(storedName)) as dirContents:
+                        for entry in dirContents:
+                            if entry.is_file():
+                                files[self.__key(entry.name)] = entry.name
+                except FileNotFoundError:  # removed since the index was built
+                    pass
+
+            self.__fileDict[dirKey] = files
+
+        return files
+
+    def __key(self, name: str) -> str:
+        return name.casefold() if self.__caseInsensitive else name
+
+    @staticmethod
+    def __detectCaseInsensitive(root: str) -> bool:
+        """ Whether the filesystem of a directory ignores case, found by looking the directory up with the case of its
+        name swapped. Names without cased letters fall back to the platform's convention. """
+
+        parent, name = os.path.split(os.path.normpath(root))
+        swapped = name.swapcase()
+
+        if swapped == name:
+            return os.path.normcase("A") == "a"
+
+        try:
+            return os.path.samefile(root, os.path.join(parent, swapped))
+        except OSError:
+            return False
@@ -0,0 +1,70 @@
+import os.path
+from typing import Iterator, NamedTuple
+
+
+class ManifestEntry(NamedTuple):
+    """ A file listed in a manifest, which is parsed without the file having to exist locally. """
+
+    path: str
+    size: int or None = None  # bytes
+    mtimeNs: int or None = None  # modification time, in nanoseconds
+
+
+def readManifest(manifestPath: str) -> Iterator[ManifestEntry]:
+    """ Stream the entries of a listing file, one line at a time. Three formats are recognized, and may be mixed:
+
+        JSONL:     {"path": "/volume1/downloads/name.mkv", "size": 1073741824, "mtime": 1700000000.5}
+                   ("size" and "mtime" (seconds) or "mtimeNs" are optional)
+        find:      /volume1/downloads/name.mkv
+        ls -R:     /volume1/downloads:
+                   name.mkv
+
+    Names in an "ls -R" listing are joined to the directory header above them. A header is a line ending with ":"
+    that is the first line or follows a blank line. Entries ending with "/" (ls -p) are directories and are skipped.
+    Raises ValueError for a JSON line without a path. """
+
+    currentDir: str or None = None  # set by "ls -R" directory headers
+    expectHeader = True
+
+    with open(manifestPath, "r", encoding="utf-8", errors="replace") as inp:
+        for lineNumber, line in enumerate(inp, 1):
+            line = line.rstrip("\r\n")
+
+            if not line.strip():
+                expectHeader = True
+                continue
+
+            if expectHeader and line.endswith(":") and not line.startswith("{"):
+                currentDir = line[:-1]
+                expectHeader = False
+                continue
+
+            expectHeader = False
+
+            if line.startswith("{"):
+                yield _readJsonEntry(line, manifestPath, lineNumber)
+            elif line.endswith("/"):
+                continue
+            elif currentDir is not None:
+                yield ManifestEntry(os.path.join(currentDir, line))
+            else:
+                yield ManifestEntry(line)
+
+
+def _readJsonEntry(line: str, manifestPath: str, lineNumber: int) -> ManifestEntry:
+    import json  # only JSONL manifests need it, and the parser imports this module on every run
+
+    try:
+        record = json.loads(line)
+        size = int(record["size"]) if "size" in record else None
+
+        if "mtimeNs" in record:
+            mtimeNs = int(record["mtimeNs"])
+        elif "mtime" in record:
+            mtimeNs = round(float(record["mtime"]) * 1_000_000_000)
+        else:
+            mtimeNs = None
+
+        return ManifestEntry(record["path"], size, mtimeNs)
+    except (ValueError, KeyError, TypeError):
+        raise ValueError(f"Invalid manifest entry on line {lineNumber} of {manifestPath}")
@@ -0,0 +1,90 @@
+import os
+
+
+class MediaFilter:
+    """ Rejects files that cannot be cinema before any name cleaning or pattern matching is done. A file is accepted if
+    its extension is in the registry of media extensions and, when the magic check is enabled, the first bytes of the
+    file match a known signature of its container. Extensions without a known signature are accepted by extension
+    alone.
+
+    By default the registry holds video extensions, and the subtitle and companion files that are named after their
+    video and renamed next to it. Other files (.jpg, .txt, ...) are skipped. """
+
+    VIDEO_EXTENSIONS = (".mkv", ".mp4", ".m4v", ".avi", ".mov", ".wmv", ".mpg", ".mpeg", ".ts", ".m2ts", ".webm", ".flv",
+                        ".vob", ".ogm", ".divx")
+    COMPANION_EXTENSIONS = (".srt", ".sub", ".idx", ".ass", ".ssa", ".vtt", ".smi", ".nfo")
+    DEFAULT_EXTENSIONS = VIDEO_EXTENSIONS + COMPANION_EXTENSIONS
+
+    MAGIC_LENGTH = 12  # bytes read from the start of the file, enough for every signature below
+
+    # {extension: ((offset, bytes), ...), ...} any one of the signatures is enough to be accepted
+    __MATROSKA = ((0, b"\x1a\x45\xdf\xa3"),)
+    __ISO_MEDIA = ((4, b"ftyp"), (4, b"moov"), (4, b"mdat"), (4, b"free"), (4, b"wide"), (4, b"skip"))
+    __MPEG_PROGRAM = ((0, b"\x00\x00\x01\xba"), (0, b"\x00\x00\x01\xb3"))
+    SIGNATURES = {
+        ".mkv": __MATROSKA,
+        ".webm": __MATROSKA,
+        ".mp4": __ISO_MEDIA,
+        ".m4v": __ISO_MEDIA,
+        ".mov": __ISO_MEDIA,
+        ".avi": ((0, b"RIFF"),),
+        ".divx": ((0, b"RIFF"),),
+        ".wmv": ((0, b"\x30\x26\xb2\x75\x8e\x66\xcf\x11"),),
+        ".mpg": __MPEG_PROGRAM,
+        ".mpeg": __MPEG_PROGRAM,
+        ".vob": __MPEG_PROGRAM,
+        ".ts": ((0, b"\x47"),),
+        ".m2ts": ((4, b"\x47"),),
+        ".flv": ((0, b"FLV"),),
+        ".ogm": ((0, b"OggS"),),
+    }
+
+    __extensionSet: frozenset[str]
+    __checkMagic: bool
+
+    def __init__(self, extensionList: list[str] or None = None, checkMagic: bool = False):
+        extensionList = extensionList or self.DEFAULT_EXTENSIONS
+        self.__extensionSet = frozenset(self.__normalizeExtension(extension) for extension in extensionList)
+        self.__checkMagic = checkMagic
+
+    def getExtensions(self) -> frozenset[str]:
+        return self.__extensionSet
+
+    def isMedia(self, name: str, path: str or None = None) -> bool:
+        """ Whether a file name has a registered video extension and, if the magic check is enabled and the file's path
+        is passed, whether the file starts with a signature of its container. """
+
+        extension = os.path.splitext(name)[1].lower()
+
+        if extension not in self.__extensionSet:
+            return False
+
+        if self.__checkMagic and path is not None:
+            return self.__hasSignature(path, extension)
+
+        return True
+
+    def __hasSignature(self, path: str, extension: str) -> bool:
+        signatureList = self.SIGNATURES.get(extension)
+
+        if not signatureList:
+            return True
+
+        try:
+            with open(path, "rb") as inp:
+                header = inp.read(self.MAGIC_LENGTH)
+        except OSError:  # files that can't be read are left for the later stages to report
+            return True
+
+        for offset, signature in signatureList:
+            if header.startswith(signature, offset):
+                return True
+
+        return False
+
+    @staticmethod
+    def __normalizeExtension(passed: str) -> str:
+        """ Lowercase an extension and add its leading dot if missing: "MKV" -> ".mkv" """
+
+        passed = passed.strip().lower()
+        return passed if passed.startswith(".") else f".{passed}"
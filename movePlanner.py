@@ -0,0 +1,74 @@
+import os
+from typing import NamedTuple
+from cinema import Cinema
+
+
+class MovePlan(NamedTuple):
+    """ Integrations split by whether they transfer file data between devices. """
+
+    localList: list[tuple[Cinema, str]]  # renames and same-device moves, which are instant
+    transferDict: dict[tuple[int, int], list[tuple[Cinema, str]]]  # {(source device, library device): [task, ...]}
+
+
+class MovePlanner:
+    """ Sorts (Cinema object, library directory) integrations by the st_dev of their source file and library, before
+    any of them are run. Files already in their library and files moved within a device only need os.replace, and are
+    planned as local. Copies, and moves between devices, have to transfer the file's data, and are planned as transfers
+    grouped by their (source device, library device) pair, so that they can be scheduled after the local integrations
+    with a concurrency limit per pair. """
+
+    __copyFlag: bool
+    __libraryDevDict: dict[str, int or None]  # {library directory: device, ...}
+
+    def __init__(self, copyFlag: bool):
+        self.__copyFlag = copyFlag
+        self.__libraryDevDict = {}
+
+    def plan(self, taskList: list[tuple[Cinema, str]]) -> MovePlan:
+        localList = []
+        transferDict = {}
+
+        for task in taskList:
+            pair = self.getDevicePair(*task)
+
+            if pair is None:
+                localList.append(task)
+            else:
+                transferDict.setdefault(pair, []).append(task)
+
+        return MovePlan(localList, transferDict)
+
+    def getDevicePair(self, obj: Cinema, library: str) -> tuple[int, int] or None:
+        """ The (source device, library device) pair of an integration that transfers its file's data, or None if it
+        doesn't. Integrations whose source or library can't be found are left for the integration to report, as local
+        ones. """
+
+        libraryDev = self.__getLibraryDev(library)
+
+        if libraryDev is None or self.__isInLibrary(obj, library):
+            return None
+
+        try:
+            sourceDev = os.stat(obj.getOldAbsPath()).st_dev
+        except OSError:
+            return None
+
+        if sourceDev == libraryDev and not self.__copyFlag:
+            return None
+
+        return sourceDev, libraryDev
+
+    def __getLibraryDev(self, library: str) -> int or None:
+        if library not in self.__libraryDevDict:
+            try:
+                self.__libraryDevDict[library] = os.stat(library).st_dev
+            except OSError:
+                self.__libraryDevDict[library] = None
+
+        return self.__libraryDevDict[library]
+
+    @staticmethod
+    def __isInLibrary(obj: Cinema, library: str) -> bool:
+        """ Whether the object's file is already in a directory of the library, so that integrating it only renames. """
+
+        return os.path.normcase(os.path.dirname(obj.getOldDirPath())) == os.path.normcase(library)
@@ -1,25 +1,38 @@
-from cinema import Cinema
+from cinema import Cinema, CANONICAL_WORDS, CANONICAL_TAGS
+from patternRegistry import PatternRegistry
 import re
 
 
+# matches: Title of My-movie; (optional) - Part II; 2012 or (2012) or [2012];
+PatternRegistry.register("Movie", r"^(?P<title>([!0-9a-zA-Z.',_\-]+ (- )?)+?)(- (\w+ )+- |(- (\w+ )+)|- )?[([]?"
+                                  r"(?P<date>\d{4})[]) ]")
+
+# matches: Title of My-movie (2012) [1080p] [x265]; the format of _buildNewFileName
+PatternRegistry.register("Movie.canonical", rf"(?P<title>{CANONICAL_WORDS} )\((?P<date>\d{{4}})\){CANONICAL_TAGS}")
+
+
 class Movie(Cinema):
     """ A Cinema object specific to movies. """
 
+    __slots__ = ("_date",)
+
     _date: str
     _isMovie = True
+    _sortOrder = 1
 
-    def __init__(self, filePath, specificMatch: re.Match, resolutionMatch: re.Match, encodingMatch: re.Match):
+    def __init__(self, filePath, fields: dict[str, str or None]):
         super().__init__(filePath)
 
         # required params
-        self._buildAttributes(specificMatch)
+        self._buildAttributes(fields)
 
         # optional params
-        self._setResolution(resolutionMatch)
-        self._setEncoding(encodingMatch)
+        self._setResolution(fields.get("resolution"))
+        self._setEncoding(fields.get("encoding"))
 
         # finalize object
         self._buildNewFileName()
+        self._sortKey = self._buildSortKey()
 
     ###########
     # SETTERS #
@@ -27,6 +40,7 @@ class Movie(Cinema):
 
     def updateFileName(self, passed: str) -> None:
         self._newFileName = passed
+        self._invalidateDerivedPaths()
         self._backupName = f"{self._newDir}.{passed + self._fileExt}"
 
     ###########
@@ -43,17 +57,19 @@ class Movie(Cinema):
     def getPattern() -> re.Pattern:
         """ Returns a Pattern object to be used in identifying a Movie object. """
 
-        # matches: Title of My-movie; (optional) - Part II; 2012 or (2012) or [2012];
-        return re.compile(r"^(?P<title>([!0-9a-zA-Z.',_\-]+ (- )?)+?)(- (\w+ )+- |(- (\w+ )+)|- )?[([]?"
-                          r"(?P<date>\d{4})[]) ]")
+        return PatternRegistry.get("Movie")
+
+    @staticmethod
+    def getCanonicalPattern() -> re.Pattern:
+        return PatternRegistry.get("Movie.canonical")
 
     #########
     # OTHER #
     #########
 
-    def _buildAttributes(self, match: re.Match) -> None:
-        self._setTitle(match.group("title"))
-        self._date = match.group("date")
+    def _buildAttributes(self, fields: dict[str, str or None]) -> None:
+        self._setTitle(fields["title"])
+        self._date = fields["date"]
 
     def _buildNewFileName(self) -> None:
         title = self._title
@@ -64,3 +80,6 @@ class Movie(Cinema):
         self._newFileName = newName
         self._newDir = newName
         self._backupName = f"{self._newDir}.{newName + self._fileExt}"
+
+    def _buildSortKey(self) -> tuple[int, str, int, int, int, str]:
+        return self._sortOrder, self._title.casefold(), 0, 0, int(self._date), self._oldAbsPath
@@ -0,0 +1,83 @@
+import os
+import pickle
+from collections import OrderedDict
+
+
+class ParseCache:
+    """ Persistent cache of classification results, stored next to the backups directory. Entries are keyed by absolute
+    path and are only valid while the file's size and modification time are unchanged. The whole cache is discarded
+    when the classification patterns change, and the least recently used entries are evicted past the size cap. """
+
+    PICKLE_PROTOCOL = 4
+    MAX_ENTRIES = 500_000
+    __filePath = os.path.dirname(os.path.abspath(__file__))
+    CACHE_PATH = f"{__filePath}\\Cinema Renamer Cache.pkl"
+
+    __path: str
+    __version: str  # pattern version hash of the classifier the results came from
+    __maxEntries: int
+    __entries: OrderedDict or None  # {absPath: (size, mtimeNs, className, fields), ...}, loaded on first use
+    __isDirty: bool = False
+
+    def __init__(self, version: str, maxEntries: int = MAX_ENTRIES, path: str = CACHE_PATH):
+        self.__version = version
+        self.__maxEntries = maxEntries
+        self.__path = path
+        self.__entries = None
+
+    def get(self, absPath: str, size: int, mtimeNs: int) -> tuple[str or None, dict or None] or None:
+        """ Return the cached (class name, fields) of a file, with a class name of None for unrecognized files, or None
+        if the file is not cached or has changed since it was cached. """
+
+        entries = self.__getEntries()
+        entry = entries.get(absPath)
+
+        if entry is None or entry[0] != size or entry[1] != mtimeNs:
+            return None
+
+        entries.move_to_end(absPath)
+        return entry[2], entry[3]
+
+    def put(self, absPath: str, size: int, mtimeNs: int, className: str or None, fields: dict or None) -> None:
+        entries = self.__getEntries()
+        entries[absPath] = (size, mtimeNs, className, fields)
+        entries.move_to_end(absPath)
+
+        while len(entries) > self.__maxEntries:
+            entries.popitem(last=False)  # least recently used
+
+        self.__isDirty = True
+
+    def save(self) -> None:
+        """ Write the cache to disk if it has changed. The file is replaced atomically, so an interrupted save leaves
+        the previous cache intact. """
+
+        if not self.__isDirty:
+            return
+
+        tempPath = f"{self.__path}.tmp"
+        with open(tempPath, "wb") as outp:
+            pickle.dump((self.__version, self.__entries), outp, self.PICKLE_PROTOCOL)
+        os.replace(tempPath, self.__path)
+
+        self.__isDirty = False
+
+    def __getEntries(self) -> OrderedDict:
+        if self.__entries is None:
+            self.__entries = self.__load()
+
+        return self.__entries
+
+    def __load(self) -> OrderedDict:
+        """ Read the cache from disk, starting over if it is missing, unreadable, or from different patterns. """
+
+        try:
+            with open(self.__path, "rb") as inp:
+                version, entries = pickle.load(inp)
+        except Exception:
+            return OrderedDict()
+
+        if version != self.__version or not isinstance(entries, OrderedDict):
+            return OrderedDict()
+
+        return entries
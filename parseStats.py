@@ -0,0 +1,79 @@
+import time
+
+
+class ParseStats:
+    """ Counters and cumulative timings of the stages of a parse, collected by the Parser while profiling is enabled.
+    When profiling is disabled, the Parser keeps no ParseStats object and none of its stages are timed. """
+
+    # Stages, in the order files pass through them
+    LISTING = "listing"  # scanning directories
+    FILTERING = "filtering"  # media filter
+    CACHE = "cache"  # stat calls and parse cache lookups
+    CANONICAL = "canonical"  # recognizing names that are already in the renamed format
+    CLEANING = "cleaning"
+    MATCHING = "matching"
+    BATCH = "batch classification"  # cleaning and matching of batches, in worker processes when there are enough files
+    CONSTRUCTION = "construction"  # building Cinema objects
+    SORTING = "sorting"  # sorting the run of each directory
+    MERGING = "merging"  # merging the runs and splitting them into categories
+    TOTAL = "total"
+    STAGES = (LISTING, FILTERING, CACHE, CANONICAL, CLEANING, MATCHING, BATCH, CONSTRUCTION, SORTING, MERGING)
+
+    # Counters
+    FILES_SEEN = "files seen"
+    FILES_REJECTED = "files rejected"
+    CACHE_HITS = "cache hits"
+    CANONICAL_HITS = "canonical names"  # classified by the fast path, without cleaning or pattern attempts
+    PATTERN_ATTEMPTS = "pattern attempts"
+    UNRECOGNIZED = "unrecognized"
+    MATCHED = "matched {}"  # formatted with the name of the matching Cinema subclass
+
+    __counterDict: dict[str, int]
+    __timingDict: dict[str, float]  # {stage: seconds, ...}
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.__counterDict = {}
+        self.__timingDict = {}
+
+    def count(self, counter: str, amount: int = 1) -> None:
+        self.__counterDict[counter] = self.__counterDict.get(counter, 0) + amount
+
+    def addTime(self, stage: str, seconds: float) -> None:
+        self.__timingDict[stage] = self.__timingDict.get(stage, 0.0) + seconds
+
+    def time(self, stage: str) -> "_StageTimer":
+        """ Return a context manager that adds the time spent in its block to a stage. """
+
+        return _StageTimer(self, stage)
+
+    def getCounters(self) -> dict[str, int]:
+        return dict(self.__counterDict)
+
+    def getTimings(self) -> dict[str, float]:
+        """ Return the seconds spent in each stage that was reached, in stage order, followed by the total. """
+
+        timingDict = {stage: self.__timingDict[stage] for stage in self.STAGES if stage in self.__timingDict}
+
+        if self.TOTAL in self.__timingDict:
+            timingDict[self.TOTAL] = self.__timingDict[self.TOTAL]
+
+        return timingDict
+
+
+class _StageTimer:
+    """ Adds the time spent inside a with block to a ParseStats stage. """
+
+    __slots__ = ("__stats", "__stage", "__start")
+
+    def __init__(self, stats: ParseStats, stage: str):
+        self.__stats = stats
+        self.__stage = stage
+
+    def __enter__(self) -> None:
+        self.__start = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        self.__stats.addTime(self.__stage, time.perf_counter() - self.__start)
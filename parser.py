@@ -1,36 +1,113 @@
-import re
+import os
 import os.path
-from natsort import natsorted
+import time
+import heapq
+from fnmatch import fnmatch
+from typing import Iterable, Iterator, TYPE_CHECKING
+from itertools import chain, groupby, islice
+from operator import methodcaller
 from cinema import Cinema
 from show import Show
 from movie import Movie
 from unknown import Unknown
+from classifier import Classifier
+from classifierRegex import ClassifierRegex
+from classifierToken import ClassifierToken
+from parseCache import ParseCache
+from mediaFilter import MediaFilter
+from cinemaRecord import CinemaRecord
+from manifest import ManifestEntry, readManifest
+from parseStats import ParseStats
 
-
-class ClassPatternsEmpty(Exception):
-    """ If the concrete subclass patterns cannot be created, this error is raised. """
-    pass
+if TYPE_CHECKING:  # imported by __newExecutor, since most runs use a single worker
+    from concurrent.futures import ProcessPoolExecutor
 
 
 class Parser:
     """ Parses passed path strings for relevant Cinema objects by matching against Cinema patterns. """
 
-    __patternDict: dict[re.Pattern, object]  # {pattern: class, ...}
-    __resolutionPattern: re.Pattern
-    __encodingPattern: re.Pattern
-    __spacingPattern: re.Pattern
-    __doubleSpacesPattern: re.Pattern
-    __missingSpacesPattern: re.Pattern
-    __beginningTagsPattern: re.Pattern
+    # Categories of parsed Cinema objects
+    UNKNOWN = "unknown"
+    CANONICAL = "canonical"  # already correct, and recognized by the canonical fast path
+    ALREADY_CORRECT = "alreadyCorrect"
+    PROCESSED = "processed"
+
+    ENGINES = {"regex": ClassifierRegex, "token": ClassifierToken}  # {engine name: Classifier class, ...}
+
+    PARALLEL_THRESHOLD = 500  # fewer files than this are classified in-process rather than by the process pool
+    MAX_CHUNK_SIZE = 2000  # most file paths sent to a worker process at once
+
+    __getSortKey = methodcaller("getSortKey")
+    __getOldDirPath = methodcaller("getOldDirPath")
+
+    __classifier: Classifier
+    __classDict: dict[str, type]  # {class name: class, ...} for rebuilding cached results
+    __cache: ParseCache or None = None
+    __mediaFilter: MediaFilter
+    __numRejected: int = 0  # files rejected by the media filter during the last parse
+    __stats: ParseStats or None = None  # None unless profiling
 
     __unprocessedList: list[Cinema]
     __unknownList: list[Unknown]
+    __canonicalList: list[Cinema]
     __alreadyCorrectList: list[Cinema]
     # __errorList: list[Cinema]
     __processedCinemaList: list[Cinema]
 
-    def __init__(self):
-        self.__buildPatterns()
+    __maxDepth: int or None  # None for no limit, 0 for no recursion into subdirectories
+    __excludeList: list[str]  # fnmatch-style patterns matched against file and directory names
+
+    def __init__(self, maxDepth: int or None = None, excludeList: list[str] or None = None, engine: str = "regex"):
+        self.setEngine(engine)
+        self.__classDict = {cls.__name__: cls for cls in Cinema.__subclasses__()}
+        self.__mediaFilter = MediaFilter()
+        self.setMaxDepth(maxDepth)
+        self.setExcludeList(excludeList)
+
+    ###########
+    # SETTERS #
+    ###########
+
+    def setMaxDepth(self, passed: int or None) -> None:
+        """ Set how many directory levels below a passed directory are searched. None removes the limit. """
+
+        self.__maxDepth = passed
+
+    def setExcludeList(self, passed: list[str] or None) -> None:
+        """ Set the name patterns (e.g., "Sample", "*.part") of files and directories to skip while searching. """
+
+        self.__excludeList = list(passed) if passed else []
+
+    def setMediaFilter(self, extensionList: list[str] or None = None, checkMagic: bool = False) -> None:
+        """ Set the registry of media extensions (None for the defaults) that files must have to be classified, and
+        whether the first bytes of each file are also checked against its container's signature. """
+
+        self.__mediaFilter = MediaFilter(extensionList, checkMagic)
+
+    def setEngine(self, passed: str) -> None:
+        """ Select the classification engine by name: "regex" matches the Cinema subclass patterns, and "token" finds
+        the same structures from a token stream in linear time. Raises ValueError for an unknown engine. """
+
+        if passed not in self.ENGINES:
+            raise ValueError(f"Unknown classification engine: {passed}")
+
+        self.__classifier = self.ENGINES[passed]()
+
+        if self.__cache is not None:  # cached results are only valid for the engine that produced them
+            self.__cache = ParseCache(self.__classifier.getVersion())
+
+    def setProfiling(self, passed: bool) -> None:
+        """ Enable or disable the collection of per-stage counters and timings. While disabled, no stage is timed. """
+
+        self.__stats = ParseStats() if passed else None
+
+    def setCacheEnabled(self, passed: bool) -> None:
+        """ Enable or disable the persistent cache of classification results for unchanged files. """
+
+        if passed and self.__cache is None:
+            self.__cache = ParseCache(self.__classifier.getVersion())
+        elif not passed:
+            self.__cache = None
 
     ###########
     # GETTERS #
@@ -42,6 +119,11 @@ class Parser:
     def getUnknownCinemaList(self) -> list[Unknown]:
         return self.__unknownList
 
+    def getCanonicalCinemaList(self) -> list[Cinema]:
+        """ Objects whose file and directory names were already in the format this project renames files to. """
+
+        return self.__canonicalList
+
     def getAlreadyCorrectCinemaList(self) -> list[Cinema]:
         return self.__alreadyCorrectList
 
@@ -51,163 +133,507 @@ class Parser:
     def getProcessedCinemaList(self) -> list[Cinema]:
         return self.__processedCinemaList
 
+    def getStats(self) -> ParseStats or None:
+        """ Counters and timings of the last parse, or None if profiling is disabled. """
+
+        return self.__stats
+
+    def getNumRejected(self) -> int:
+        """ Number of files found in searched directories or manifests that the media filter rejected during the last
+        parse. """
 
+        return self.__numRejected
 
-    def parseAndGetList(self, pathList: list[str] or str) -> list[Cinema]:
-        self.parseCinemaPaths(pathList)
+
+
+    def parseAndGetList(self, pathList: list[str] or str, workers: int = 1) -> list[Cinema]:
+        self.parseCinemaPaths(pathList, workers)
         return self.getUnprocessedList()
 
-    def parseCinemaPaths(self, pathList: list[str] or str) -> None:
+    def parseCinemaPaths(self, pathList: list[str] or str, workers: int = 1) -> None:
         """ Main method for this class. Performs all the processing on a passed list and extracts Unknown, Cinema, and Cinema objects with errors into separate lists. """
 
-        if isinstance(pathList, str):
-            pathList = [pathList]
+        self.__partitionRuns(self.iterCinemaRuns(pathList, workers))
+
+    def parseManifest(self, manifestPathList: list[str] or str, workers: int = 1) -> None:
+        """ Perform the same processing as parseCinemaPaths on the files listed in manifest files (see
+        manifest.readManifest) instead of on the filesystem, so that names from another machine can be planned without
+        the files being present. The listed files are not accessed. """
+
+        if isinstance(manifestPathList, str):
+            manifestPathList = [manifestPathList]
+
+        entries = chain.from_iterable(readManifest(manifestPath) for manifestPath in manifestPathList)
+        self.__partitionRuns(self.iterManifestRuns(entries, workers))
+
+    def __partitionRuns(self, runs: Iterable[list[Cinema]]) -> None:
+        """ Merge sorted runs into the unprocessed list and split them into the category lists. """
+
+        start = time.perf_counter()
+        runList = list(runs)  # the parse itself happens here
+        mergeStart = time.perf_counter()
 
-        pathList = natsorted(pathList)  # sort list
         cinemaList: list[Cinema] = []
+        categoryDict: dict[str, list[Cinema]] = {self.UNKNOWN: [], self.CANONICAL: [], self.ALREADY_CORRECT: [],
+                                                 self.PROCESSED: []}
+
+        # Single pass over the sorted runs of each directory, merged into one ordered list. Runs are merged by directory
+        # first, so that a directory's files stay together for the tree previews, even when the directory was split
+        # across runs. Each object is appended to its category as it comes off the heap
+        for obj in heapq.merge(*runList, key=self.__getMergeKey):
+            cinemaList.append(obj)
+            categoryDict[self.getCategory(obj)].append(obj)
+
+        if self.__stats is not None:
+            end = time.perf_counter()
+            self.__stats.addTime(ParseStats.MERGING, end - mergeStart)
+            self.__stats.addTime(ParseStats.TOTAL, end - start)
+
+        self.__unprocessedList = cinemaList
+        self.__unknownList = categoryDict[self.UNKNOWN]
+        self.__canonicalList = categoryDict[self.CANONICAL]
+        self.__alreadyCorrectList = categoryDict[self.ALREADY_CORRECT]
+        self.__processedCinemaList = categoryDict[self.PROCESSED]
+
+    @staticmethod
+    def __getMergeKey(obj: Cinema) -> tuple[str, tuple]:
+        """ (old directory path, sort key). Every object of a run has the same directory, so runs sorted by sort key
+        are also sorted by this key. """
+
+        return obj.getOldDirPath(), obj.getSortKey()
+
+    def iterCategorizedCinemaPaths(self, pathList: list[str] or str, workers: int = 1) -> Iterator[tuple[str, Cinema]]:
+        """ Lazily parse a list of file and directory paths, yielding (category, Cinema object) pairs as soon as each
+        object is found, so that callers can begin working before the whole list has been parsed. """
+
+        for obj in self.iterCinemaPaths(pathList, workers):
+            yield self.getCategory(obj), obj
+
+    @classmethod
+    def getCategory(cls, obj: Cinema) -> str:
+        """ Return the category of a parsed Cinema object: UNKNOWN, CANONICAL, ALREADY_CORRECT, or PROCESSED. Correct
+        objects are CANONICAL when their names were recognized by the canonical fast path (see
+        Classifier.classifyCanonical), which is nearly always, and ALREADY_CORRECT otherwise. """
+
+        if isinstance(obj, Unknown):
+            return cls.UNKNOWN
+        elif obj.hasCorrectFileName() and obj.hasCorrectDirName():
+            return cls.CANONICAL if obj.hasCanonicalFileName() else cls.ALREADY_CORRECT
+        else:
+            return cls.PROCESSED
+
+    def iterCinemaPaths(self, pathList: list[str] or str, workers: int = 1) -> Iterator[Cinema]:
+        """ Lazily parse a list of file and directory paths, yielding the Cinema objects of each directory as soon as
+        the directory has been parsed, ordered by their sort keys. """
+
+        return chain.from_iterable(self.iterCinemaRuns(pathList, workers))
+
+    def iterCinemaRuns(self, pathList: list[str] or str, workers: int = 1) -> Iterator[list[Cinema]]:
+        """ Lazily parse a list of file and directory paths, yielding a run for each directory the Cinema objects were
+        found in, sorted by their sort keys. Runs are small, so they are cheap to sort as they stream in, and any number
+        of them can be merged into a single ordered list with heapq.merge. """
+
+        return self.__iterSortedRuns(self.__iterUnorderedCinemaPaths(pathList, workers))
+
+    def iterManifestRuns(self, entries: Iterable[ManifestEntry], workers: int = 1) -> Iterator[list[Cinema]]:
+        """ Like iterCinemaRuns, but for a stream of manifest entries, without touching the filesystem. Entries are
+        treated like the files of a searched directory: those rejected by the media filter (by extension only) are
+        counted, and those that aren't recognized are left out. The size and modification time of an entry, if listed,
+        let its classification be cached. """
+
+        return self.__iterSortedRuns(self.__iterManifestCinema(entries, workers))
+
+    def __iterSortedRuns(self, cinemaIterator: Iterator[Cinema]) -> Iterator[list[Cinema]]:
+        """ Group consecutive Cinema objects by directory, and yield each group sorted by sort key. """
+
+        for _, run in groupby(cinemaIterator, key=self.__getOldDirPath):
+            if self.__stats is None:
+                yield sorted(run, key=self.__getSortKey)
+            else:
+                run = list(run)  # parse the run's objects before timing the sort
+
+                with self.__stats.time(ParseStats.SORTING):
+                    run.sort(key=self.__getSortKey)
+
+                yield run
+
+    def __iterManifestCinema(self, entries: Iterable[ManifestEntry], workers: int) -> Iterator[Cinema]:
+        self.__numRejected = 0
+        if self.__stats is not None:
+            self.__stats.reset()
+        mediaEntries = (entry for entry in entries if self.__isMediaEntry(entry))
+
+        try:
+            if workers > 1:
+                batchSize = self.MAX_CHUNK_SIZE * workers * 4  # entries read from the stream between classifications
+
+                with self.__newExecutor(workers) as executor:
+                    while batch := [(entry.path, entry) for entry in islice(mediaEntries, batchSize)]:
+                        for (path, _), classified in zip(batch, self.__classifyParallel(batch, executor, workers)):
+                            if classified:
+                                yield self.__buildCinema(path, classified)
+            else:
+                for entry in mediaEntries:
+                    cinema = self._getCinemaFile(entry.path, entry)
+
+                    if not isinstance(cinema, Unknown):
+                        yield cinema
+        finally:  # also when the consumer stops early or an error is raised, so what was classified isn't lost
+            if self.__cache:
+                self.__cache.save()
+
+    def __isMediaEntry(self, entry: ManifestEntry) -> bool:
+        if self.__isMedia(os.path.basename(entry.path)):
+            return True
+
+        self.__numRejected += 1
+        return False
+
+    def __isMedia(self, name: str, path: str or None = None) -> bool:
+        """ Pass a file through the media filter. """
+
+        if self.__stats is None:
+            return self.__mediaFilter.isMedia(name, path)
+
+        with self.__stats.time(ParseStats.FILTERING):
+            isMedia = self.__mediaFilter.isMedia(name, path)
+
+        self.__stats.count(ParseStats.FILES_SEEN)
+        if not isMedia:
+            self.__stats.count(ParseStats.FILES_REJECTED)
+
+        return isMedia
 
-        for path in pathList:
-            cinema = self._getCinema(path)
+    def __iterUnorderedCinemaPaths(self, pathList: list[str] or str, workers: int = 1) -> Iterator[Cinema]:
+        """ Parse the passed paths in the order given, yielding the Cinema objects of each directory together. With
+        more than one worker, the files of each passed path are classified in chunks by a process pool, and the results
+        are yielded in the same order as they would be in a single process. """
 
-            if isinstance(cinema, list):
-                cinemaList += cinema
+        if isinstance(pathList, str):
+            pathList = [pathList]
+
+        self.__numRejected = 0
+        if self.__stats is not None:
+            self.__stats.reset()
+
+        try:
+            if workers > 1:
+                with self.__newExecutor(workers) as executor:
+                    fileList = []  # consecutive file paths are classified together
+
+                    for path in pathList:
+                        if not os.path.isfile(path):
+                            yield from self.__getCinemaFilesParallel(fileList, executor, workers)
+                            yield from self.__getCinemaDirParallel(path, executor, workers)
+                            fileList = []
+                        elif self.__isMedia(os.path.basename(path), path):
+                            fileList.append((path, None))
+                        else:
+                            yield from self.__getCinemaFilesParallel(fileList, executor, workers)
+                            yield self.__rejectFile(path)
+                            fileList = []
+
+                    yield from self.__getCinemaFilesParallel(fileList, executor, workers)
             else:
-                cinemaList.append(cinema)
-
-        self.__unprocessedList = cinemaList.copy()
-
-        # Extract unknown files from passed list of paths
-        unknownList: list[Unknown] = []
-        for obj in cinemaList[:]:
-            if isinstance(obj, Unknown):
-                unknownList.append(obj)
-                cinemaList.remove(obj)
-        self.__unknownList = unknownList
-
-        # Extract already-correct Cinema files from passed list
-        alreadyCorrectList: list[Cinema] = []
-        for obj in cinemaList[:]:
-            if obj.hasCorrectFileName() and obj.hasCorrectDirName():
-                alreadyCorrectList.append(obj)
-                cinemaList.remove(obj)
-        self.__alreadyCorrectList = alreadyCorrectList
-
-        # Extract Cinema objects that contain errors from passed list
-        # errorList: list[Cinema] = []
-        # for obj in cinemaList[:]:
-        #         if obj.hasError():
-        #             errorList.append(obj)
-        #             cinemaList.remove(obj)
-        # self.__errorList = errorList
-
-        self.__processedCinemaList = cinemaList
-
-    def _getCinema(self, path: str) -> Cinema or list[Cinema]:
-        """ Parse a single path in string form and return either a single concrete Cinema object, or a list of them,
+                for path in pathList:
+                    yield from self._getCinema(path)
+        finally:  # also when the consumer stops early or an error is raised, so what was classified isn't lost
+            if self.__cache:
+                self.__cache.save()
+
+    def _getCinema(self, path: str) -> Iterator[Cinema]:
+        """ Parse a single path in string form and yield either a single concrete Cinema object, or each of them,
         based on file/directory contents. """
 
-        if os.path.isfile(path):
-            return self._getCinemaFile(path)
+        if not os.path.isfile(path):
+            yield from self._getCinemaDir(path)
+        elif self.__isMedia(os.path.basename(path), path):
+            yield self._getCinemaFile(path)
+        else:
+            yield self.__rejectFile(path)
+
+    def _getCinemaFile(self, passed: str, entry: os.DirEntry or ManifestEntry or None = None) -> Cinema:
+        """ Parse a single file and return a single Cinema object. A DirEntry for the file saves a stat call when the
+        cache is in use, and a ManifestEntry replaces it. """
+
+        if self.__cache:
+            classified = self.__getCachedClassification(passed, entry)
+        else:
+            classified = self.__classify(passed)
+
+        return self.__buildCinema(passed, classified)
+
+    def _getCinemaDir(self, path: str) -> Iterator[Cinema]:
+        """ Parse a directory tree and yield its Cinema objects, or a single Unknown object if none exist. """
+
+        found = False
+
+        for entry in self._walkMediaEntries(path):
+            cinema = self._getCinemaFile(entry.path, entry)
+
+            if not isinstance(cinema, Unknown):
+                found = True
+                yield cinema
+
+        if not found:
+            yield Unknown(path, "No valid files in directory", isFile=False)
+
+    def _walkMediaEntries(self, path: str) -> Iterator[os.DirEntry]:
+        """ Walk a directory like _walkFileEntries, yielding only the file entries that pass the media filter. Rejected
+        files are counted rather than parsed. """
+
+        for entry in self._walkFileEntries(path, 0):
+            if self.__isMedia(entry.name, entry.path):
+                yield entry
+            else:
+                self.__numRejected += 1
+
+    def _walkFileEntries(self, path: str, depth: int) -> Iterator[os.DirEntry]:
+        """ Walk a directory with os.scandir and yield the file entries of each directory before descending into its
+        subdirectories. The DirEntry type information is reused, so no extra stat call is made per entry. Each
+        directory is listed completely before its files are yielded, so it isn't held open while they are parsed. """
+
+        start = time.perf_counter()
+        fileList = []
+        subDirList = []
+
+        with os.scandir(path) as dirContents:
+            for entry in dirContents:
+                if self.__isExcluded(entry.name):
+                    continue
+
+                if entry.is_file():
+                    fileList.append(entry)
+                elif entry.is_dir(follow_symlinks=False):
+                    subDirList.append(entry.path)
+
+        if self.__stats is not None:
+            self.__stats.addTime(ParseStats.LISTING, time.perf_counter() - start)
+
+        yield from fileList
+
+        if self.__maxDepth is not None and depth >= self.__maxDepth:
+            return
+
+        for subDir in sorted(subDirList):
+            try:
+                yield from self._walkFileEntries(subDir, depth + 1)
+            except PermissionError:  # unreadable subdirectories are skipped rather than ending the whole search
+                pass
+
+    def __newExecutor(self, workers: int) -> "ProcessPoolExecutor":
+        """ Return a process pool whose workers are initialized with this Parser's classifier. concurrent.futures
+        pulls in multiprocessing, so it is only imported when a pool is needed. """
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        return ProcessPoolExecutor(workers, initializer=_initClassifierWorker, initargs=(self.__classifier,))
+
+    def __getCinemaFilesParallel(self, fileList: list[tuple[str, None]], executor: "ProcessPoolExecutor",
+                                 workers: int) -> Iterator[Cinema]:
+        """ Parse passed file paths like _getCinemaFile, classifying them with the process pool. """
+
+        for (path, _), classified in zip(fileList, self.__classifyParallel(fileList, executor, workers)):
+            yield self.__buildCinema(path, classified)
+
+    def __getCinemaDirParallel(self, path: str, executor: "ProcessPoolExecutor", workers: int) -> Iterator[Cinema]:
+        """ Parse a directory tree like _getCinemaDir, classifying the files found in it with the process pool. """
+
+        entryList = [(entry.path, entry) for entry in self._walkMediaEntries(path)]
+        found = False
+
+        for (filePath, _), classified in zip(entryList, self.__classifyParallel(entryList, executor, workers)):
+            if classified:
+                found = True
+                yield self.__buildCinema(filePath, classified)
+
+        if not found:
+            yield Unknown(path, "No valid files in directory", isFile=False)
+
+    def __classifyParallel(self, entryList: list[tuple[str, os.DirEntry or ManifestEntry or None]],
+                           executor: "ProcessPoolExecutor", workers: int) -> list[tuple[type, dict] or None]:
+        """ Classify (path, entry) pairs, in order. Files found in the cache are resolved here, and the rest are split
+        into chunks for the process pool when there are enough of them to outweigh the pool's overhead. """
+
+        start = time.perf_counter()
+        classifiedList = [None] * len(entryList)
+        missList: list[tuple[int, tuple[int, int] or None]] = []  # [(index, (size, mtimeNs)), ...]
+
+        for i, (path, entry) in enumerate(entryList):
+            stamp = self.__getStamp(path, entry) if self.__cache else None
+
+            if stamp is not None:
+                cached = self.__cache.get(path, *stamp)
+
+                if cached is not None:
+                    classifiedList[i] = self.__fromRecord(CinemaRecord(path, *cached))
+                    continue
+
+            missList.append((i, stamp))
+
+        missPathList = [entryList[i][0] for i, _ in missList]
+        batchStart = time.perf_counter()
+
+        if len(missPathList) < self.PARALLEL_THRESHOLD:
+            recordList = _classifyChunk(missPathList, self.__classifier)
         else:
-            return self._getCinemaDir(path)
+            chunkSize = min(self.MAX_CHUNK_SIZE, -(-len(missPathList) // (workers * 4)))  # ceiling division
+            chunkList = [missPathList[start:start + chunkSize] for start in range(0, len(missPathList), chunkSize)]
+            recordList = [record for chunk in executor.map(_classifyChunk, chunkList) for record in chunk]
+
+        if self.__stats is not None:
+            self.__stats.addTime(ParseStats.CACHE, batchStart - start)
+            self.__stats.addTime(ParseStats.BATCH, time.perf_counter() - batchStart)
+            self.__stats.count(ParseStats.CACHE_HITS, len(entryList) - len(missList))
+
+            for record in recordList:
+                self.__countClassification(record.className)
+
+        for (i, stamp), record in zip(missList, recordList):
+            classifiedList[i] = self.__fromRecord(record)
+
+            if stamp is not None:
+                self.__cache.put(record.path, *stamp, record.className, record.fields)
 
-    def _getCinemaFile(self, passed: str) -> Cinema:
-        """ Parse a single file and return a single Cinema object. """
+        return classifiedList
 
+    def __classify(self, passed: str) -> tuple[type, dict[str, str or None]] or None:
         absPath = os.path.split(passed)
         temp = os.path.splitext(absPath[1])  # file name
         fileName = temp[0]  # file name without extension
 
-        cleaned = self.__getCleanFileName(fileName)
+        if self.__stats is None:
+            return self.__classifier.classify(fileName)
 
-        for pattern, cls in self.__getPatternDict().items():
-            specificMatch = pattern.search(cleaned)
+        with self.__stats.time(ParseStats.CANONICAL):
+            classified = self.__classifier.classifyCanonical(fileName)
 
-            if specificMatch:
-                resolutionMatch = self.__getResolutionPattern().search(cleaned)
-                encodingMatch = self.__getEncodingPattern().search(cleaned)
+        if classified:
+            self.__stats.count(ParseStats.CANONICAL_HITS)
+            return classified
 
-                return cls(passed, specificMatch, resolutionMatch, encodingMatch)
+        with self.__stats.time(ParseStats.CLEANING):
+            cleanFileName = self.__classifier.getCleanFileName(fileName)
 
-        return Unknown(passed, "Not a recognized Cinema file", isFile=True)
+        with self.__stats.time(ParseStats.MATCHING):
+            classified = self.__classifier.classifyCleanFileName(cleanFileName)
 
-    def _getCinemaDir(self, path: str) -> list[Cinema]:
-        """ Parse a single directory and return a list of Cinema objects, or a single Unknown object if none exist.
-        Does not recurse into subdirectories. """
+        self.__countClassification(classified[0].__name__ if classified else None)
+        return classified
 
-        dirContents = os.listdir(path)  # returns only the file names (not full paths)
-        returnList = []
+    def __countClassification(self, className: str or None) -> None:
+        self.__stats.count(ParseStats.PATTERN_ATTEMPTS)
 
-        for item in dirContents:
-            itemPath = os.path.join(path, item)  # convert list items to full paths
+        if className:
+            self.__stats.count(ParseStats.MATCHED.format(className))
+        else:
+            self.__stats.count(ParseStats.UNRECOGNIZED)
+
+    def __getCachedClassification(self, passed: str,
+                                  entry: os.DirEntry or ManifestEntry or None) -> tuple[type, dict] or None:
+        """ Classify a file through the cache, only classifying it again if it is new or has changed. """
+
+        start = time.perf_counter() if self.__stats is not None else 0.0  # only timed while profiling
+        stamp = self.__getStamp(passed, entry)
+
+        if stamp is None:  # manifest entries without a size and modification time can't be cached
+            return self.__classify(passed)
 
-            # only process files (no recursion into directory trees)
-            if os.path.isfile(itemPath):
-                cinema = self._getCinemaFile(itemPath)
+        cached = self.__cache.get(passed, *stamp)
 
-                if not isinstance(cinema, Unknown):
-                    returnList.append(cinema)
+        if self.__stats is not None:
+            self.__stats.addTime(ParseStats.CACHE, time.perf_counter() - start)
 
-        if len(returnList) == 0:
-            return [Unknown(path, "No valid files in directory", isFile=False)]
+        if cached is not None:
+            if self.__stats is not None:
+                self.__stats.count(ParseStats.CACHE_HITS)
+
+            return self.__fromRecord(CinemaRecord(passed, *cached))
+
+        classified = self.__classify(passed)
+
+        if classified:
+            cls, fields = classified
+            self.__cache.put(passed, *stamp, cls.__name__, fields)
         else:
-            return returnList
+            self.__cache.put(passed, *stamp, None, None)
+
+        return classified
 
-    def __getCleanFileName(self, path: str) -> str:
-        """ Process the original file name and return a cleaned string for continued processing. """
+    @staticmethod
+    def __getStamp(path: str, entry: os.DirEntry or ManifestEntry or None) -> tuple[int, int] or None:
+        """ Return the (size, mtimeNs) that cache entries are validated against. Manifest entries are never stat'ed,
+        and return None if either value wasn't listed. """
 
-        # replace . and _ with space
-        # .'s that aren't preceded by a capital letter (F.B.I.)
-        cleanFileName = re.sub(self.__spacingPattern, " ", path)
+        if isinstance(entry, ManifestEntry):
+            return (entry.size, entry.mtimeNs) if entry.size is not None and entry.mtimeNs is not None else None
 
-        # remove any double spaces (or more)
-        cleanFileName = re.sub(self.__doubleSpacesPattern, " ", cleanFileName)
+        stat = entry.stat() if entry else os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
 
-        # add spaces that should be there
-        cleanFileName = re.sub(self.__missingSpacesPattern, r"\2 \3", cleanFileName)
+    def __fromRecord(self, record: CinemaRecord) -> tuple[type, dict] or None:
+        """ Convert a CinemaRecord back into a (class, fields) classification. """
 
-        # remove tags at beginning of file name
-        cleanFileName = re.sub(self.__beginningTagsPattern, "", cleanFileName)
+        return (self.__classDict[record.className], record.fields) if record.className else None
 
-        return cleanFileName
+    def __buildCinema(self, path: str, classified: tuple[type, dict] or None) -> Cinema:
+        if self.__stats is not None:
+            with self.__stats.time(ParseStats.CONSTRUCTION):
+                return self.__newCinema(path, classified)
 
-    def __getPatternDict(self) -> dict:
-        return self.__patternDict
+        return self.__newCinema(path, classified)
 
-    def __getEncodingPattern(self) -> re.Pattern:
-        return self.__encodingPattern
+    @staticmethod
+    def __newCinema(path: str, classified: tuple[type, dict] or None) -> Cinema:
+        if classified:
+            cls, fields = classified
+            return cls(path, fields)
 
-    def __getResolutionPattern(self) -> re.Pattern:
-        return self.__resolutionPattern
+        return Unknown(path, "Not a recognized Cinema file", isFile=True)
 
-    def __buildPatterns(self) -> None:
-        """ Build's the CinemaParser's required Pattern objects from the Cinema base class and its subclasses. """
+    def __rejectFile(self, path: str) -> Unknown:
+        """ Count a passed file that the media filter rejected. Unlike files found in directories, it is still reported
+        as an Unknown object, since it was asked for by name. """
 
-        self.__buildConcretePatternList()
-        self.__buildStandardPatterns()
+        self.__numRejected += 1
+        return Unknown(path, "Not a media file", isFile=True)
 
-    def __buildConcretePatternList(self) -> None:
-        """ Build the concrete Cinema object pattern list from the Cinema subclasses. """
+    def __isExcluded(self, name: str) -> bool:
+        for pattern in self.__excludeList:
+            if fnmatch(name, pattern):
+                return True
 
-        patternDict: dict = {}
+        return False
 
-        for cls in Cinema.__subclasses__():
-            pattern = cls.getPattern()
-            if pattern:  # account for Unknown class by omitting None pattern returned by Unknown class
-                patternDict[pattern] = cls
 
-        if len(patternDict) == 0:
-            raise ClassPatternsEmpty
+##################
+# WORKER PROCESS #
+##################
 
-        self.__patternDict = patternDict
+_workerClassifier: Classifier or None = None
 
-    def __buildStandardPatterns(self) -> None:
-        """ Build the common patterns from the Cinema base class. """
 
-        self.__resolutionPattern = re.compile(Cinema.getResolutionPattern())
-        self.__encodingPattern = re.compile(Cinema.getEncodingPattern())
+def _initClassifierWorker(classifier: Classifier) -> None:
+    """ Process pool initializer that gives each worker process its own copy of the parser's classifier. """
+
+    global _workerClassifier
+    _workerClassifier = classifier
+
+
+def _classifyChunk(pathList: list[str], classifier: Classifier or None = None) -> list[CinemaRecord]:
+    """ Classify a chunk of file paths, returning a CinemaRecord for each. Runs in a worker process unless a classifier
+    is passed. """
+
+    classifier = classifier or _workerClassifier
+    recordList = []
+
+    for path in pathList:
+        fileName = os.path.splitext(os.path.basename(path))[0]  # file name without extension
+        classified = classifier.classify(fileName)
+
+        if classified:
+            recordList.append(CinemaRecord(path, classified[0].__name__, classified[1]))
+        else:
+            recordList.append(CinemaRecord(path, None, None))
 
-        self.__spacingPattern = re.compile(r"((?<![A-Z])\.|\.(?=[A-Z][a-z])|\.(?=[0-9])|_)")
-        self.__doubleSpacesPattern = re.compile(r" {2,}")
-        self.__missingSpacesPattern = re.compile(r"((\w)([([])|([])])(\w))")
-        self.__beginningTagsPattern = re.compile(r"^\[.+?] ?")
+    return recordList
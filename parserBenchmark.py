@@ -0,0 +1,345 @@
+import gc
+import os
+import json
+import random
+import re
+import sys
+import time
+import platform
+import argparse
+import tracemalloc
+from cinema import Cinema
+from show import Show
+from movie import Movie
+from classifierRegex import ClassifierRegex
+from classifierToken import ClassifierToken
+
+
+# Benchmarks for the Parser. Run directly:  python parserBenchmark.py [number of names] [number of records]
+#                                            [--seed N] [--json results.json]
+# Compare two result files, exiting with 1 if any stage regressed:
+#                                            python parserBenchmark.py --compare old.json new.json [--tolerance 0.1]
+
+
+TITLE_WORDS = ["the", "office", "rick", "and", "morty", "ghost", "adventures", "american", "history", "x", "legion",
+               "anchorman", "legend", "of", "ron", "burgundy", "as", "above", "so", "below", "amateur", "night",
+               "curse", "farmhouse", "shingeki", "no", "kyojin", "final", "season", "baby", "shower", "explosion"]
+TAGS = ["WEBRip", "BluRay", "WEB", "HDTV", "AAC-RARBG", "YIFY", "anoXmous_", "x264-BAE", "H264", "DDP5.1", "REPACK"]
+GROUPS = ["YTS.MX", "rartv", "eztv", "HorribleSubs", "SubsPlease", "Erai-raws"]
+RESOLUTIONS = ["480p", "720p", "1080p"]
+ENCODINGS = ["x264", "x265", "H.264", "h265", "HEVC"]
+JUNK_EXTENSIONS = [".nfo", ".jpg", ".txt", ".part", ".srt"]
+
+
+def generateCorpus(count: int, seed: int = 0) -> list[str]:
+    """ Return a reproducible list of release-style file names (without extensions) made of shows, movies, and junk. """
+
+    rand = random.Random(seed)
+
+    def title() -> list[str]:
+        return [rand.choice(TITLE_WORDS).capitalize() for _ in range(rand.randint(1, 5))]
+
+    def tags() -> list[str]:
+        return [rand.choice(RESOLUTIONS), rand.choice(TAGS), rand.choice(ENCODINGS)][:rand.randint(0, 3)]
+
+    corpus = []
+    for _ in range(count):
+        kind = rand.random()
+        separator = rand.choice([".", " ", "_"])
+
+        if kind < 0.45:  # show
+            marker = rand.choice(["S{:02d}E{:02d}", "{}x{:02d}", "Season {} Episode {}"]).format(rand.randint(1, 20),
+                                                                                              rand.randint(1, 24))
+            words = title() + [marker] + (title() if rand.random() < 0.5 else []) + tags()
+        elif kind < 0.85:  # movie
+            year = rand.randint(1950, 2023)
+            words = title() + [rand.choice([f"{year}", f"({year})", f"[{year}]"])] + tags()
+        else:  # junk
+            words = title() + tags() + [rand.choice(JUNK_EXTENSIONS)[1:]]
+
+        name = separator.join(words)
+        if rand.random() < 0.1:
+            name = f"[{rand.choice(TAGS)}] {name}"
+        if rand.random() < 0.1:
+            name = f"{name}[{rand.choice(GROUPS)}]"
+        corpus.append(name)
+
+    return corpus
+
+
+LEGACY_CLEANING = [(re.compile(r"((?<![A-Z])\.|\.(?=[A-Z][a-z])|\.(?=[0-9])|_)"), " "),
+                   (re.compile(r" {2,}"), " "),
+                   (re.compile(r"((\w)([([])|([])])(\w))"), r"\2 \3"),
+                   (re.compile(r"^\[.+?] ?"), "")]
+
+
+def legacyClassify(fileName: str) -> tuple[type, dict] or None:
+    """ The classification used before the master pattern: four unconditional cleaning passes, then each subclass
+    pattern tried in turn, followed by separate resolution and encoding searches. """
+
+    cleaned = fileName
+    for pattern, replacement in LEGACY_CLEANING:
+        cleaned = re.sub(pattern, replacement, cleaned)
+
+    for cls in (Show, Movie):
+        specificMatch = cls.getPattern().search(cleaned)
+
+        if specificMatch:
+            resolutionMatch = Cinema.getResolutionPattern().search(cleaned)
+            encodingMatch = Cinema.getEncodingPattern().search(cleaned)
+            fields = specificMatch.groupdict()
+            fields["resolution"] = resolutionMatch.group("resolution") if resolutionMatch else None
+            fields["encoding"] = encodingMatch.group("encoding") if encodingMatch else None
+
+            return cls, fields
+
+    return None
+
+
+def measure(function, inputList: list, repeat: int = 3) -> dict:
+    """ Time a function over every input. Throughput is taken from the best of several loops over all the inputs, and
+    the latency percentiles from timing each call on its own, since the timer's overhead would skew the throughput.
+    Garbage collection is paused while timing, as timeit does, so its pauses aren't charged to whichever call they
+    happen to land in. """
+
+    gcEnabled = gc.isenabled()
+    gc.disable()
+
+    try:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for item in inputList:
+                function(item)
+            best = min(best, time.perf_counter() - start)
+
+        latencyList = []
+        for item in inputList:
+            start = time.perf_counter_ns()
+            function(item)
+            latencyList.append(time.perf_counter_ns() - start)
+        latencyList.sort()
+    finally:
+        if gcEnabled:
+            gc.enable()
+
+    def percentile(fraction: float) -> float:
+        return latencyList[min(len(latencyList) - 1, round(fraction * (len(latencyList) - 1)))] / 1000
+
+    return {"perSec": len(inputList) / best, "p50Us": percentile(0.50), "p99Us": percentile(0.99),
+            "maxUs": latencyList[-1] / 1000}
+
+
+def benchmarkStages(corpus: list[str]) -> dict:
+    """ Print the throughput and per-name latency of each stage of classification: cleaning, each subclass pattern,
+    the resolution and encoding patterns, the full classification by each engine, the canonical fast path on release
+    names (which it rejects) and on the names they are renamed to, and title capitalization with and without its
+    cache. """
+
+    classifier = ClassifierRegex()
+    cleanedList = [classifier.getCleanFileName(name) for name in corpus]
+    classifiedList = [classified for classified in map(classifier.classify, corpus) if classified]
+    titleList = [fields["title"] for _, fields in classifiedList]
+    canonicalList = [cls("name.mkv", fields).getNewFileName() for cls, fields in classifiedList]  # renamed names
+    capitalize = Cinema._capitalize.__wrapped__  # without the lru_cache
+
+    stageDict = {
+        "cleaning": (classifier.getCleanFileName, corpus),
+        "showPattern": (Show.getPattern().search, cleanedList),
+        "moviePattern": (Movie.getPattern().search, cleanedList),
+        "resolutionPattern": (Cinema.getResolutionPattern().search, cleanedList),
+        "encodingPattern": (Cinema.getEncodingPattern().search, cleanedList),
+        "classifyRegex": (classifier.classify, corpus),
+        "classifyToken": (ClassifierToken().classify, corpus),
+        "canonicalMiss": (classifier.classifyCanonical, corpus),
+        "canonicalHit": (classifier.classifyCanonical, canonicalList),
+        "capitalize": (capitalize, titleList),
+        "capitalizeCached": (Cinema._capitalize, titleList),
+    }
+
+    results = {}
+
+    print(f"STAGES ({len(corpus)} NAMES)")
+    print(f"  {'stage':<20}{'per sec':>12}{'p50 us':>10}{'p99 us':>10}{'max us':>10}")
+    for stage, (function, inputList) in stageDict.items():
+        results[stage] = measure(function, inputList)
+        result = results[stage]
+        print(f"  {stage:<20}{result['perSec']:>12.0f}{result['p50Us']:>10.2f}{result['p99Us']:>10.2f}"
+              f"{result['maxUs']:>10.1f}")
+    print()
+
+    return results
+
+
+def compareResults(oldPath: str, newPath: str, tolerance: float = 0.10) -> int:
+    """ Print the change in throughput and p99 latency of each stage between two result files, and return the number
+    of stages whose throughput dropped by more than the tolerance. """
+
+    with open(oldPath) as inp:
+        old = json.load(inp)["results"]["stages"]
+    with open(newPath) as inp:
+        new = json.load(inp)["results"]["stages"]
+
+    regressions = 0
+
+    print(f"  {'stage':<20}{'per sec':>10}{'p99':>10}")
+    for stage in [stage for stage in old if stage in new]:
+        throughput = new[stage]["perSec"] / old[stage]["perSec"]
+        p99 = new[stage]["p99Us"] / old[stage]["p99Us"]
+        flag = ""
+
+        if throughput < 1 - tolerance:
+            regressions += 1
+            flag = "  REGRESSION"
+
+        print(f"  {stage:<20}{throughput:>9.2f}x{p99:>9.2f}x{flag}")
+
+    return regressions
+
+
+def benchmarkClassification(corpus: list[str]) -> dict:
+    """ Print files/sec for the legacy classification, the master pattern, and the token engine, after checking that
+    they agree. """
+
+    classifier = ClassifierRegex()
+    tokenClassifier = ClassifierToken()
+
+    for name in corpus:
+        if not legacyClassify(name) == classifier.classify(name) == tokenClassifier.classify(name):
+            raise AssertionError(f"Classifiers disagree on: {name}")
+
+    start = time.perf_counter()
+    for name in corpus:
+        legacyClassify(name)
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for name in corpus:
+        classifier.classify(name)
+    master = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for name in corpus:
+        tokenClassifier.classify(name)
+    token = time.perf_counter() - start
+
+    print(f"CLASSIFICATION ({len(corpus)} NAMES)")
+    print(f"  legacy loop:       {len(corpus) / legacy:>10.0f} files/sec")
+    print(f"  master pattern:    {len(corpus) / master:>10.0f} files/sec")
+    print(f"  speedup:           {legacy / master:>10.2f}x")
+    print(f"  token engine:      {len(corpus) / token:>10.0f} files/sec\n")
+
+    return {"legacyPerSec": len(corpus) / legacy, "masterPerSec": len(corpus) / master,
+            "tokenPerSec": len(corpus) / token}
+
+
+# Names that make the subclass patterns backtrack, built from a number of repeated parts
+PATHOLOGICAL_NAMES = {
+    "dash-separated words": lambda n: " - ".join(["Some Word"] * n),
+    "words then dashes": lambda n: "a " * n + "- b " * n,
+    "dotted words, no marker": lambda n: ".".join(["Title-Part"] * n) + ".S01",
+    "long episode title": lambda n: "Show S01E01 " + "Word " * n + "(x)",
+}
+
+
+def benchmarkPathological(sizes: tuple = (5, 10, 15, 20, 40, 80, 160), regexLimit: float = 0.5) -> dict:
+    """ Print the time per name of both engines on names that make the subclass patterns backtrack, for growing
+    numbers of repeated parts. The regex engine is skipped at larger sizes once a name takes it over regexLimit seconds,
+    while the token engine's time should only grow in proportion to the name's length. """
+
+    engines = [ClassifierRegex(), ClassifierToken()]
+    results = {}
+
+    print("PATHOLOGICAL NAMES (TIME PER NAME)")
+    for description, build in PATHOLOGICAL_NAMES.items():
+        print(f"  {description}")
+        regexSkipped = False
+        results[description] = []
+
+        for size in sizes:
+            name = build(size)
+            timings = []
+
+            for engine in engines:
+                if isinstance(engine, ClassifierRegex) and regexSkipped:
+                    timings.append(None)
+                    continue
+
+                start = time.perf_counter()
+                engine.classify(name)
+                elapsed = time.perf_counter() - start
+
+                if isinstance(engine, ClassifierRegex) and elapsed > regexLimit:
+                    regexSkipped = True
+                timings.append(elapsed * 1000)
+
+            regexMs, tokenMs = timings
+            results[description].append({"chars": len(name), "regexMs": regexMs, "tokenMs": tokenMs})
+
+            regexText = "skipped" if regexMs is None else f"{regexMs:.3f} ms"
+            print(f"    {len(name):>5d} chars   regex: {regexText:>12}   token: {f'{tokenMs:.3f} ms':>10}")
+    print()
+
+    return results
+
+
+def benchmarkMemory(count: int) -> dict:
+    """ Print the bytes held per Cinema object when the recognized files of a simulated scan are kept alive, as they
+    are by the Parser's lists. Names are classified before measuring, so only the objects themselves are counted. """
+
+    classifier = ClassifierRegex()
+    corpus = generateCorpus(count)
+    classifiedList = []
+
+    for i, name in enumerate(corpus):
+        classified = classifier.classify(name)
+        if classified:
+            classifiedList.append((os.path.join("downloads", f"batch {i % 500}", f"{name}.mkv"), classified))
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    recordList = [cls(path, fields) for path, (cls, fields) in classifiedList]
+
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print(f"MEMORY ({len(recordList)} RECORDS FROM {count} FILES)")
+    print(f"  total:      {held / 2 ** 20:>10.1f} MiB")
+    print(f"  per record: {held / len(recordList):>10.0f} bytes\n")
+
+    return {"records": len(recordList), "bytesPerRecord": held / len(recordList)}
+
+
+def main() -> None:
+    argParser = argparse.ArgumentParser(description="Benchmarks for the Parser.")
+    argParser.add_argument("names", nargs="?", type=int, default=100_000, help="number of names to classify")
+    argParser.add_argument("records", nargs="?", type=int, default=1_000_000, help="number of files for memory use")
+    argParser.add_argument("--seed", type=int, default=0, help="seed of the generated corpus")
+    argParser.add_argument("--json", metavar="PATH", help="write the results to a JSON file")
+    argParser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two JSON result files")
+    argParser.add_argument("--tolerance", type=float, default=0.10,
+                           help="drop in throughput reported as a regression by --compare (default: 0.10)")
+    args = argParser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compareResults(*args.compare, args.tolerance) else 0)
+
+    corpus = generateCorpus(args.names, args.seed)
+    results = {
+        "stages": benchmarkStages(corpus),
+        "classification": benchmarkClassification(corpus),
+        "pathological": benchmarkPathological(),
+        "memory": benchmarkMemory(args.records),
+    }
+
+    if args.json:
+        meta = {"python": platform.python_version(), "platform": platform.platform(), "names": args.names,
+                "records": args.records, "seed": args.seed, "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+        with open(args.json, "w") as outp:
+            json.dump({"meta": meta, "results": results}, outp, indent=2)
+
+
+if __name__ == "__main__":
+    main()
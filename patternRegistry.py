@@ -0,0 +1,40 @@
+import re
+
+
+class PatternRegistry:
+    """ Central registry of the regular expressions used to clean and classify file names. Patterns are registered by
+    name as source strings, which is cheap enough to do at import time, and each is compiled exactly once, the first
+    time it is used. Compiled patterns are shared by everything in the process (Parsers, Classifiers, and Cinema
+    classes). Worker processes register the same sources when they import the modules that use them, and compile only
+    the patterns they use. """
+
+    __sourceDict: dict[str, str] = {}  # {name: source, ...}
+    __patternDict: dict[str, re.Pattern] = {}  # {name: compiled pattern, ...}, filled on first use
+
+    @classmethod
+    def register(cls, name: str, source: str) -> None:
+        """ Register the source of a pattern under a name, without compiling it. Registering a different source under
+        the same name replaces the pattern. """
+
+        if cls.__sourceDict.get(name) != source:
+            cls.__sourceDict[name] = source
+            cls.__patternDict.pop(name, None)
+
+    @classmethod
+    def getSource(cls, name: str) -> str or None:
+        """ Return the source registered under a name, or None, without compiling it. """
+
+        return cls.__sourceDict.get(name)
+
+    @classmethod
+    def get(cls, name: str) -> re.Pattern:
+        """ Return the pattern registered under a name, compiling it on first use. Raises KeyError if no pattern is
+        registered under the name. """
+
+        pattern = cls.__patternDict.get(name)
+
+        if pattern is None:
+            pattern = re.compile(cls.__sourceDict[name])
+            cls.__patternDict[name] = pattern
+
+        return pattern
@@ -0,0 +1,248 @@
+import asyncio
+from typing import Callable, NamedTuple, TYPE_CHECKING
+from concurrent.futures import ThreadPoolExecutor
+from cinema import Cinema
+from parser import Parser
+from movePlanner import MovePlanner
+from renamePlanner import RenamePlanner
+
+if TYPE_CHECKING:
+    from controller import Controller
+
+
+class PipelineEvent(NamedTuple):
+    """ Progress of a Cinema object through one stage of a Pipeline. """
+
+    stage: str  # Pipeline.SCAN, Pipeline.BACKUP, Pipeline.RENAME, or Pipeline.PIPELINE for the end of the run
+    status: str  # Pipeline.DONE, Pipeline.SKIPPED, Pipeline.FAILED, or Pipeline.FINISHED
+    obj: Cinema or None
+    detail: object = None  # the category when scanned, the error when failed, the method when integrated
+
+
+class Pipeline:
+    """ Scans, backs up, and renames or integrates cinema files as connected stages, so that the first files are in
+    their libraries while the rest of a batch is still being scanned. Stages are asyncio tasks joined by bounded
+    queues, so a slow stage holds the ones before it back instead of letting objects pile up in memory. Parsing runs in
+    a thread, and backups and file operations in thread pools, through the Controller.
+
+    Renames and integrations keep the guarantees of IntegrationExecutor: the first integration into a destination
+    directory finishes before the others into it start, integrations into the same file run one at a time, and those
+    that transfer data between devices (see MovePlanner) run at most the transfer workers at once per device pair.
+
+    Nothing is prompted for. Files are renamed as they are parsed. Each one is checked against the files planned before
+    it and the library indexes with a RenamePlanner as it is scanned, and fails there if it conflicts. Progress is
+    reported as PipelineEvents to the subscribed callbacks, which are called in the event loop's thread. """
+
+    SCAN = "scan"
+    BACKUP = "backup"
+    RENAME = "rename"
+    PIPELINE = "pipeline"
+
+    DONE = "done"
+    SKIPPED = "skipped"
+    FAILED = "failed"
+    FINISHED = "finished"
+
+    QUEUE_SIZE = 64
+
+    __controller: "Controller"
+    __isInLibrary: Callable[[Cinema], bool]
+    __libraryDict: dict[str, str or None]  # {"movie"/"show": library directory, or None to only rename, ...}
+    __copyFlag: bool
+    __overwriteFlag: bool
+    __workers: int
+    __transferWorkers: int
+    __subscriberList: list[Callable[[PipelineEvent], None]]
+
+    def __init__(self, controller: "Controller", isInLibrary: Callable[[Cinema], bool], moviesDir: str or None,
+                 showsDir: str or None, copyFlag: bool, overwriteFlag: bool, workers: int = 4,
+                 transferWorkers: int = 2):
+        self.__controller = controller
+        self.__isInLibrary = isInLibrary
+        self.__libraryDict = {"movie": moviesDir, "show": showsDir}
+        self.__copyFlag = copyFlag
+        self.__overwriteFlag = overwriteFlag
+        self.__workers = max(1, workers)
+        self.__transferWorkers = max(1, transferWorkers)
+        self.__subscriberList = []
+
+    def subscribe(self, callback: Callable[[PipelineEvent], None]) -> None:
+        self.__subscriberList.append(callback)
+
+    def run(self, pathList: list[str], scanWorkers: int = 1) -> None:
+        """ Run the pipeline over file and directory paths, returning once every file has been through it. """
+
+        asyncio.run(self.__run(pathList, scanWorkers))
+
+    async def __run(self, pathList: list[str], scanWorkers: int) -> None:
+        backupQueue: asyncio.Queue[Cinema or None] = asyncio.Queue(self.QUEUE_SIZE)
+        renameQueue: asyncio.Queue[Cinema or None] = asyncio.Queue(self.QUEUE_SIZE)
+        planner = self.__controller.newRenamePlanner(self.__libraryDict["movie"], self.__libraryDict["show"],
+                                                     self.__copyFlag, self.__overwriteFlag)
+
+        with ThreadPoolExecutor(1, thread_name_prefix="pipelineBackup") as backupPool, \
+                ThreadPoolExecutor(self.__workers, thread_name_prefix="pipelineRename") as renamePool, \
+                ThreadPoolExecutor(self.__workers, thread_name_prefix="pipelineTransfer") as transferPool:
+            await asyncio.gather(self.__scan(pathList, scanWorkers, planner, backupQueue),
+                                 self.__backup(backupQueue, renameQueue, backupPool),
+                                 self.__rename(renameQueue, renamePool, transferPool))
+
+        self.__emit(self.PIPELINE, self.FINISHED, None)
+
+    ##########
+    # STAGES #
+    ##########
+
+    async def __scan(self, pathList: list[str], scanWorkers: int, planner: RenamePlanner,
+                     outQueue: asyncio.Queue) -> None:
+        """ Parse the paths in a thread, passing the objects that need renaming or integrating on as they are found.
+        The thread waits whenever the queue is full. """
+
+        loop = asyncio.get_running_loop()
+
+        def scan() -> None:
+            for category, obj in self.__controller.iterCategorizedCinemaPaths(pathList, scanWorkers):
+                asyncio.run_coroutine_threadsafe(self.__plan(category, obj, planner, outQueue), loop).result()
+
+        try:
+            await asyncio.to_thread(scan)
+        finally:
+            await outQueue.put(None)
+
+    async def __plan(self, category: str, obj: Cinema, planner: RenamePlanner, outQueue: asyncio.Queue) -> None:
+        """ Pass an object on if it needs renaming or integrating, the same way ViewCLI sorts a parsed batch, and if
+        it doesn't conflict with the objects passed on before it. """
+
+        if category == Parser.UNKNOWN:
+            self.__emit(self.SCAN, self.SKIPPED, obj, category)
+            return
+
+        inLibrary = self.__isInLibrary(obj)
+
+        if category in (Parser.CANONICAL, Parser.ALREADY_CORRECT) and inLibrary:
+            self.__emit(self.SCAN, self.SKIPPED, obj, category)
+            return
+
+        if inLibrary:
+            obj.setIntegrationFalse()
+
+        reason = planner.add(obj)
+
+        if reason is not None:
+            self.__emit(self.SCAN, self.FAILED, obj, FileExistsError(reason))
+            return
+
+        self.__emit(self.SCAN, self.DONE, obj, category)
+        await outQueue.put(obj)
+
+    async def __backup(self, inQueue: asyncio.Queue, outQueue: asyncio.Queue, pool: ThreadPoolExecutor) -> None:
+        """ Back up each object before anything is done to its file. Backups are written one at a time. """
+
+        loop = asyncio.get_running_loop()
+        backup = self.__controller.backupOverwrite if self.__overwriteFlag else self.__controller.backup
+
+        while (obj := await inQueue.get()) is not None:
+            try:
+                await loop.run_in_executor(pool, backup, obj)
+            except Exception as e:
+                self.__emit(self.BACKUP, self.FAILED, obj, e)
+                continue
+
+            self.__emit(self.BACKUP, self.DONE, obj)
+            await outQueue.put(obj)
+
+        await outQueue.put(None)
+
+    async def __rename(self, inQueue: asyncio.Queue, pool: ThreadPoolExecutor,
+                       transferPool: ThreadPoolExecutor) -> None:
+        """ Rename or integrate each object as it arrives, with up to the workers at once, and transfers between
+        devices in their own pool, so that they never hold up renames. No more objects are taken from the queue while
+        a queue's worth are still in progress. """
+
+        loop = asyncio.get_running_loop()
+        planner = MovePlanner(self.__copyFlag)
+        workerLimit = asyncio.Semaphore(self.__workers)
+        dirReadyDict: dict[tuple[str, str], asyncio.Event] = {}  # {destination directory: set once it exists, ...}
+        fileLockDict: dict[str, asyncio.Lock] = {}  # {destination file: lock, ...}
+        transferLimitDict: dict[tuple[int, int], asyncio.Semaphore] = {}  # {(source, library device): limit, ...}
+        pendingLimit = asyncio.Semaphore(self.QUEUE_SIZE)
+        taskSet = set()
+
+        async def integrate(obj: Cinema, library: str) -> None:
+            dirKey = (library.casefold(), obj.getNewDir().casefold())
+            fileKey = f"{dirKey}{obj.getNewFileName()}{obj.getFileExt()}".casefold()
+            dirReady = dirReadyDict.get(dirKey)
+
+            if dirReady is None:  # the first integration into the directory, which may create or rename it
+                dirReadyDict[dirKey] = dirReady = asyncio.Event()
+            else:
+                await dirReady.wait()
+
+            pair = planner.getDevicePair(obj, library)
+            limit = workerLimit if pair is None else transferLimitDict.setdefault(
+                pair, asyncio.Semaphore(self.__transferWorkers))
+
+            try:
+                async with fileLockDict.setdefault(fileKey, asyncio.Lock()), limit:
+                    method = await loop.run_in_executor(pool if pair is None else transferPool,
+                                                        self.__controller.integrateIntoLibrary, obj, library,
+                                                        self.__copyFlag, self.__overwriteFlag)
+            except Exception as e:
+                self.__renameFailed(obj, e)
+            else:
+                self.__emit(self.RENAME, self.DONE, obj, method)
+            finally:
+                dirReady.set()
+
+        async def rename(obj: Cinema) -> None:
+            try:
+                async with workerLimit:
+                    await loop.run_in_executor(pool, self.__controller.rename, obj)
+            except Exception as e:
+                self.__renameFailed(obj, e)
+            else:
+                self.__emit(self.RENAME, self.DONE, obj)
+
+        def taskDone(task: asyncio.Task) -> None:
+            taskSet.discard(task)
+            pendingLimit.release()
+
+        while (obj := await inQueue.get()) is not None:
+            await pendingLimit.acquire()
+            library = self.__getLibrary(obj)
+            task = asyncio.create_task(integrate(obj, library) if library else rename(obj))
+            taskSet.add(task)
+            task.add_done_callback(taskDone)
+
+        await asyncio.gather(*taskSet)
+
+    #########
+    # OTHER #
+    #########
+
+    def __getLibrary(self, obj: Cinema) -> str or None:
+        """ The library an object is integrated into, or None if its file only needs renaming, either because it is
+        in its library already or because there is no library for it. """
+
+        if not obj.needsIntegration():
+            return None
+        elif obj.isMovie():
+            return self.__libraryDict["movie"]
+        elif obj.isShow():
+            return self.__libraryDict["show"]
+
+        return None
+
+    def __renameFailed(self, obj: Cinema, e: Exception) -> None:
+        self.__emit(self.RENAME, self.FAILED, obj, e)
+
+        try:
+            self.__controller.deleteBackup(obj)
+        except Exception:  # the backup may not have been written under the object's current name
+            pass
+
+    def __emit(self, stage: str, status: str, obj: Cinema or None, detail: object = None) -> None:
+        event = PipelineEvent(stage, status, obj, detail)
+
+        for callback in self.__subscriberList:
+            callback(event)
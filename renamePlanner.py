@@ -0,0 +1,312 @@
+import os
+from typing import Callable, NamedTuple
+from cinema import Cinema
+from libraryIndex import LibraryIndex
+
+
+class RenameOperation(NamedTuple):
+    """ A single filesystem or database operation of a RenamePlan. """
+
+    kind: str  # RenamePlanner.BACKUP, MKDIR, RENAME_DIR, RENAME, COPY, or MOVE
+    obj: Cinema
+    src: str or None
+    dst: str
+
+
+class RenamePlan(NamedTuple):
+    """ The operations of a batch, in the order they would be run, and the objects left out of it for conflicts. """
+
+    operationList: list[RenameOperation]
+    validList: list[Cinema]
+    conflictList: list[tuple[Cinema, str]]  # [(obj, reason), ...]
+
+
+class RenamePlanner:
+    """ Plans the backups, directory creations and renames, file renames, copies, and moves of a batch in memory,
+    before any of them are made, the same way FileHandler would make them one at a time. Conflicts are found with hash
+    lookups against the planned targets and the library indexes, instead of being discovered halfway through the
+    batch:
+    - two objects renamed or integrated to the same file (both are left out),
+    - a file that already exists at an object's target, unless overwriting is allowed,
+    - a misnamed library directory whose correct name already exists as another directory.
+    Objects with the same backup name are given numbered backup names, as DatabasePickle.createAppend would.
+
+    Objects can be added one at a time, as the pipeline does, in which case only the later of two colliding objects is
+    left out, since the earlier one may already have been renamed. """
+
+    BACKUP = "backup"
+    MKDIR = "mkdir"
+    RENAME_DIR = "renameDir"
+    RENAME = "rename"
+    COPY = "copy"
+    MOVE = "move"
+
+    DUPLICATE_TARGET = "SAME NEW NAME AS ANOTHER FILE IN THE BATCH"
+    OVERWRITE_NECESSARY = "OVERWRITE NECESSARY"
+    BOTH_DIRS_EXIST = "OLD AND NEW DIRECTORIES BOTH EXIST"
+
+    __getIndex: Callable[[str], LibraryIndex]
+    __libraryDict: dict[str, str or None]  # {"movie"/"show": library directory, or None to only rename, ...}
+    __copyFlag: bool
+    __overwriteFlag: bool
+    __libraryRootDict: dict[str, str]  # {library directory: absolute path, ...}
+    __dirRootDict: dict[str, tuple[str, str or None]]  # {directory path: (absolute path, library it's in or None), ...}
+    __targetDict: dict[str, Cinema]  # {normalized absolute path: obj, ...} of the files planned so far
+    __backupNameSet: set[str]
+    __addedDirSet: set[tuple[str, str]]  # {(library, directory key), ...} created or renamed into by the plan
+    __removedDirSet: set[tuple[str, str]]  # {(library, directory key), ...} renamed away by the plan
+    __renamedFromDict: dict[tuple[str, str], str]  # {(library, new directory key): old directory name, ...}
+    __dirListingDict: dict[str, frozenset[str]]  # {directory path: normalized file names, ...}, for in-place renames
+    __collidedSet: set[int]  # {id(obj), ...} of planned objects that a later object collided with
+    __operationList: list[RenameOperation]
+    __validList: list[Cinema]
+    __conflictList: list[tuple[Cinema, str]]
+
+    def __init__(self, getIndex: Callable[[str], LibraryIndex], moviesDir: str or None, showsDir: str or None,
+                 copyFlag: bool, overwriteFlag: bool):
+        self.__getIndex = getIndex
+        self.__libraryDict = {"movie": moviesDir, "show": showsDir}
+        self.__libraryRootDict = {library: os.path.abspath(library) for library in (moviesDir, showsDir)
+                                  if library is not None}
+        self.__dirRootDict = {}
+        self.__copyFlag = copyFlag
+        self.__overwriteFlag = overwriteFlag
+        self.__dirListingDict = {}
+        self.__reset()
+
+    def plan(self, cinemaList: list[Cinema]) -> RenamePlan:
+        """ Plan a whole batch. Both objects of a collision are left out, and the rest of the batch is planned again
+        without them, since the operations of the others may have depended on theirs. """
+
+        for obj in cinemaList:
+            self.add(obj)
+
+        if self.__collidedSet:
+            collidedSet = self.__collidedSet
+            validList = self.__validList
+            conflictList = self.__conflictList + [(obj, self.DUPLICATE_TARGET) for obj in validList
+                                                  if id(obj) in collidedSet]
+            self.__reset()
+
+            for obj in validList:
+                if id(obj) not in collidedSet:
+                    self.add(obj)
+
+            self.__conflictList = conflictList + self.__conflictList
+
+        return RenamePlan(self.__operationList, self.__validList, self.__conflictList)
+
+    def add(self, obj: Cinema) -> str or None:
+        """ Plan the operations of an object. Returns None if it was planned, or the reason it conflicts, in which case
+        nothing is planned for it. """
+
+        library = self.__getLibrary(obj)
+        operationList = []
+
+        if library is None:
+            reason = self.__planRename(obj, operationList)
+        else:
+            reason = self.__planIntegration(obj, library, operationList)
+
+        if reason == self.DUPLICATE_TARGET:
+            self.__collidedSet.add(id(self.__targetDict[self.__getTargetKey(obj)]))
+
+        if reason is not None:
+            self.__conflictList.append((obj, reason))
+            return reason
+
+        backupName = obj.getBackupName()
+        if backupName in self.__backupNameSet:
+            i = 1
+            while f"{backupName}({i})" in self.__backupNameSet:
+                i += 1
+            backupName = f"{backupName}({i})"
+            obj.setBackupName(backupName)
+        self.__backupNameSet.add(backupName)
+
+        self.__operationList.append(RenameOperation(self.BACKUP, obj, None, backupName))
+        self.__operationList.extend(operationList)
+        self.__validList.append(obj)
+        return None
+
+    ############
+    # PLANNING #
+    ############
+
+    def __planRename(self, obj: Cinema, operationList: list[RenameOperation]) -> str or None:
+        """ A file renamed in its own directory. The directory is listed once, for all of its files. """
+
+        if obj.hasCorrectFileName():
+            return None
+
+        dirPath = obj.getOldDirPath()
+        newFileName = f"{obj.getNewFileName()}{obj.getFileExt()}"
+        newFileKey = os.path.normcase(newFileName)
+        key = self.__getTargetKey(obj)
+
+        if key in self.__targetDict:
+            return self.DUPLICATE_TARGET
+
+        isCaseChange = newFileKey == os.path.normcase(f"{obj.getOldFileName()}{obj.getFileExt()}")
+
+        if not self.__overwriteFlag and not isCaseChange and newFileKey in self.__getDirListing(dirPath):
+            return self.OVERWRITE_NECESSARY
+
+        self.__targetDict[key] = obj
+        operationList.append(RenameOperation(self.RENAME, obj, obj.getOldAbsPath(), f"{dirPath}\\{newFileName}"))
+        return None
+
+    def __planIntegration(self, obj: Cinema, library: str, operationList: list[RenameOperation]) -> str or None:
+        """ A file integrated into a library, following the branches of FileHandler.integrateIntoLibrary against the
+        library's index and the directories already planned. """
+
+        index = self.__getIndex(library)
+        oldDir = obj.getOldDir()
+        newDir = obj.getNewDir()
+        newFileName = f"{obj.getNewFileName()}{obj.getFileExt()}"
+        newDirPath = index.getDirPath(newDir)
+        oldDirKey = (library, index.normalize(oldDir))
+        newDirKey = (library, index.normalize(newDir))
+        key = self.__getTargetKey(obj)
+        renamesFile = not obj.hasCorrectFileName()
+
+        if self.__hasDir(index, oldDirKey, oldDir):  # in the library, with a misnamed directory
+            # Both names exist when they only differ in case on a case-insensitive filesystem, and are one directory
+            if self.__hasDir(index, newDirKey, newDir) and (oldDir == newDir or oldDirKey != newDirKey):
+                return self.BOTH_DIRS_EXIST
+
+            if renamesFile:
+                if key in self.__targetDict:
+                    return self.DUPLICATE_TARGET
+                if not self.__overwriteFlag and self.__hasFile(index, newDirKey, newDir, newFileName):
+                    return self.OVERWRITE_NECESSARY
+
+            operationList.append(RenameOperation(self.RENAME_DIR, obj, index.getDirPath(oldDir), newDirPath))
+            self.__removedDirSet.add(oldDirKey)
+            self.__addedDirSet.add(newDirKey)
+            self.__renamedFromDict[newDirKey] = oldDir
+
+            if renamesFile:
+                self.__targetDict[key] = obj
+                operationList.append(RenameOperation(self.RENAME, obj, f"{newDirPath}\\{obj.getOldFileName()}"
+                                                     f"{obj.getFileExt()}", f"{newDirPath}\\{newFileName}"))
+            return None
+
+        if self.__hasDir(index, newDirKey, newDir):
+            if not renamesFile:
+                return None
+            if key in self.__targetDict:
+                return self.DUPLICATE_TARGET
+            if self.__hasFile(index, newDirKey, newDir, newFileName):
+                if not self.__overwriteFlag:
+                    return self.OVERWRITE_NECESSARY
+
+                self.__targetDict[key] = obj
+                operationList.append(RenameOperation(self.RENAME, obj, f"{newDirPath}\\{obj.getOldFileName()}"
+                                                     f"{obj.getFileExt()}", f"{newDirPath}\\{newFileName}"))
+                return None
+        else:
+            if key in self.__targetDict:
+                return self.DUPLICATE_TARGET
+
+            operationList.append(RenameOperation(self.MKDIR, obj, None, newDirPath))
+            self.__addedDirSet.add(newDirKey)
+
+        self.__targetDict[key] = obj
+        operationList.append(RenameOperation(self.COPY if self.__copyFlag else self.MOVE, obj, obj.getOldAbsPath(),
+                                             f"{newDirPath}\\{newFileName}"))
+        return None
+
+    #########
+    # OTHER #
+    #########
+
+    def __reset(self) -> None:
+        """ Forget everything planned, except the listings of the directories. """
+
+        self.__targetDict = {}
+        self.__backupNameSet = set()
+        self.__addedDirSet = set()
+        self.__removedDirSet = set()
+        self.__renamedFromDict = {}
+        self.__collidedSet = set()
+        self.__operationList = []
+        self.__validList = []
+        self.__conflictList = []
+
+    def __getLibrary(self, obj: Cinema) -> str or None:
+        if not obj.needsIntegration():
+            return None
+        elif obj.isMovie():
+            return self.__libraryDict["movie"]
+        elif obj.isShow():
+            return self.__libraryDict["show"]
+
+        return None
+
+    def __getTargetKey(self, obj: Cinema) -> str:
+        """ The absolute path of the file an object is renamed or integrated to, normalized by the index of the library
+        it ends up in (files renamed in place in a library directory included), so that a rename and an integration
+        to the same file have the same key. """
+
+        newFileName = f"{obj.getNewFileName()}{obj.getFileExt()}"
+        library = self.__getLibrary(obj)
+
+        if library is None:
+            dirPath, library = self.__getDirRoot(obj.getOldDirPath())
+
+            if library is None:
+                return os.path.normcase(f"{dirPath}\\{newFileName}")
+
+            return self.__getIndex(library).normalize(f"{dirPath}\\{newFileName}")
+
+        return self.__getIndex(library).normalize(f"{self.__libraryRootDict[library]}\\{obj.getNewDir()}\\"
+                                                  f"{newFileName}")
+
+    def __getDirRoot(self, dirPath: str) -> tuple[str, str or None]:
+        """ The absolute path of a directory, and the library it's a directory of (None if it isn't one), looked up once
+        for all of its files. """
+
+        dirRoot = self.__dirRootDict.get(dirPath)
+
+        if dirRoot is None:
+            absPath = os.path.abspath(dirPath)
+            parent = os.path.normcase(os.path.dirname(absPath))
+            dirRoot = absPath, next((library for library, root in self.__libraryRootDict.items()
+                                     if os.path.normcase(root) == parent), None)
+            self.__dirRootDict[dirPath] = dirRoot
+
+        return dirRoot
+
+    def __hasDir(self, index: LibraryIndex, dirKey: tuple[str, str], name: str) -> bool:
+        """ Whether a library directory exists once the directories planned so far are created and renamed. """
+
+        if dirKey in self.__addedDirSet:
+            return True
+
+        return dirKey not in self.__removedDirSet and index.hasDir(name)
+
+    def __hasFile(self, index: LibraryIndex, dirKey: tuple[str, str], dirName: str, fileName: str) -> bool:
+        """ Whether a file exists in a library directory before the batch, following planned directory renames.
+        Directories created by the plan are empty. """
+
+        oldDir = self.__renamedFromDict.get(dirKey)
+
+        if oldDir is not None:
+            return index.hasFile(oldDir, fileName)
+
+        return dirKey not in self.__addedDirSet and index.hasFile(dirName, fileName)
+
+    def __getDirListing(self, dirPath: str) -> frozenset[str]:
+        listing = self.__dirListingDict.get(dirPath)
+
+        if listing is None:
+            try:
+                with os.scandir(dirPath) as dirContents:
+                    listing = frozenset(os.path.normcase(entry.name) for entry in dirContents)
+            except OSError:
+                listing = frozenset()
+
+            self.__dirListingDict[dirPath] = listing
+
+        return listing
@@ -0,0 +1,172 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from movie import Movie
+from libraryIndex import LibraryIndex
+from renamePlanner import RenamePlanner
+
+
+def newMovie(dirPath: str, fileName: str = "American.History.X.1998.1080p.BluRay.x264", date: str = "1998") -> Movie:
+    """ A movie whose file exists under its old name, creating its directory if needed. """
+
+    os.makedirs(dirPath, exist_ok=True)
+    path = f"{dirPath}\\{fileName}.mkv"
+
+    with open(path, "wb") as outp:
+        outp.write(fileName.encode())
+
+    return Movie(path, {"title": "american history x", "date": date, "resolution": "1080p", "encoding": "264"})
+
+
+class RenamePlannerTestCase(unittest.TestCase):
+    """ Batches are planned against a temporary movie library, without touching any file. """
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp()
+        self.moviesDir = f"{self.testDir}\\movies"
+        self.showsDir = f"{self.testDir}\\shows"
+        self.downloadsDir = f"{self.testDir}\\downloads"
+        os.mkdir(self.moviesDir)
+        os.mkdir(self.showsDir)
+        self.indexDict = {}
+
+    def tearDown(self):
+        shutil.rmtree(self.testDir)
+
+    def getIndex(self, library: str) -> LibraryIndex:
+        if library not in self.indexDict:
+            self.indexDict[library] = LibraryIndex(library)
+
+        return self.indexDict[library]
+
+    def newPlanner(self, overwriteFlag: bool = False) -> RenamePlanner:
+        return RenamePlanner(self.getIndex, self.moviesDir, self.showsDir, False, overwriteFlag)
+
+    def newLibraryMovie(self, fileName: str = "American History X 1998") -> Movie:
+        """ A movie already in its correct library directory, renamed in place. """
+
+        movie = newMovie(f"{self.moviesDir}\\{newMovie(self.testDir).getNewDir()}", fileName)
+        movie.setIntegrationFalse()
+        return movie
+
+    def assertConflicts(self, plan, conflictList: list[tuple[Movie, str]]) -> None:
+        self.assertCountEqual([(id(obj), reason) for obj, reason in conflictList],
+                              [(id(obj), reason) for obj, reason in plan.conflictList])
+        self.assertEqual([], [operation for operation in plan.operationList
+                              if any(operation.obj is obj for obj, _ in conflictList)])
+        self.assertTrue(all(os.path.exists(movie.getOldAbsPath()) for movie, _ in conflictList))
+
+    ####################
+    # BATCH DUPLICATES #
+    ####################
+
+    def testDuplicateRenamesInBatch(self):
+        first = newMovie(self.downloadsDir, "American.History.X.1998.1080p.BluRay.x264")
+        second = newMovie(self.downloadsDir, "American History X 1998 1080p x264")
+        first.setIntegrationFalse()
+        second.setIntegrationFalse()
+
+        plan = self.newPlanner().plan([first, second])
+
+        self.assertConflicts(plan, [(first, RenamePlanner.DUPLICATE_TARGET), (second, RenamePlanner.DUPLICATE_TARGET)])
+        self.assertEqual([], plan.validList)
+
+    def testDuplicateIntegrationsInBatch(self):
+        first = newMovie(f"{self.downloadsDir}\\first")
+        second = newMovie(f"{self.downloadsDir}\\second")
+        other = newMovie(f"{self.downloadsDir}\\other", "American.History.X.1999.1080p.BluRay.x264", "1999")
+
+        plan = self.newPlanner().plan([first, second, other])
+
+        self.assertConflicts(plan, [(first, RenamePlanner.DUPLICATE_TARGET), (second, RenamePlanner.DUPLICATE_TARGET)])
+        self.assertEqual([other], plan.validList)
+        self.assertEqual([RenamePlanner.BACKUP, RenamePlanner.MKDIR, RenamePlanner.MOVE],
+                         [operation.kind for operation in plan.operationList])
+
+    def testRenameAndIntegrationToSameFile(self):
+        """ A file renamed in place in its library directory, and another integrated into that directory, both end up
+        at the same path. """
+
+        renamed = self.newLibraryMovie()
+        integrated = newMovie(self.downloadsDir)
+
+        plan = self.newPlanner().plan([renamed, integrated])
+
+        self.assertConflicts(plan, [(renamed, RenamePlanner.DUPLICATE_TARGET),
+                                    (integrated, RenamePlanner.DUPLICATE_TARGET)])
+
+    def testAddedOneAtATimeLeavesOutLaterDuplicate(self):
+        renamed = self.newLibraryMovie()
+        integrated = newMovie(self.downloadsDir)
+        planner = self.newPlanner()
+
+        self.assertIsNone(planner.add(renamed))
+        self.assertEqual(RenamePlanner.DUPLICATE_TARGET, planner.add(integrated))
+
+    def testDuplicateBackupNamesAreNumbered(self):
+        first = newMovie(f"{self.downloadsDir}\\first", "American.History.X.1998.1080p.BluRay.x264")
+        second = newMovie(f"{self.downloadsDir}\\second", "American.History.X.1998.1080p.BluRay.x264")
+        first.setIntegrationFalse()
+        second.setIntegrationFalse()
+
+        plan = self.newPlanner().plan([first, second])
+
+        self.assertEqual([first, second], plan.validList)
+        self.assertEqual(f"{first.getBackupName()}(1)", second.getBackupName())
+
+    ######################
+    # LIBRARY COLLISIONS #
+    ######################
+
+    def testOverwriteNecessary(self):
+        existing = newMovie(self.downloadsDir)
+        newMovie(f"{self.moviesDir}\\{existing.getNewDir()}", existing.getNewFileName())
+        movie = newMovie(f"{self.downloadsDir}\\other")
+
+        self.assertConflicts(self.newPlanner().plan([movie]), [(movie, RenamePlanner.OVERWRITE_NECESSARY)])
+        self.assertEqual([], self.newPlanner(overwriteFlag=True).plan([movie]).conflictList)
+
+    def testOverwriteNecessaryForRenameInLibrary(self):
+        existing = self.newLibraryMovie(fileName=newMovie(self.testDir).getNewFileName())
+        movie = self.newLibraryMovie()
+
+        self.assertTrue(existing.hasCorrectFileName())
+        self.assertConflicts(self.newPlanner().plan([movie]), [(movie, RenamePlanner.OVERWRITE_NECESSARY)])
+
+    def testBothDirsExist(self):
+        """ A file in a misnamed library directory, whose correct name already exists as another directory. """
+
+        movie = newMovie(f"{self.moviesDir}\\American History X")
+        os.mkdir(f"{self.moviesDir}\\{movie.getNewDir()}")
+
+        self.assertConflicts(self.newPlanner().plan([movie]), [(movie, RenamePlanner.BOTH_DIRS_EXIST)])
+
+    def testMisnamedDirRenamed(self):
+        movie = newMovie(f"{self.moviesDir}\\American History X")
+        newDirPath = f"{self.moviesDir}\\{movie.getNewDir()}"
+
+        plan = self.newPlanner().plan([movie])
+
+        self.assertEqual([movie], plan.validList)
+        self.assertEqual([(RenamePlanner.RENAME_DIR, f"{self.moviesDir}\\American History X", newDirPath),
+                          (RenamePlanner.RENAME, f"{newDirPath}\\{movie.getOldFileName()}.mkv",
+                           f"{newDirPath}\\{movie.getNewFileName()}.mkv")],
+                         [(operation.kind, operation.src, operation.dst) for operation in plan.operationList[1:]])
+
+    def testIntegrationIntoDirRenamedByBatch(self):
+        """ A file integrated into a directory that an earlier file of the batch renames to its correct name collides
+        with that file. """
+
+        renamed = newMovie(f"{self.moviesDir}\\American History X")
+        integrated = newMovie(self.downloadsDir)
+
+        plan = self.newPlanner().plan([renamed, integrated])
+
+        self.assertConflicts(plan, [(renamed, RenamePlanner.DUPLICATE_TARGET),
+                                    (integrated, RenamePlanner.DUPLICATE_TARGET)])
+
+
+if __name__ == "__main__":
+    unittest.main()
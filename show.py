@@ -1,27 +1,63 @@
-from cinema import Cinema
+from cinema import Cinema, CANONICAL_WORD, CANONICAL_WORDS, CANONICAL_TAGS
+from patternRegistry import PatternRegistry
+from functools import lru_cache
+from typing import NamedTuple
+import sys
 import re
 
 
+SERIES_TABLE_SIZE = 4096  # most distinct series kept in the shared series table
+
+# matches: Title of a Show; (optional) - More to the Title; S01; E02; (optional) Title of the Episode
+PatternRegistry.register("Show", r"^(?P<title>([!0-9a-zA-Z.',_\-]+ )+?)(- (\w+ )+- |- (\w+ )+|- )?([sS]eason|[sS])? ?"
+                                 r"(?P<season>\d{1,2})(x|[eE]pisode|[eE]) ?(?P<episode>\d{1,2})( \[?\d{3,4}p.*| - | |$)"
+                                 r"(?P<episodeTitle>([!0-9a-zA-Z.',_\-]+( |$))+?|$)(\[?\d{3,4}p|\[|$)")
+
+# matches: Title of a Show 1x02 (optional) Title of the Episode [720p] [x264]; the format of _buildNewFileName. Names
+# the Show pattern reads differently aren't matched: a title with a " - " subtitle, or ending in a season marker (Season,
+# S), and an episode title starting with "- ", or with a word starting with a resolution (2160p), where the Show pattern
+# ends it. The episode title is empty if there is none, and keeps its trailing space before tags, as the Show pattern
+# captures it
+CANONICAL_TITLE_WORD = rf"(?!-(?: |$)){CANONICAL_WORD}"
+CANONICAL_EPISODE_WORD = rf"(?!\d{{3,4}}p){CANONICAL_WORD}"
+PatternRegistry.register("Show.canonical", rf"(?P<title>{CANONICAL_TITLE_WORD}(?: {CANONICAL_TITLE_WORD})*? )"
+                                           rf"(?<! [sS]eason )(?<! [sS] )(?P<season>\d{{1,2}})x(?P<episode>\d{{1,2}})"
+                                           rf"(?: (?=.))?(?P<episodeTitle>(?:(?<= )(?!- ){CANONICAL_EPISODE_WORD}"
+                                           rf"(?: {CANONICAL_EPISODE_WORD})*?(?: (?=\[)|$))?){CANONICAL_TAGS}")
+
+
+class Series(NamedTuple):
+    """ Metadata shared by every episode of a series. """
+
+    title: str  # capitalized title
+    newDir: str  # library directory name
+
+
 class Show(Cinema):
     """ A Cinema object specific to television show episodes. """
 
+    __slots__ = ("_season", "_episode", "_episodeTitle")
+
     _season: str
     _episode: str
     _episodeTitle: str
     _isShow = True
+    _sortOrder = 0
+    _capitalizedFields = ("title", "episodeTitle")
 
-    def __init__(self, filePath, specificMatch: re.Match, resolutionMatch: re.Match, encodingMatch: re.Match):
+    def __init__(self, filePath, fields: dict[str, str or None]):
         super().__init__(filePath)
 
         # required params
-        self._buildAttributes(specificMatch)
+        self._buildAttributes(fields)
 
         # optional params
-        self._setResolution(resolutionMatch)
-        self._setEncoding(encodingMatch)
+        self._setResolution(fields.get("resolution"))
+        self._setEncoding(fields.get("encoding"))
 
         # finalize object
         self._buildNewFileName()
+        self._sortKey = self._buildSortKey()
 
     ###########
     # SETTERS #
@@ -29,9 +65,10 @@ class Show(Cinema):
 
     def updateFileName(self, passed: str) -> None:
         self._newFileName = passed
+        self._invalidateDerivedPaths()
         self._backupName = f"{self._newDir}.{passed + self._fileExt}"
 
-    def _setEpisodeTitle(self, passed: str) -> None:
+    def _setEpisodeTitle(self, passed: str or None) -> None:
         # if len(passed) > 0:
         #     if passed[-1] == " ":
         #         self._episodeTitle = passed[:-1]
@@ -39,7 +76,7 @@ class Show(Cinema):
         #         self._episodeTitle = passed
         # else:
         #     self._episodeTitle = passed
-        self._episodeTitle = self._capitalize(passed)
+        self._episodeTitle = self._capitalize(passed) if passed else ""  # canonical names may have no episode title
 
     def _setEpisode(self, passed: str) -> None:
         self._episode = passed
@@ -63,21 +100,32 @@ class Show(Cinema):
     def getPattern() -> re.Pattern:
         """ Returns a Pattern object to be used in identifying a Show object. """
 
-        # matches: Title of a Show; (optional) - More to the Title; S01; E02; (optional) Title of the Episode
-        return re.compile(r"^(?P<title>([!0-9a-zA-Z.',_\-]+ )+?)(- (\w+ )+- |- (\w+ )+|- )?([sS]eason|[sS])? ?"
-                          r"(?P<season>\d{1,2})(x|[eE]pisode|[eE]) ?(?P<episode>\d{1,2})( \[?\d{3,4}p.*| - | |$)"
-                          r"(?P<episodeTitle>([!0-9a-zA-Z.',_\-]+( |$))+?|$)(\[?\d{3,4}p|\[|$)")
+        return PatternRegistry.get("Show")
+
+    @staticmethod
+    def getCanonicalPattern() -> re.Pattern:
+        return PatternRegistry.get("Show.canonical")
 
     #########
     # OTHER #
     #########
 
-    def _buildAttributes(self, match: re.Match) -> None:
-        self._setTitle(match.group("title"))
-        self._season = match.group("season")
-        self._episode = match.group("episode")
-        self._setEpisodeTitle(match.group("episodeTitle"))
-        self._newDir = self._title
+    @staticmethod
+    @lru_cache(maxsize=SERIES_TABLE_SIZE)
+    def _getSeries(rawTitle: str) -> Series:
+        """ Return the shared series table entry for a cleaned, raw title, so that the episodes of a series share one
+        capitalized title and directory name instead of each building their own. """
+
+        title = sys.intern(Show._capitalize(rawTitle))
+        return Series(title, title)
+
+    def _buildAttributes(self, fields: dict[str, str or None]) -> None:
+        series = self._getSeries(fields["title"])
+        self._title = series.title
+        self._newDir = series.newDir
+        self._season = fields["season"]
+        self._episode = fields["episode"]
+        self._setEpisodeTitle(fields["episodeTitle"])
 
     def _buildNewFileName(self) -> None:
         title = self._title
@@ -92,3 +140,6 @@ class Show(Cinema):
 
         self._newFileName = newName + self._getTags()
         self._backupName = f"{self._newDir}.{newName + self._fileExt}"
+
+    def _buildSortKey(self) -> tuple[int, str, int, int, int, str]:
+        return self._sortOrder, self._title.casefold(), int(self._season), int(self._episode), 0, self._oldAbsPath
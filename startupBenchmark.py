@@ -0,0 +1,205 @@
+import os
+import sys
+import json
+import time
+import pickle
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from parser import Parser
+
+
+# Cold-start benchmarks for Cinema Renamer. Run directly:  python startupBenchmark.py [--repeat N] [--top N]
+#                                                           [--json results.json]
+# Exits with 1 if any measurement is over its budget in BUDGETS_MS.
+
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(PACKAGE_DIR, "Cinema_Renamer.py")
+
+# Budgets in milliseconds, from the best of the runs. Raise them only together with the change that needs it
+BUDGETS_MS = {
+    "import": 110,  # import time of Cinema_Renamer, as reported by -X importtime
+    "restorePrompt": 200,  # launch to the restoration prompt, with one backup file
+    "parsePrompt": 260,  # launch to the rename prompt, with one directory of cinema files
+}
+
+SAMPLE_NAMES = ["The.Office.S05E03.Baby.Shower.720p.WEBRip.x264.mkv", "Rick and Morty 03x07 The Ricklantis Mixup.mp4",
+                "Anchorman.The.Legend.of.Ron.Burgundy.2004.1080p.BluRay.x264-YIFY.mkv"]
+CONFIG = ("[libraries]\nmovies = \nshows = \n\n[flags]\ncopy = true\noverwrite = true\n\n"
+          "[scanning]\ndepth = \nexclude = \ncache = false\nworkers = 1\nengine = regex\n\n"
+          "[media]\nextensions = \nmagic = false\n")
+
+
+def measureImportTime(repeat: int) -> tuple[float, list[tuple[str, float, float]]]:
+    """ Import Cinema_Renamer under -X importtime in fresh interpreters, and return the total import time of the run
+    with the smallest one, in milliseconds, with the (module, self ms, cumulative ms) breakdown of that run. """
+
+    best = None
+
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c", "import Cinema_Renamer"],
+                                   cwd=PACKAGE_DIR, capture_output=True, text=True, check=True)
+        moduleList = []
+
+        for line in completed.stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+
+            selfUs, cumulativeUs, name = line[len("import time:"):].split("|")
+            moduleList.append((name.strip(), int(selfUs) / 1000, int(cumulativeUs) / 1000))
+
+        total = next(cumulative for name, _, cumulative in moduleList if name == "Cinema_Renamer")
+
+        if best is None or total < best[0]:
+            best = (total, moduleList)
+
+    return best
+
+
+def measureTimeToPrompt(argList: list[str], prompt: str, cwd: str, repeat: int) -> list[float]:
+    """ Launch Cinema_Renamer with the passed arguments, and return the milliseconds of each run until the prompt
+    was written to its output. The process is killed at the prompt, so nothing is renamed or restored. """
+
+    marker = prompt.encode()
+    timeList = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, "-u", SCRIPT] + argList, cwd=cwd, stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        output = b""
+
+        try:
+            while marker not in output:
+                chunk = os.read(process.stdout.fileno(), 65536)
+                if not chunk:
+                    raise RuntimeError(f"Exited before the prompt {prompt!r}:\n{output.decode(errors='replace')}")
+                output += chunk
+
+            timeList.append((time.perf_counter() - start) * 1000)
+        finally:
+            process.kill()
+            process.wait()
+            process.stdin.close()
+            process.stdout.close()
+
+    return timeList
+
+
+def benchmarkImport(repeat: int, top: int) -> dict:
+    """ Print the import time of Cinema_Renamer and the modules that spent the most time importing themselves. """
+
+    total, moduleList = measureImportTime(repeat)
+    heaviest = sorted(moduleList, key=lambda module: module[1], reverse=True)[:top]
+
+    print(f"IMPORT TIME (BEST OF {repeat})")
+    print(f"  {'Cinema_Renamer':<32}{total:>10.1f} ms")
+    print(f"  {'module':<32}{'self ms':>10}{'total ms':>10}")
+    for name, selfMs, cumulativeMs in heaviest:
+        print(f"  {name:<32}{selfMs:>10.1f}{cumulativeMs:>10.1f}")
+    print()
+
+    return {"totalMs": total, "modules": {name: {"selfMs": selfMs, "cumulativeMs": cumulativeMs}
+                                          for name, selfMs, cumulativeMs in heaviest}}
+
+
+def benchmarkPrompts(repeat: int) -> dict:
+    """ Print the wall-clock time from launch to the first prompt of a restore-only run and of a parse run, next to
+    the time to launch an interpreter that does nothing. The runs are made in a temporary directory with its own
+    configuration file (parse cache disabled), so the user's configuration and cache are left alone. """
+
+    workDir = tempfile.mkdtemp(prefix="startupBenchmark")
+
+    try:
+        with open(os.path.join(workDir, "cr_config.ini"), "w") as outp:
+            outp.write(CONFIG)
+
+        cinemaDir = os.path.join(workDir, "downloads")
+        os.mkdir(cinemaDir)
+        for name in SAMPLE_NAMES:
+            open(os.path.join(cinemaDir, name), "w").close()
+
+        # A backup made the way DatabasePickle makes them
+        parser = Parser()
+        parser.parseCinemaPaths([os.path.join(cinemaDir, SAMPLE_NAMES[0])])
+        backupPath = os.path.join(workDir, "backup.pkl")
+        with open(backupPath, "wb") as outp:
+            pickle.dump(parser.getProcessedCinemaList()[0], outp, 4)
+
+        interpreterList = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", "pass"], check=True)
+            interpreterList.append((time.perf_counter() - start) * 1000)
+
+        timesDict = {
+            "interpreter": interpreterList,
+            "restorePrompt": measureTimeToPrompt([backupPath], "PERFORM RESTORATION?", workDir, repeat),
+            "parsePrompt": measureTimeToPrompt([cinemaDir], "PERFORM RENAME?", workDir, repeat),
+        }
+    finally:
+        shutil.rmtree(workDir, ignore_errors=True)
+
+    results = {}
+
+    print(f"TIME TO FIRST PROMPT ({repeat} RUNS)")
+    print(f"  {'run':<20}{'best ms':>10}{'median ms':>12}")
+    for run, timeList in timesDict.items():
+        results[run] = {"bestMs": min(timeList), "medianMs": statistics.median(timeList)}
+        print(f"  {run:<20}{results[run]['bestMs']:>10.1f}{results[run]['medianMs']:>12.1f}")
+    print()
+
+    return results
+
+
+def checkBudgets(results: dict) -> int:
+    """ Print each measurement against its budget, and return the number over budget. """
+
+    measuredDict = {"import": results["import"]["totalMs"],
+                    "restorePrompt": results["prompts"]["restorePrompt"]["bestMs"],
+                    "parsePrompt": results["prompts"]["parsePrompt"]["bestMs"]}
+    overBudget = 0
+
+    print("BUDGETS")
+    for name, budget in BUDGETS_MS.items():
+        flag = ""
+
+        if measuredDict[name] > budget:
+            overBudget += 1
+            flag = "  OVER BUDGET"
+
+        print(f"  {name:<20}{measuredDict[name]:>8.1f} / {budget} ms{flag}")
+    print()
+
+    return overBudget
+
+
+def main() -> None:
+    argParser = argparse.ArgumentParser(description="Cold-start benchmarks for Cinema Renamer.")
+    argParser.add_argument("--repeat", type=int, default=7, help="runs of each measurement (default: 7)")
+    argParser.add_argument("--top", type=int, default=15, help="modules listed in the import breakdown (default: 15)")
+    argParser.add_argument("--json", metavar="PATH", help="write the results to a JSON file")
+    args = argParser.parse_args()
+
+    results = {
+        "import": benchmarkImport(args.repeat, args.top),
+        "prompts": benchmarkPrompts(args.repeat),
+    }
+    overBudget = checkBudgets(results)
+
+    if args.json:
+        meta = {"python": platform.python_version(), "platform": platform.platform(), "repeat": args.repeat,
+                "budgets": BUDGETS_MS, "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+        with open(args.json, "w") as outp:
+            json.dump({"meta": meta, "results": results}, outp, indent=2)
+
+    sys.exit(1 if overBudget else 0)
+
+
+if __name__ == "__main__":
+    main()
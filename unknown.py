@@ -5,7 +5,11 @@ import re
 class Unknown(Cinema):
     """ An unrecognized file that was parsed from Cinema files. Can be treated as a file or directory. """
 
+    __slots__ = ("_error", "__isFile")
+
+    _error: str
     __isFile: bool
+    _sortOrder = 2
 
     def __init__(self, path: str, error: str, isFile: bool):
         super().__init__(path)
@@ -21,6 +25,7 @@ class Unknown(Cinema):
 
         # finalize object
         self._buildNewFileName()
+        self._sortKey = self._buildSortKey()
 
     def updateFileName(self, passed: str) -> None:
         pass
@@ -41,8 +46,15 @@ class Unknown(Cinema):
     def getPattern() -> re.Pattern:
         pass
 
+    @staticmethod
+    def getCanonicalPattern() -> None:
+        return None
+
     def _buildAttributes(self) -> None:
         pass
 
     def _buildNewFileName(self):
         self._newFileName = "INVALID"
+
+    def _buildSortKey(self) -> tuple[int, str, int, int, int, str]:
+        return self._sortOrder, "", 0, 0, 0, self._oldAbsPath
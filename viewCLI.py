@@ -2,6 +2,7 @@ import os
 
 from view import View
 from cinema import Cinema
+from parseStats import ParseStats
 from controller import Controller
 from configparser import ConfigParser
 
@@ -14,6 +15,19 @@ class ViewCLI(View):
     showsDir: str = ""
     copyFlag: bool = True
     overwriteFlag: bool = True
+    maxDepth: int or None = None
+    excludeList: list[str] = []
+    cacheFlag: bool = True
+    workers: int = 1
+    engine: str = "regex"
+    extensionList: list[str] = []
+    magicFlag: bool = False
+    integrationWorkers: int = 4
+    transferWorkers: int = 2
+    hardlinkFlag: bool = False
+    verifyFlag: bool = False
+    recoveryPrinted: bool = False
+    libraryPrefixSet: frozenset[str] = frozenset()  # "<library>\\" of each library, see __isInLibrary
 
     def start(self, model: list, controller: Controller) -> None:
         print()
@@ -24,9 +38,14 @@ class ViewCLI(View):
         self.__loadConfigurationSettings()
 
         if self.controller.hasValidatedCinemaArgs():
-            self.__processCinema(self.controller.getCinemaArgs())
+            if self.controller.hasPipelineFlag():
+                self.__processCinemaPipeline(self.controller.getCinemaArgs())
+            else:
+                self.__processCinema(self.controller.getCinemaArgs())
         if self.controller.hasValidatedBackupArgs():
             self.__processRestore(self.controller.getBackupArgs())
+        if self.controller.hasValidatedManifestArgs():
+            self.__processManifest(self.controller.getManifestArgs())
 
         print("\nEXITING.\n")
         os.system("pause")
@@ -45,7 +64,12 @@ class ViewCLI(View):
             print(f"{e}\n"
                   "At least a single absolute path for a file or directory is required for processing.\n\n"
                   "Files:       Can be cinema files or backups.\n"
-                  "Directories: Can be cinema directories (no recursive searches performed).\n\n")
+                  "Directories: Can be cinema directories (searched recursively, see [scanning] in cr_config.ini).\n"
+                  "Manifests:   --manifest <listing file> plans the renaming of the files in a find, ls -R, or JSONL\n"
+                  "             listing, without the files needing to be present.\n"
+                  "Switches:    --profile prints the time spent in each stage of parsing.\n"
+                  "             --pipeline renames and integrates files while the rest are still being parsed,\n"
+                  "             without prompting.\n\n")
 
             # TODO prompt to change copy and overwrite flags, and then update config file
 
@@ -100,6 +124,37 @@ class ViewCLI(View):
                 return config.getboolean("flags", passed)
             except Exception:
                 pass
+
+        def tryReadDepth() -> int or None:
+            try:
+                depth = config.get("scanning", "depth")
+                return int(depth) if depth.strip() else None  # Blank means no depth limit
+            except Exception:
+                return None
+
+        def tryReadBoolean(section: str, passed: str, default: bool) -> bool:
+            try:
+                return config.getboolean(section, passed)
+            except Exception:
+                return default
+
+        def tryReadString(section: str, passed: str, default: str) -> str:
+            try:
+                return config.get(section, passed).strip() or default
+            except Exception:
+                return default
+
+        def tryReadInt(section: str, passed: str, default: int) -> int:
+            try:
+                return config.getint(section, passed)
+            except Exception:
+                return default
+
+        def tryReadList(section: str, passed: str) -> list[str]:
+            try:
+                return [item.strip() for item in config.get(section, passed, raw=True).split(",") if item.strip()]
+            except Exception:
+                return []
         
         configFile = "cr_config.ini"
         config = ConfigParser()
@@ -115,6 +170,23 @@ class ViewCLI(View):
                 # Flags
                 self.copyFlag = tryReadFlag("copy")
                 self.overwriteFlag = tryReadFlag("overwrite")
+
+                # Scanning
+                self.maxDepth = tryReadDepth()
+                self.excludeList = tryReadList("scanning", "exclude")
+                self.cacheFlag = tryReadBoolean("scanning", "cache", True)
+                self.workers = tryReadInt("scanning", "workers", 1)
+                self.engine = tryReadString("scanning", "engine", "regex")
+
+                # Media
+                self.extensionList = tryReadList("media", "extensions")
+                self.magicFlag = tryReadBoolean("media", "magic", False)
+
+                # Integration
+                self.integrationWorkers = tryReadInt("integration", "workers", 4)
+                self.transferWorkers = tryReadInt("integration", "transfers", 2)
+                self.hardlinkFlag = tryReadBoolean("integration", "hardlink", False)
+                self.verifyFlag = tryReadBoolean("integration", "verify", False)
         else:  # Create empty config file
             config.add_section("libraries")
             config.set("libraries", "shows", "")
@@ -122,21 +194,60 @@ class ViewCLI(View):
             config.add_section("flags")
             config.set("flags", "copy", "true")
             config.set("flags", "overwrite", "true")
+            config.add_section("scanning")
+            config.set("scanning", "depth", "")
+            config.set("scanning", "exclude", "")
+            config.set("scanning", "cache", "true")
+            config.set("scanning", "workers", "1")
+            config.set("scanning", "engine", "regex")
+            config.add_section("media")
+            config.set("media", "extensions", "")
+            config.set("media", "magic", "false")
+            config.add_section("integration")
+            config.set("integration", "workers", "4")
+            config.set("integration", "transfers", "2")
+            config.set("integration", "hardlink", "false")
+            config.set("integration", "verify", "false")
             with open(configFile, "w") as outp:
                 config.write(outp)
 
+        self.libraryPrefixSet = frozenset(f"{library}\\" for library in (self.moviesDir, self.showsDir))
+
+
+
+    def __applyScanSettings(self) -> None:
+        """ Pass the scanning settings to the controller. Done only before parsing, so that runs that only restore
+        backups never build the parser. """
+
+        self.controller.setScanOptions(self.maxDepth, self.excludeList, self.cacheFlag)
+        self.controller.setMediaFilter(self.extensionList or None, self.magicFlag)  # Blank extensions use the defaults
+        self.controller.setProfiling(self.controller.hasProfileFlag())
+
+        try:
+            self.controller.setClassificationEngine(self.engine)
+        except ValueError as e:
+            print(f"{str(e).upper()}. USING THE REGEX ENGINE.\n")
+
 
 
     def __processCinema(self, model: list[str]) -> None:
 
         self.__printHeader(f"processing {len(model)} cinema file(s)")
 
-        self.controller.parseCinemaPaths(model)
+        self.__applyScanSettings()
+        self.controller.parseCinemaPaths(model, self.workers)
+        self.__printParseStats()
         unknownCinemaList = self.controller.getUnknownCinemaList()
         # errorCinemaList = self.controller.getErrorCinemaList()
+        canonicalCinemaList = self.controller.getCanonicalCinemaList()
         alreadyCorrectCinemaList = self.controller.getAlreadyCorrectCinemaList()
         cinemaList = self.controller.getProcessedCinemaList()
 
+        # Files skipped by the media filter are only counted
+        numRejected = self.controller.getNumRejectedFiles()
+        if numRejected > 0:
+            self.__printHeader(f"skipped {numRejected} non-media file(s)")
+
         # Process Unknown List
         if len(unknownCinemaList) > 0:
             self.__printHeader(f"removed {len(unknownCinemaList)} unrecognized file(s)")
@@ -149,31 +260,203 @@ class ViewCLI(View):
         #     self.__printHeader(f"removed {len(errorCinemaList)} detected error(s)")
         #     self.__printDetailedCinemaTree(errorCinemaList)
 
-        # Process Already-Correct List
+        # Process Canonical and Already-Correct Lists
+        self.__removeAlreadyCorrect(canonicalCinemaList, cinemaList, "canonical")
+        self.__removeAlreadyCorrect(alreadyCorrectCinemaList, cinemaList, "already correct")
+
+        self.__printHeader("cinema file(s) finished processing")
+
+        if len(cinemaList) > 0:
+            # Check if objs are already in library and disable integration if so
+            for obj in cinemaList:
+                if self.__isInLibrary(obj):
+                    obj.setIntegrationFalse()
+
+            self.__promptForRenamingAction(cinemaList)
+
+
+
+    def __processCinemaPipeline(self, model: list[str]) -> None:
+        """ Parse, back up, and rename or integrate files as a pipeline, without prompting, printing each file's result
+        as it lands. Backup conflicts and integration errors are printed at the end. """
+
+        from parser import Parser
+        from pipeline import Pipeline, PipelineEvent
+
+        self.__printHeader(f"pipelining {len(model)} cinema file(s)")
+
+        self.__applyScanSettings()
+
+        librariesExist = all(library and os.path.isdir(library) for library in (self.moviesDir, self.showsDir))
+        if not librariesExist:
+            print("WHILE ANY LIBRARY DIRECTORY IS MISSING OR INVALID, MOVING OR COPYING FILES INTO LIBRARY STRUCTURES IS NOT POSSIBLE.")
+            print("ONLY RENAMING WILL BE PERFORMED.\n")
+
+        unknownCinemaList: list[Cinema] = []
+        skippedDict: dict[str, int] = {}  # {parser category: count, ...}
+        methodDict: dict[str, list[Cinema]] = {}
+        errorList = []
+
+        def onEvent(event: PipelineEvent) -> None:
+            if event.stage == Pipeline.SCAN and event.status == Pipeline.SKIPPED:
+                if event.detail == Parser.UNKNOWN:
+                    unknownCinemaList.append(event.obj)
+                else:
+                    skippedDict[event.detail] = skippedDict.get(event.detail, 0) + 1
+            elif event.status == Pipeline.FAILED:
+                self.fail()
+                if isinstance(event.detail, FileExistsError) and event.stage == Pipeline.BACKUP:
+                    errorList.append(f"BACKUP EXISTS: {event.obj.getBackupName()}")
+                else:
+                    errorList.append(f"{event.detail}: {event.obj.getNewFileName()}{event.obj.getFileExt()}")
+            elif event.stage == Pipeline.RENAME and event.status == Pipeline.DONE:
+                self.passed()
+                if event.detail is not None:
+                    methodDict.setdefault(event.detail, []).append(event.obj)
+
+        pipeline = self.controller.newPipeline(self.__isInLibrary, self.moviesDir if librariesExist else None,
+                                               self.showsDir if librariesExist else None, self.copyFlag,
+                                               self.overwriteFlag, self.integrationWorkers, self.transferWorkers)
+        pipeline.subscribe(onEvent)
+        self.controller.setCopyOptions(self.hardlinkFlag, self.verifyFlag)
+
+        self.__printRecovered()
+
+        print("RENAMING AND/OR INTEGRATING FILE(S) AS THEY ARE PARSED...")
+        pipeline.run(model, self.workers)
+        self.fin()
+
+        self.__printParseStats()
+        self.__printIntegrationMethods(methodDict)
+
+        numRejected = self.controller.getNumRejectedFiles()
+        if numRejected > 0:
+            self.__printHeader(f"skipped {numRejected} non-media file(s)")
+
+        if len(unknownCinemaList) > 0:
+            self.__printHeader(f"removed {len(unknownCinemaList)} unrecognized file(s)")
+            for obj in unknownCinemaList:
+                print(f"    -> {obj.getOldAbsPath()}")
+            print()
+
+        for category, count in skippedDict.items():
+            description = "canonical" if category == Parser.CANONICAL else "already correct"
+            self.__printHeader(f"removed {count} {description} file(s)")
+
+        if len(errorList) > 0:
+            for error in errorList:
+                print(error)
+            print()
+
+
+
+    def __removeAlreadyCorrect(self, alreadyCorrectCinemaList: list[Cinema], cinemaList: list[Cinema],
+                               description: str) -> None:
+        """ Print the already correct objects that are in a library, under a header with the description of their
+        category. The rest are re-added to cinemaList. """
+
         if len(alreadyCorrectCinemaList) > 0:
             # Check for false-positives due to the file having the correct directory name, but not being in the library, and re-add them to cinemaList
-            for obj in alreadyCorrectCinemaList[:]:
-                alreadyInMovieLib = f"{self.moviesDir}\\{obj.getNewDir()}" == obj.getOldDirPath()
-                alreadyInShowLib = f"{self.showsDir}\\{obj.getNewDir()}" == obj.getOldDirPath()
-                if not alreadyInMovieLib and not alreadyInShowLib:
-                    alreadyCorrectCinemaList.remove(obj)
+            inLibraryList: list[Cinema] = []
+            for obj in alreadyCorrectCinemaList:
+                if self.__isInLibrary(obj):
+                    inLibraryList.append(obj)
+                else:
                     cinemaList.append(obj)
 
-            if len(alreadyCorrectCinemaList) > 0:
-                self.__printHeader(f"removed {len(alreadyCorrectCinemaList)} already correct file(s)")
-                self.__printSimpleCinemaTree(alreadyCorrectCinemaList)
+            if len(inLibraryList) > 0:
+                self.__printHeader(f"removed {len(inLibraryList)} {description} file(s)")
+                self.__printSimpleCinemaTree(inLibraryList)
 
-        self.__printHeader("cinema file(s) finished processing")
+
+
+    def __processManifest(self, manifestList: list[str]) -> None:
+        """ Print the renaming plan for the files listed in manifests. The files don't need to be present, so nothing
+        is backed up or renamed. """
+
+        self.__printHeader(f"planning {len(manifestList)} manifest(s)")
+
+        self.__applyScanSettings()
+
+        try:
+            self.controller.parseManifest(manifestList, self.workers)
+        except (ValueError, OSError) as e:
+            print(f"{e}\n")
+            return
+
+        self.__printParseStats()
+
+        numRejected = self.controller.getNumRejectedFiles()
+        if numRejected > 0:
+            self.__printHeader(f"skipped {numRejected} non-media file(s)")
+
+        cinemaList = self.controller.getProcessedCinemaList()
+        self.__removeAlreadyCorrect(self.controller.getCanonicalCinemaList(), cinemaList, "canonical")
+        self.__removeAlreadyCorrect(self.controller.getAlreadyCorrectCinemaList(), cinemaList, "already correct")
+
+        self.__printHeader(f"plan for {len(cinemaList)} file(s)")
 
         if len(cinemaList) > 0:
-            # Check if objs are already in library and disable integration if so
             for obj in cinemaList:
-                alreadyInMovieLib = f"{self.moviesDir}\\{obj.getNewDir()}" == obj.getOldDirPath()
-                alreadyInShowLib = f"{self.showsDir}\\{obj.getNewDir()}" == obj.getOldDirPath()
-                if alreadyInMovieLib or alreadyInShowLib:
+                if self.__isInLibrary(obj):
                     obj.setIntegrationFalse()
 
-            self.__promptForRenamingAction(cinemaList)
+            self.__printDetailedCinemaTree(cinemaList)
+
+
+
+    def __printParseStats(self) -> None:
+        """ Print the counters and stage timings of the last parse, if it was profiled. """
+
+        stats = self.controller.getParseStats()
+        if stats is None:
+            return
+
+        self.__printHeader("parse profile")
+
+        for counter, value in stats.getCounters().items():
+            print(f"  {counter:<24}{value:>10d}")
+        print()
+
+        timingDict = stats.getTimings()
+        total = timingDict.pop(ParseStats.TOTAL, None) or sum(timingDict.values()) or 1.0
+        timingDict["other"] = max(0.0, total - sum(timingDict.values()))
+
+        for stage, seconds in timingDict.items():
+            print(f"  {stage:<24}{seconds:>10.3f} s {seconds / total:>7.1%}")
+        print(f"  {ParseStats.TOTAL:<24}{total:>10.3f} s\n")
+
+
+
+    def __printIntegrationMethods(self, methodDict: dict[str, list[Cinema]]) -> None:
+        """ Print how many files were copied with each copy strategy (or moved), and, if profiling, which files. The
+        sources that were left behind by moves between devices are always listed, as they have to be deleted by hand. """
+
+        from fileHandler import FileHandler
+
+        if not methodDict:
+            return
+
+        for method, objList in methodDict.items():
+            print(f"  {method:<24}{len(objList):>10d} FILE(S)")
+
+            if method.endswith(FileHandler.SOURCE_KEPT):
+                for obj in objList:
+                    print(f"    {obj.getOldAbsPath()}")
+            elif self.controller.hasProfileFlag():
+                for obj in objList:
+                    print(f"    {obj.getNewFileName()}{obj.getFileExt()}")
+        print()
+
+
+
+    def __isInLibrary(self, obj: Cinema) -> bool:
+        """ Whether the object's directory is already its correctly named directory in either library. The directory
+        path is split at the new directory name and looked up by its prefix, so no library paths are built. """
+
+        oldDirPath = obj.getOldDirPath()
+        newDir = obj.getNewDir()
+        return oldDirPath.endswith(newDir) and oldDirPath[:len(oldDirPath) - len(newDir)] in self.libraryPrefixSet
 
 
 
@@ -253,12 +536,66 @@ class ViewCLI(View):
 
         if len(cinemaList) > 0:
             print()
+            self.__planRenames(cinemaList)
+
+        if len(cinemaList) > 0:
             self.__doBackup(cinemaList)
 
 
 
+    def __planRenames(self, cinemaList: list[Cinema]) -> None:
+        """ Check the whole batch for conflicts before anything is backed up or renamed, removing the files that have
+        one from the list. """
+
+        from renamePlanner import RenamePlanner
+
+        librariesExist = all(library and os.path.isdir(library) for library in (self.moviesDir, self.showsDir))
+        planner = self.controller.newRenamePlanner(self.moviesDir if librariesExist else None,
+                                                   self.showsDir if librariesExist else None, self.copyFlag,
+                                                   self.overwriteFlag)
+        plan = planner.plan(cinemaList)
+
+        if len(plan.conflictList) > 0:
+            self.__printHeader(f"removed {len(plan.conflictList)} conflicting file(s)")
+            for obj, reason in plan.conflictList:
+                print(f"  {reason}: {obj.getOldAbsPath()}\n"
+                      f"    -> {obj.getNewFileName()}{obj.getFileExt()}")
+            print()
+            cinemaList[:] = plan.validList
+
+        countDict: dict[str, int] = {}
+        for operation in plan.operationList:
+            countDict[operation.kind] = countDict.get(operation.kind, 0) + 1
+
+        if countDict:
+            kindList = [RenamePlanner.BACKUP, RenamePlanner.MKDIR, RenamePlanner.RENAME_DIR, RenamePlanner.RENAME,
+                        RenamePlanner.COPY, RenamePlanner.MOVE]
+            print("PLANNED: " + ", ".join(f"{countDict[kind]} {kind}" for kind in kindList if kind in countDict) + "\n")
+
+
+
+    def __printRecovered(self) -> None:
+        """ Print the renames of interrupted runs that were completed or rolled back when the backups were opened. """
+
+        from databaseJournal import DatabaseJournal
+
+        recoveredList = self.controller.getRecoveredBackups()
+
+        if len(recoveredList) > 0 and not self.recoveryPrinted:
+            self.recoveryPrinted = True
+            self.__printHeader(f"recovered {len(recoveredList)} interrupted rename(s)")
+            for action, obj in recoveredList:
+                status = "ROLLED BACK" if action == DatabaseJournal.DELETE else "COMPLETED"
+                print(f"  {status:<12}{obj.getOldFileName()}{obj.getFileExt()}\n"
+                      f"    -> {obj.getNewFileName()}{obj.getFileExt()}")
+            print()
+
+
+
     def __doBackup(self, cinemaList: list[Cinema]) -> None:
 
+        self.__printRecovered()
+
         self.__printHeader(f"backing up file(s)")
 
         print(f"BACKING UP {len(cinemaList)} FILE(S)...")
@@ -331,31 +668,30 @@ class ViewCLI(View):
 
         errorList = []
 
+        def integrationFailed(obj: Cinema, e: Exception) -> None:
+            self.fail()
+
+            if isinstance(e, FileNotFoundError):
+                errorList.append(f"{str(e)}: {obj.getNewFileName() + obj.getFileExt()}")
+            elif isinstance(e, FileExistsError):
+                errorList.append(f"{str(e)}: {obj.getNewFileName()}{obj.getFileExt()}")
+                cinemaList.remove(obj)
+            else:
+                errorList.append(e)
+
+            self.controller.deleteBackup(obj)
+
         if os.path.exists(self.moviesDir) and os.path.isdir(self.moviesDir) and os.path.exists(self.showsDir) and os.path.isdir(self.showsDir):
+            integrationList: list[tuple[Cinema, str]] = []  # integrated together after the renames, see [integration]
+
             for obj in cinemaList[:]:
                 if obj.needsIntegration():
-                    try:
-                        if obj.isMovie():
-                            self.controller.integrateIntoLibrary(obj, self.moviesDir, self.copyFlag, self.overwriteFlag)
-                            self.passed()
-                        elif obj.isShow():
-                            self.controller.integrateIntoLibrary(obj, self.showsDir, self.copyFlag, self.overwriteFlag)
-                            self.passed()
-                        else:
-                            raise FileNotFoundError("NO MATCHING LIBRARY FOR CINEMA TYPE")
-                    except FileNotFoundError as e:
-                        self.fail()
-                        errorList += f"{str(e)}: {obj.getNewFileName() + obj.getFileExt()}"
-                        self.controller.deleteBackup(obj)
-                    except FileExistsError as e:
-                        self.fail()
-                        errorList.append(f"{str(e)}: {obj.getNewFileName()}{obj.getFileExt}")
-                        cinemaList.remove(obj)
-                        self.controller.deleteBackup(obj)
-                    except Exception as e:
-                        self.fail()
-                        errorList.append(e)
-                        self.controller.deleteBackup(obj)
+                    if obj.isMovie():
+                        integrationList.append((obj, self.moviesDir))
+                    elif obj.isShow():
+                        integrationList.append((obj, self.showsDir))
+                    else:
+                        integrationFailed(obj, FileNotFoundError("NO MATCHING LIBRARY FOR CINEMA TYPE"))
                 else:  # If folder is already correctly named
                     try:
                         self.controller.rename(obj)
@@ -370,7 +706,25 @@ class ViewCLI(View):
                         self.fail()
                         errorList.append(e)
                         self.controller.deleteBackup(obj)
+
+            methodDict: dict[str, list[Cinema]] = {}  # {copy strategy or "move": [integrated obj, ...], ...}
+
+            if integrationList:
+                self.controller.setCopyOptions(self.hardlinkFlag, self.verifyFlag)
+
+            for obj, error, method in self.controller.integrateManyIntoLibrary(integrationList, self.copyFlag,
+                                                                               self.overwriteFlag,
+                                                                               self.integrationWorkers,
+                                                                               self.transferWorkers):
+                if error is None:
+                    self.passed()
+                    if method is not None:
+                        methodDict.setdefault(method, []).append(obj)
+                else:
+                    integrationFailed(obj, error)
             self.fin()
+
+            self.__printIntegrationMethods(methodDict)
         else:
             # Print error if missing at least 1 library directory
             print("MOVIES LIBRARY DIRECTORY: ", end="")
@@ -441,11 +795,13 @@ class ViewCLI(View):
         cinemaList = []
         errors: list[str] = []
 
+        self.__printRecovered()
+
         print("READING BACKUP FILE(S)...")
 
         for path in model:
             try:
-                cinemaList.append(self.controller.readObjFromBackup(path))
+                cinemaList.extend(self.controller.readObjsFromBackup(path))
                 self.passed()
             except ValueError as e:  # Not a backup file
                 self.fail()
@@ -482,6 +838,12 @@ class ViewCLI(View):
 
         for obj in cinemaList[:]:
             try:
+                # Files copied with verification are checked against their digest, so corrupted copies aren't restored
+                if self.verifyFlag and self.controller.verifyDigest(obj) is False:
+                    self.fail()
+                    errorList.append(f"DIGEST MISMATCH: {obj.getNewDirPath()}\\{obj.getNewFileName()}{obj.getFileExt()}")
+                    continue
+
                 self.controller.restoreBackupObj(obj)
                 self.passed()
             except Exception as e: